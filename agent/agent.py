@@ -8,9 +8,10 @@ import google.generativeai as genai
 from googleapiclient.discovery import build
 from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from .youtube_utils import extract_channel_name, get_latest_videos, get_video_info
+from transport import http_client, recorded
+from logging_setup import configure_logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Load environment variables from .env
@@ -26,14 +27,14 @@ for var in required_env_vars:
 os.environ["GOOGLE_API_KEY"] = os.getenv("GEMINI_API_KEY")
 
 from langchain_core.prompts import PromptTemplate
-from .memory import store_memory, retrieve_memory
+from .memory import store_memory, store_memory_async, retrieve_memory
 
 # Initialize models
 try:
     embedding_model = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
     llm = ChatGoogleGenerativeAI(model="gemini-1.5-pro-latest")
 except Exception as e:
-    logger.error(f"Failed to initialize AI models: {str(e)}")
+    logger.error("Failed to initialize AI models: %s", e)
     raise
 
 # Configure Gemini
@@ -43,8 +44,16 @@ YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY', 'AIzaSyATUUbrkJyOuMp_RimQatbsM0fh
 # Initialize Gemini model
 GEMINI_MODEL = 'gemini-1.5-pro'
 
+# Record every chat exchange as a memory (queued, written off the request path)
+RECORD_EXCHANGES = os.getenv("MEMORY_RECORD_EXCHANGES", "false").lower() == "true"
+
 def get_youtube_client():
-    return build('youtube', 'v3', developerKey=YOUTUBE_API_KEY)
+    return build('youtube', 'v3', developerKey=YOUTUBE_API_KEY, http=http_client('youtube'))
+
+@recorded("gemini")
+def invoke_llm(prompt: str) -> str:
+    """Send a prompt to the chat model and return the text of its reply"""
+    return llm.invoke(prompt).content
 
 def get_channel_id(youtube, channel_name: str) -> str:
     """Get channel ID from channel name"""
@@ -59,7 +68,7 @@ def get_channel_id(youtube, channel_name: str) -> str:
         if response['items']:
             return response['items'][0]['id']['channelId']
     except Exception as e:
-        logger.error(f"Error getting channel ID: {str(e)}")
+        logger.error("Error getting channel ID: %s", e)
     return None
 
 def get_channel_videos(youtube, channel_id: str, max_results: int = 10):
@@ -94,7 +103,7 @@ def get_channel_videos(youtube, channel_id: str, max_results: int = 10):
             })
         return videos
     except Exception as e:
-        logger.error(f"Error getting channel videos: {str(e)}")
+        logger.error("Error getting channel videos: %s", e)
         return []
 
 def analyze_youtube_query(question: str) -> Dict[str, Any]:
@@ -128,15 +137,15 @@ def analyze_youtube_query(question: str) -> Dict[str, Any]:
         }
         
     except Exception as e:
-        logger.error(f"Error analyzing YouTube query: {str(e)}")
+        logger.error("Error analyzing YouTube query: %s", e)
         return {
             "type": "error",
             "error": str(e),
             "response": "I encountered an error while processing your request. Please try again or rephrase your question."
         }
 
-def run_agent(question: str, context: str = "general") -> Dict[str, Any]:
-    """Run the agent with the given question and context"""
+def run_agent(question: str, context: str = "general", namespace: str = "") -> Dict[str, Any]:
+    """Run the agent with the given question and context; memories go to namespace (see memory_namespace())"""
     try:
         if context == "youtube":
             # Analyze YouTube-specific questions
@@ -158,11 +167,18 @@ def run_agent(question: str, context: str = "general") -> Dict[str, Any]:
                 }
             
         # For general chat or unknown contexts, use the LLM
-        response = llm.invoke(question).content
+        response = invoke_llm(question)
+        if RECORD_EXCHANGES:
+            store_memory_async(
+                text=question,
+                metadata={"type": "user_query", "response": response},
+                embedding_model=embedding_model,
+                namespace=namespace
+            )
         return {"response": response}
             
     except Exception as e:
-        logger.error(f"Error running agent: {str(e)}")
+        logger.error("Error running agent: %s", e)
         return {
             "response": "I apologize, but I encountered an error processing your request. Please try again or rephrase your question.",
             "error": str(e)
@@ -0,0 +1,437 @@
+# ann_index.py
+
+import os
+import json
+import fcntl
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import numpy as np
+try:
+    from .embedding_store import Match, RecordLog, file_lock, grow_array, quantize
+except ImportError:  # imported as a top-level module, e.g. by benchmarks/
+    from embedding_store import Match, RecordLog, file_lock, grow_array, quantize
+
+ANN_INDEX_DIR = os.getenv("ANN_INDEX_DIR", "ann_index")
+# Inverted lists scanned per query: the recall/latency knob
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+# Rows at which the centroids are trained; smaller indexes are searched exactly
+ANN_TRAIN_AT = int(os.getenv("ANN_TRAIN_AT", "20000"))
+# Unmerged rows, as a fraction of the merged ones, that trigger a merge
+ANN_DELTA_FRACTION = float(os.getenv("ANN_DELTA_FRACTION", "0.1"))
+# Rows k-means is trained on; more adds time but little quality
+TRAIN_SAMPLE = 100000
+KMEANS_ITERATIONS = 20
+# Centroids are retrained at merge time once the index has grown this much since training
+RETRAIN_GROWTH = 8
+# Quantized candidates kept per requested result for the exact re-rank
+RERANK_MULTIPLIER = 10
+SCAN_CHUNK_ROWS = 65536
+
+def default_nlist(count: int) -> int:
+    """Inverted lists for ``count`` rows: about 4 * sqrt(n), as usual for IVF."""
+    return int(min(65536, max(16, 4 * np.sqrt(count))))
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = KMEANS_ITERATIONS,
+                    seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means on unit vectors.
+
+    Args:
+        vectors: float32 array of shape (n, dim), L2-normalized.
+        nlist: Number of centroids.
+        iterations: Lloyd iterations.
+
+    Returns:
+        np.ndarray: float32 unit centroids of shape (nlist, dim).
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=nlist)
+        empty = counts == 0
+        # Reseed empty clusters with random points rather than leaving dead lists
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+def assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (by inner product) of each row, computed in chunks."""
+    result = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), SCAN_CHUNK_ROWS):
+        chunk = np.asarray(vectors[start:start + SCAN_CHUNK_ROWS], dtype=np.float32)
+        result[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return result
+
+class IndexSnapshot(NamedTuple):
+    """The maps a query reads, from one load of the index."""
+    count: int
+    merged: int
+    trained_at: int
+    vectors: np.ndarray
+    assignments: np.ndarray
+    centroids: Optional[np.ndarray]
+    offsets: Optional[np.ndarray]
+    postings: Optional[np.ndarray]
+    codes: Optional[np.ndarray]
+    scales: Optional[np.ndarray]
+    record_offsets: np.ndarray
+    deleted: np.ndarray
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index, stored as memory-mapped arrays.
+
+    Layout of the index directory:
+        vectors.npy      float32 (capacity, dim), insertion order; re-rank and rebuild source
+        assignments.npy  int32 (capacity,), inverted list of each row (-1 before training)
+        centroids.npy    float32 (nlist, dim), k-means centroids
+        offsets.npy      int64 (nlist + 1,), start of each list in the arrays below
+        postings.npy     int64 (merged,), row numbers grouped by list
+        codes.npy        int8 (merged, dim), int8 codes in postings order
+        scales.npy       float32 (merged,), per-row dequantization factor
+        records.jsonl and its arrays  IDs and metadata, see RecordLog
+        meta.json        dimension, row counts and training state
+
+    A query scores the nprobe nearest centroids, scans the contiguous int8
+    codes of those lists and re-ranks the best candidates exactly in
+    float32, reading only their rows of vectors.npy. Inserts append to
+    vectors.npy with their list assignment and are searched exactly until
+    the unmerged tail exceeds ANN_DELTA_FRACTION of the merged rows, when
+    the grouped arrays are rewritten. Until ANN_TRAIN_AT rows exist there
+    are no centroids and every query is exact.
+
+    Adding an ID that is already stored tombstones the old row, so an add
+    is an upsert; merges drop tombstoned rows from the lists. Writers hold
+    an exclusive file lock and readers map the files under a shared one,
+    so a reader never sees arrays from two different merges. Each load
+    builds an IndexSnapshot swapped in with one assignment, and a query
+    reads only the snapshot it took, so a writer in the same process
+    remapping the arrays cannot change them under it.
+    """
+
+    def __init__(self, path: str, dimension: int = 768, initial_capacity: int = 1024,
+                 nprobe: int = ANN_NPROBE, train_at: int = ANN_TRAIN_AT):
+        self.path = path
+        self.dimension = dimension
+        self.nprobe = nprobe
+        self.train_at = train_at
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._lock_file = open(os.path.join(path, ".lock"), "a+")
+        self._meta_mtime = None
+        self._records = RecordLog(path)
+        self._snapshot: Optional[IndexSnapshot] = None
+        with file_lock(self._lock_file, fcntl.LOCK_EX):
+            if not os.path.exists(self._file("meta.json")):
+                self._allocate(initial_capacity)
+                self._write_meta(0, 0, 0)
+            elif not self._records.exists():
+                with open(self._file("meta.json")) as f:
+                    count = json.load(f)["count"]
+                self._records.rebuild(len(np.load(self._file("assignments.npy"), mmap_mode="r")), count)
+            self._load()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _allocate(self, capacity: int) -> None:
+        """Creates (or grows) the insertion-order arrays, preserving existing rows."""
+        grow_array(self._file("vectors.npy"), np.float32, (capacity, self.dimension), fill=0)
+        grow_array(self._file("assignments.npy"), np.int32, (capacity,), fill=-1)
+        self._records.allocate(capacity)
+
+    def _write_meta(self, count: int, merged: int, trained_at: int) -> None:
+        with open(self._file("meta.json.tmp"), "w") as f:
+            json.dump({"dimension": self.dimension, "count": count, "merged": merged,
+                       "trained_at": trained_at}, f)
+        os.replace(self._file("meta.json.tmp"), self._file("meta.json"))
+
+    def _load(self) -> IndexSnapshot:
+        """Maps the arrays and swaps in a new snapshot; callers hold the file lock."""
+        with open(self._file("meta.json")) as f:
+            meta = json.load(f)
+        self.dimension = meta["dimension"]
+        self._meta_mtime = os.path.getmtime(self._file("meta.json"))
+        trained = bool(meta["trained_at"])
+        self._records.load()
+        record_offsets, _, deleted = self._records.arrays
+        self._snapshot = IndexSnapshot(
+            meta["count"],
+            meta["merged"],
+            meta["trained_at"],
+            np.load(self._file("vectors.npy"), mmap_mode="r+"),
+            np.load(self._file("assignments.npy"), mmap_mode="r+"),
+            np.load(self._file("centroids.npy")) if trained else None,
+            np.load(self._file("offsets.npy")) if trained else None,
+            np.load(self._file("postings.npy"), mmap_mode="r") if trained else None,
+            np.load(self._file("codes.npy"), mmap_mode="r") if trained else None,
+            np.load(self._file("scales.npy"), mmap_mode="r") if trained else None,
+            record_offsets,
+            deleted,
+        )
+        return self._snapshot
+
+    def refresh(self) -> None:
+        """Picks up rows written by other processes."""
+        mtime = os.path.getmtime(self._file("meta.json"))
+        if mtime != self._meta_mtime:
+            with self._lock, file_lock(self._lock_file, fcntl.LOCK_SH):
+                self._load()
+
+    def __len__(self) -> int:
+        """Number of stored (not deleted) memories."""
+        return self._records.live(self.count)
+
+    @property
+    def count(self) -> int:
+        return self._snapshot.count
+
+    @property
+    def merged(self) -> int:
+        return self._snapshot.merged
+
+    @property
+    def trained_at(self) -> int:
+        return self._snapshot.trained_at
+
+    @property
+    def nlist(self) -> int:
+        centroids = self._snapshot.centroids
+        return 0 if centroids is None else len(centroids)
+
+    def add(self, items: Iterable[Tuple[str, List[float], Dict[str, Any]]]) -> None:
+        """
+        Appends vectors to the index, assigning each to its nearest centroid.
+        Rows already stored under the same IDs are replaced.
+
+        Args:
+            items: (id, vector, metadata) tuples.
+        """
+        # Last write wins for an ID repeated in the batch, as with Pinecone upserts
+        items = list({memory_id: (memory_id, vector, metadata) for memory_id, vector, metadata in items}.values())
+        if not items:
+            return
+        vectors = np.asarray([vector for _, vector, _ in items], dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        with self._lock, file_lock(self._lock_file, fcntl.LOCK_EX):
+            snapshot = self._load()
+            replaced = self._records.find([memory_id for memory_id, _, _ in items], snapshot.count)
+            start, end = snapshot.count, snapshot.count + len(items)
+            capacity = len(snapshot.assignments)
+            if end > capacity:
+                self._allocate(max(end, 2 * capacity))
+                snapshot = self._load()
+            # Rows past snapshot.count are not read by queries until the new meta is loaded
+            snapshot.vectors[start:end] = vectors
+            if snapshot.centroids is not None:
+                snapshot.assignments[start:end] = assign(vectors, snapshot.centroids)
+            for array in (snapshot.vectors, snapshot.assignments):
+                array.flush()
+            self._records.append(start, items)
+            self._records.delete(replaced.values())
+            merged, trained_at = snapshot.merged, snapshot.trained_at
+            if not trained_at and end >= self.train_at:
+                merged, trained_at = self._train(snapshot, end)
+            elif trained_at and end - merged > ANN_DELTA_FRACTION * merged:
+                if end >= RETRAIN_GROWTH * trained_at:
+                    merged, trained_at = self._train(snapshot, end)
+                else:
+                    merged = self._merge(snapshot, snapshot.centroids, end)
+            self._write_meta(end, merged, trained_at)
+            self._load()
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """
+        Deletes memories by ID; their rows leave the lists at the next merge.
+
+        Returns:
+            int: Number of memories deleted.
+        """
+        with self._lock, file_lock(self._lock_file, fcntl.LOCK_EX):
+            self._load()
+            snapshot = self._load()
+            rows = self._records.find(ids, snapshot.count)
+            self._records.delete(rows.values())
+            self._write_meta(snapshot.count, snapshot.merged, snapshot.trained_at)
+        return len(rows)
+
+    def update_metadata(self, memory_id: str, metadata: Dict[str, Any]) -> None:
+        """Merges ``metadata`` into a stored memory's metadata, like pinecone_client.update_metadata()."""
+        with self._lock, file_lock(self._lock_file, fcntl.LOCK_EX):
+            self._load()
+            row = self._records.find([memory_id], self.count).get(memory_id)
+            if row is not None:
+                _, current = self._records.read([row])[0]
+                self._records.rewrite(row, memory_id, {**current, **metadata})
+
+    def records(self) -> Iterator[Tuple[str, np.ndarray, Dict[str, Any]]]:
+        """Yields (id, float32 vector, metadata) for every stored memory, in insertion order."""
+        self.refresh()
+        with self._lock:
+            snapshot = self._snapshot
+        count = snapshot.count
+        for start in range(0, count, SCAN_CHUNK_ROWS):
+            rows = np.nonzero(~snapshot.deleted[start:min(start + SCAN_CHUNK_ROWS, count)])[0] + start
+            for row, (memory_id, metadata) in zip(rows, self._records.read(rows, snapshot.record_offsets)):
+                yield memory_id, np.array(snapshot.vectors[row]), metadata
+
+    def train(self, nlist: Optional[int] = None) -> None:
+        """
+        (Re)trains the centroids on the current rows and rebuilds the lists.
+
+        Args:
+            nlist: Number of inverted lists (default from the row count).
+        """
+        with self._lock, file_lock(self._lock_file, fcntl.LOCK_EX):
+            snapshot = self._load()
+            if len(self):
+                merged, trained_at = self._train(snapshot, snapshot.count, nlist)
+                self._write_meta(snapshot.count, merged, trained_at)
+                self._load()
+
+    def _train(self, snapshot: IndexSnapshot, count: int, nlist: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Trains centroids on the first ``count`` rows and merges them.
+
+        Returns:
+            tuple: (merged, trained_at) for the new meta.
+        """
+        live = np.nonzero(~self._records.deleted[:count])[0]
+        nlist = min(nlist or default_nlist(len(live)), len(live))
+        rng = np.random.default_rng(count)
+        sample = np.sort(rng.choice(live, min(len(live), max(TRAIN_SAMPLE, 40 * nlist)), replace=False))
+        centroids = train_centroids(np.asarray(snapshot.vectors[sample]), nlist)
+        np.save(self._file("centroids.npy.tmp.npy"), centroids)
+        os.replace(self._file("centroids.npy.tmp.npy"), self._file("centroids.npy"))
+        snapshot.assignments[:count] = assign(snapshot.vectors[:count], centroids)
+        snapshot.assignments.flush()
+        return self._merge(snapshot, centroids, count), count
+
+    def _merge(self, snapshot: IndexSnapshot, centroids: np.ndarray, count: int) -> int:
+        """
+        Rewrites the grouped arrays to cover every live row below ``count``.
+
+        Returns:
+            int: The new merged row count.
+        """
+        nlist = len(centroids)
+        live = np.nonzero(~self._records.deleted[:count])[0]
+        assignments = np.asarray(snapshot.assignments[live])
+        postings = live[np.argsort(assignments, kind="stable")].astype(np.int64)
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=nlist), out=offsets[1:])
+        codes = np.lib.format.open_memmap(self._file("codes.npy.tmp"), mode="w+", dtype=np.int8,
+                                          shape=(len(postings), self.dimension))
+        scales = np.lib.format.open_memmap(self._file("scales.npy.tmp"), mode="w+", dtype=np.float32,
+                                           shape=(len(postings),))
+        for start in range(0, len(postings), SCAN_CHUNK_ROWS):
+            rows = postings[start:start + SCAN_CHUNK_ROWS]
+            codes[start:start + len(rows)], scales[start:start + len(rows)] = quantize(snapshot.vectors[rows])
+        codes.flush()
+        scales.flush()
+        del codes, scales
+        np.save(self._file("postings.npy.tmp.npy"), postings)
+        np.save(self._file("offsets.npy.tmp.npy"), offsets)
+        # Readers holding the old maps keep a consistent snapshot until their next refresh
+        for name in ("codes.npy", "scales.npy"):
+            os.replace(self._file(f"{name}.tmp"), self._file(name))
+        for name in ("postings.npy", "offsets.npy"):
+            os.replace(self._file(f"{name}.tmp.npy"), self._file(name))
+        return count
+
+    def query(self, vector: List[float], top_k: int = 5, nprobe: Optional[int] = None,
+              rerank: Optional[int] = None) -> List[Match]:
+        """
+        Finds approximately the stored vectors most similar to ``vector``.
+
+        Args:
+            vector: Query vector.
+            top_k: Number of results to return.
+            nprobe: Inverted lists to scan (default self.nprobe); more is slower and more exact.
+            rerank: Candidates re-scored exactly (default top_k * RERANK_MULTIPLIER).
+
+        Returns:
+            list: Matches, best first.
+        """
+        self.refresh()
+        with self._lock:
+            snapshot = self._snapshot
+        count = snapshot.count
+        if count == 0:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        rerank = rerank or top_k * RERANK_MULTIPLIER
+
+        deleted = snapshot.deleted
+        if snapshot.centroids is None:
+            candidates = np.nonzero(~deleted[:count])[0]
+            approximate = None
+        else:
+            nprobe = min(nprobe or self.nprobe, len(snapshot.centroids))
+            probe = np.argpartition(-(snapshot.centroids @ query), nprobe - 1)[:nprobe]
+            parts, scores = [], []
+            for c in probe:
+                start, end = snapshot.offsets[c], snapshot.offsets[c + 1]
+                if end > start:
+                    parts.append(snapshot.postings[start:end])
+                    scores.append((snapshot.codes[start:end] @ query) * snapshot.scales[start:end])
+            # Rows added since the last merge are few; they are scored exactly
+            tail = np.nonzero(np.isin(snapshot.assignments[snapshot.merged:count], probe))[0] + snapshot.merged
+            if len(tail):
+                parts.append(tail)
+                scores.append(snapshot.vectors[tail] @ query)
+            if not parts:
+                return []
+            candidates = np.concatenate(parts)
+            approximate = np.concatenate(scores)
+            # Rows deleted or replaced since the last merge
+            keep = ~deleted[candidates]
+            candidates, approximate = candidates[keep], approximate[keep]
+
+        if approximate is not None and rerank < len(candidates):
+            candidates = candidates[np.argpartition(-approximate, rerank - 1)[:rerank]]
+        candidates.sort()  # sequential reads from the float32 file
+        exact = np.empty(len(candidates), dtype=np.float32)
+        for start in range(0, len(candidates), SCAN_CHUNK_ROWS):
+            rows = candidates[start:start + SCAN_CHUNK_ROWS]
+            exact[start:start + len(rows)] = snapshot.vectors[rows] @ query
+        order = np.argsort(-exact)[:top_k]
+        return [
+            Match(memory_id, float(exact[i]), metadata)
+            for i, (memory_id, metadata) in zip(order, self._records.read(candidates[order], snapshot.record_offsets))
+        ]
+
+_indexes: Dict[str, IVFIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_ann_index(root: str = ANN_INDEX_DIR, namespace: str = "") -> IVFIndex:
+    """
+    Returns the process-wide index for a memory namespace under ``root``.
+    """
+    path = os.path.join(root, namespace or "default")
+    index = _indexes.get(path)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(path)
+            if index is None:
+                index = _indexes[path] = IVFIndex(path)
+    return index
+
+def query_data(vector: List[float], top_k: int = 5, namespace: str = "") -> List[Match]:
+    """
+    Query the local ANN index for similar vectors, like pinecone_client.query_data().
+
+    Args:
+        vector: Query vector
+        top_k: Number of results to return
+        namespace: Namespace (partition) to search
+
+    Returns:
+        List of matches with their scores and metadata
+    """
+    return get_ann_index(ANN_INDEX_DIR, namespace).query(vector, top_k=top_k)
@@ -0,0 +1,404 @@
+# embedding_store.py
+
+import os
+import json
+import fcntl
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+# Rows scanned per step, bounding the float32 scratch space used during search
+SCAN_CHUNK_ROWS = 8192
+# Quantized candidates kept per requested result for the exact re-rank
+RERANK_MULTIPLIER = 10
+
+class Match:
+    """
+    A search result, shaped like the Pinecone matches returned by query_data().
+    """
+    __slots__ = ("id", "score", "metadata")
+
+    def __init__(self, id: str, score: float, metadata: Dict[str, Any]):
+        self.id = id
+        self.score = score
+        self.metadata = metadata
+
+    def __repr__(self) -> str:
+        return f"Match(id={self.id!r}, score={self.score:.4f})"
+
+def quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Scalar-quantizes unit vectors to int8 with one scale factor per vector.
+
+    Args:
+        vectors: float32 array of shape (n, dim).
+
+    Returns:
+        tuple: (int8 codes of shape (n, dim), float32 scales of shape (n,))
+    """
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+@contextmanager
+def file_lock(lock_file, operation: int):
+    """Holds an flock (fcntl.LOCK_SH or LOCK_EX) on ``lock_file`` for the block."""
+    fcntl.flock(lock_file, operation)
+    try:
+        yield
+    finally:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def grow_array(target: str, dtype, shape: tuple, fill=None) -> None:
+    """Creates (or grows) a .npy file to ``shape``, preserving existing rows."""
+    grown = np.lib.format.open_memmap(f"{target}.tmp", mode="w+", dtype=dtype, shape=shape)
+    if fill is not None:
+        grown[:] = fill
+    if os.path.exists(target):
+        old = np.load(target, mmap_mode="r")
+        grown[:len(old)] = old
+        del old
+    grown.flush()
+    del grown
+    os.replace(f"{target}.tmp", target)
+
+def id_hash(memory_id: str) -> int:
+    """64-bit hash of a memory ID, used to find its row without loading every ID."""
+    return int.from_bytes(hashlib.blake2b(memory_id.encode(), digest_size=8).digest(), "little", signed=True)
+
+class RecordLog:
+    """
+    IDs and metadata of a vector store's rows, kept on disk.
+
+    records.jsonl holds one {"id", "metadata"} line per write. Three arrays,
+    sized like the store's vector arrays, map each row to its current line:
+        record_offsets.npy  int64, byte offset of the row's line
+        id_hashes.npy       int64, id_hash() of the row's ID
+        deleted.npy         bool, tombstones
+    The arrays are memory-mapped, so a worker holds no per-row Python objects;
+    a query reads only the lines of the rows it returns. Metadata updates
+    append a line and repoint the row. load() swaps all three maps in with
+    one assignment, so a reader holding ``arrays`` never mixes two loads.
+    """
+    ARRAYS = (("record_offsets.npy", np.int64), ("id_hashes.npy", np.int64), ("deleted.npy", np.bool_))
+
+    def __init__(self, path: str):
+        self.path = path
+        self.arrays: Tuple[np.ndarray, np.ndarray, np.ndarray] = ()
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self.arrays[0]
+
+    @property
+    def hashes(self) -> np.ndarray:
+        return self.arrays[1]
+
+    @property
+    def deleted(self) -> np.ndarray:
+        return self.arrays[2]
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def exists(self) -> bool:
+        return all(os.path.exists(self._file(name)) for name, _ in self.ARRAYS)
+
+    def allocate(self, capacity: int) -> None:
+        for name, dtype in self.ARRAYS:
+            grow_array(self._file(name), dtype, (capacity,))
+
+    def load(self) -> None:
+        self.arrays = tuple(np.load(self._file(name), mmap_mode="r+") for name, _ in self.ARRAYS)
+
+    def rebuild(self, capacity: int, count: int) -> None:
+        """Builds the arrays for a records.jsonl written without them."""
+        self.allocate(capacity)
+        self.load()
+        if os.path.exists(self._file("records.jsonl")):
+            with open(self._file("records.jsonl"), "rb") as f:
+                for row in range(count):
+                    offset = f.tell()
+                    line = f.readline()
+                    if not line:
+                        break
+                    self.offsets[row] = offset
+                    self.hashes[row] = id_hash(json.loads(line)["id"])
+        for array in (self.offsets, self.hashes, self.deleted):
+            array.flush()
+
+    def append(self, start: int, items: List[Tuple[str, Any, Dict[str, Any]]]) -> None:
+        """Writes the records of rows ``start`` onwards."""
+        with open(self._file("records.jsonl"), "ab") as f:
+            for row, (memory_id, _, metadata) in enumerate(items, start=start):
+                self.offsets[row] = f.tell()
+                f.write((json.dumps({"id": memory_id, "metadata": metadata}) + "\n").encode())
+        end = start + len(items)
+        self.hashes[start:end] = [id_hash(memory_id) for memory_id, _, _ in items]
+        self.deleted[start:end] = False
+        for array in (self.offsets, self.hashes, self.deleted):
+            array.flush()
+
+    def rewrite(self, row: int, memory_id: str, metadata: Dict[str, Any]) -> None:
+        """Replaces the metadata of one row."""
+        self.append(row, [(memory_id, None, metadata)])
+
+    def read(self, rows: Iterable[int], offsets: Optional[np.ndarray] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """Returns (id, metadata) for each row, located through ``offsets`` (default the loaded map)."""
+        offsets = self.offsets if offsets is None else offsets
+        records = []
+        with open(self._file("records.jsonl"), "rb") as f:
+            for row in rows:
+                f.seek(int(offsets[row]))
+                record = json.loads(f.readline())
+                records.append((record["id"], record["metadata"]))
+        return records
+
+    def find(self, ids: Iterable[str], count: int) -> Dict[str, int]:
+        """Maps each of ``ids`` that is stored (and not deleted) to its row."""
+        ids = set(ids)
+        if not ids or not count:
+            return {}
+        wanted = np.fromiter((id_hash(memory_id) for memory_id in ids), dtype=np.int64, count=len(ids))
+        rows = np.nonzero(np.isin(self.hashes[:count], wanted) & ~self.deleted[:count])[0]
+        return {
+            memory_id: int(row) for row, (memory_id, _) in zip(rows, self.read(rows)) if memory_id in ids
+        }
+
+    def delete(self, rows: Iterable[int]) -> None:
+        rows = list(rows)
+        if rows:
+            self.deleted[rows] = True
+            self.deleted.flush()
+
+    def live(self, count: int) -> int:
+        return count - int(np.count_nonzero(self.deleted[:count]))
+
+class StoreSnapshot(NamedTuple):
+    """The maps a query reads, from one load of the store."""
+    count: int
+    codes: np.ndarray
+    scales: np.ndarray
+    vectors: np.ndarray
+    record_offsets: np.ndarray
+    deleted: np.ndarray
+
+class EmbeddingStore:
+    """
+    Local, memory-mapped embedding store with int8 search and float32 re-rank.
+
+    Layout of the store directory:
+        codes.npy    int8 (capacity, dim), the array scanned by every query
+        scales.npy   float32 (capacity,), per-vector dequantization factor
+        vectors.npy  float32 (capacity, dim), read only for re-rank candidates
+        records.jsonl and its arrays  IDs and metadata, see RecordLog
+        meta.json    dimension and row count
+
+    Vectors are L2-normalized on insert, so scores are cosine similarities.
+    A 768-dim memory scans 772 bytes per query (vs ~23 KB as a Python list
+    of floats), but takes about 3.9 KB on disk plus its metadata line: the
+    float32 copy stays on disk and only the pages of the few re-ranked
+    candidates are read. Adding an ID that is already stored replaces it,
+    and delete() tombstones rows. Writers across processes are serialized
+    with an exclusive file lock and readers map the files under a shared
+    one; readers pick up new rows on their next query. Each load builds a
+    StoreSnapshot swapped in with one assignment, so a query running while
+    a writer in the same process grows or remaps the arrays keeps reading
+    the maps it started with.
+    """
+
+    def __init__(self, path: str, dimension: int = 768, initial_capacity: int = 1024):
+        self.path = path
+        self.dimension = dimension
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._lock_file = open(os.path.join(path, ".lock"), "a+")
+        self._meta_mtime = None
+        self._records = RecordLog(path)
+        self._snapshot: Optional[StoreSnapshot] = None
+        with file_lock(self._lock_file, fcntl.LOCK_EX):
+            if not os.path.exists(self._file("meta.json")):
+                self._allocate(initial_capacity)
+                self._write_meta(0)
+            elif not self._records.exists():
+                with open(self._file("meta.json")) as f:
+                    count = json.load(f)["count"]
+                self._records.rebuild(len(np.load(self._file("scales.npy"), mmap_mode="r")), count)
+            self._load()
+
+    @property
+    def count(self) -> int:
+        return self._snapshot.count
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _allocate(self, capacity: int) -> None:
+        """Creates (or grows) the arrays to hold ``capacity`` rows, preserving existing rows."""
+        grow_array(self._file("codes.npy"), np.int8, (capacity, self.dimension))
+        grow_array(self._file("scales.npy"), np.float32, (capacity,))
+        grow_array(self._file("vectors.npy"), np.float32, (capacity, self.dimension))
+        self._records.allocate(capacity)
+
+    def _write_meta(self, count: int) -> None:
+        with open(self._file("meta.json.tmp"), "w") as f:
+            json.dump({"dimension": self.dimension, "count": count}, f)
+        os.replace(self._file("meta.json.tmp"), self._file("meta.json"))
+
+    def _load(self) -> StoreSnapshot:
+        """Maps the arrays and swaps in a new snapshot; callers hold the file lock."""
+        with open(self._file("meta.json")) as f:
+            meta = json.load(f)
+        self.dimension = meta["dimension"]
+        self._meta_mtime = os.path.getmtime(self._file("meta.json"))
+        self._records.load()
+        record_offsets, _, deleted = self._records.arrays
+        self._snapshot = StoreSnapshot(
+            meta["count"],
+            np.load(self._file("codes.npy"), mmap_mode="r+"),
+            np.load(self._file("scales.npy"), mmap_mode="r+"),
+            np.load(self._file("vectors.npy"), mmap_mode="r+"),
+            record_offsets,
+            deleted,
+        )
+        return self._snapshot
+
+    def refresh(self) -> None:
+        """Picks up rows written by other processes."""
+        mtime = os.path.getmtime(self._file("meta.json"))
+        if mtime != self._meta_mtime:
+            with self._lock, file_lock(self._lock_file, fcntl.LOCK_SH):
+                self._load()
+
+    def __len__(self) -> int:
+        """Number of stored (not deleted) memories."""
+        return self._records.live(self.count)
+
+    def add(self, items: Iterable[Tuple[str, List[float], Dict[str, Any]]]) -> None:
+        """
+        Appends vectors to the store.
+
+        Args:
+            items: (id, vector, metadata) tuples.
+        """
+        # Last write wins for an ID repeated in the batch, as with Pinecone upserts
+        items = list({memory_id: (memory_id, vector, metadata) for memory_id, vector, metadata in items}.values())
+        if not items:
+            return
+        vectors = np.asarray([vector for _, vector, _ in items], dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        codes, scales = quantize(vectors)
+
+        with self._lock, file_lock(self._lock_file, fcntl.LOCK_EX):
+            snapshot = self._load()
+            replaced = self._records.find([memory_id for memory_id, _, _ in items], snapshot.count)
+            start, end = snapshot.count, snapshot.count + len(items)
+            capacity = len(snapshot.scales)
+            if end > capacity:
+                self._allocate(max(end, 2 * capacity))
+                snapshot = self._load()
+            # Rows past snapshot.count are not read by queries until the new meta is loaded
+            snapshot.codes[start:end] = codes
+            snapshot.scales[start:end] = scales
+            snapshot.vectors[start:end] = vectors
+            for array in (snapshot.codes, snapshot.scales, snapshot.vectors):
+                array.flush()
+            self._records.append(start, items)
+            self._records.delete(replaced.values())
+            self._write_meta(end)
+            self._load()
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """
+        Deletes memories by ID.
+
+        Returns:
+            int: Number of memories deleted.
+        """
+        with self._lock, file_lock(self._lock_file, fcntl.LOCK_EX):
+            self._load()
+            count = self._load().count
+            rows = self._records.find(ids, count)
+            self._records.delete(rows.values())
+            self._write_meta(count)
+        return len(rows)
+
+    def update_metadata(self, memory_id: str, metadata: Dict[str, Any]) -> None:
+        """Merges ``metadata`` into a stored memory's metadata, like pinecone_client.update_metadata()."""
+        with self._lock, file_lock(self._lock_file, fcntl.LOCK_EX):
+            self._load()
+            row = self._records.find([memory_id], self.count).get(memory_id)
+            if row is not None:
+                _, current = self._records.read([row])[0]
+                self._records.rewrite(row, memory_id, {**current, **metadata})
+
+    def records(self) -> Iterator[Tuple[str, np.ndarray, Dict[str, Any]]]:
+        """Yields (id, float32 vector, metadata) for every stored memory, in insertion order."""
+        self.refresh()
+        with self._lock:
+            snapshot = self._snapshot
+        count = snapshot.count
+        for start in range(0, count, SCAN_CHUNK_ROWS):
+            rows = np.nonzero(~snapshot.deleted[start:min(start + SCAN_CHUNK_ROWS, count)])[0] + start
+            for row, (memory_id, metadata) in zip(rows, self._records.read(rows, snapshot.record_offsets)):
+                yield memory_id, np.array(snapshot.vectors[row]), metadata
+
+    def query(self, vector: List[float], top_k: int = 5, rerank: Optional[int] = None) -> List[Match]:
+        """
+        Finds the stored vectors most similar to ``vector``.
+
+        The int8 codes are scanned in chunks with one matrix-vector product each;
+        the best ``rerank`` candidates are then re-scored exactly in float32.
+
+        Args:
+            vector: Query vector.
+            top_k: Number of results to return.
+            rerank: Candidates re-scored exactly (default top_k * RERANK_MULTIPLIER).
+
+        Returns:
+            list: Matches, best first.
+        """
+        self.refresh()
+        with self._lock:
+            snapshot = self._snapshot
+        count = snapshot.count
+        if count == 0:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        rerank = min(count, rerank or top_k * RERANK_MULTIPLIER)
+
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, SCAN_CHUNK_ROWS):
+            end = min(start + SCAN_CHUNK_ROWS, count)
+            scores[start:end] = (snapshot.codes[start:end] @ query) * snapshot.scales[start:end]
+        scores[snapshot.deleted[:count]] = -np.inf
+
+        candidates = np.argpartition(-scores, rerank - 1)[:rerank] if rerank < count else np.arange(count)
+        candidates = candidates[np.isfinite(scores[candidates])]
+        candidates.sort()  # sequential reads from the float32 file
+        exact = snapshot.vectors[candidates] @ query
+        order = np.argsort(-exact)[:top_k]
+        return [
+            Match(memory_id, float(exact[i]), metadata)
+            for i, (memory_id, metadata) in zip(order, self._records.read(candidates[order], snapshot.record_offsets))
+        ]
+
+_stores: Dict[str, EmbeddingStore] = {}
+_stores_lock = threading.Lock()
+
+def get_embedding_store(root: str, namespace: str = "") -> EmbeddingStore:
+    """
+    Returns the process-wide store for a memory namespace under ``root``.
+    """
+    path = os.path.join(root, namespace or "default")
+    store = _stores.get(path)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(path)
+            if store is None:
+                store = _stores[path] = EmbeddingStore(path)
+    return store
@@ -0,0 +1,37 @@
+# embeddings.py
+
+from typing import Any, Dict, List
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from transport import recorded
+
+def _embedding_request(embedding_model: GoogleGenerativeAIEmbeddings, texts: Any) -> Dict[str, Any]:
+    # The model object holds a client and credentials; cassettes key on its name
+    return {"model": getattr(embedding_model, "model", ""), "texts": texts}
+
+@recorded("gemini", request=_embedding_request)
+def embed_query(embedding_model: GoogleGenerativeAIEmbeddings, text: str) -> List[float]:
+    """
+    Embeds one text, recorded and replayed like the other Gemini calls.
+
+    Args:
+        embedding_model: The embedding model to use.
+        text (str): The text to embed.
+
+    Returns:
+        list: The embedding vector.
+    """
+    return embedding_model.embed_query(text)
+
+@recorded("gemini", request=_embedding_request)
+def embed_documents(embedding_model: GoogleGenerativeAIEmbeddings, texts: List[str]) -> List[List[float]]:
+    """
+    Embeds several texts in one call, recorded and replayed like the other Gemini calls.
+
+    Args:
+        embedding_model: The embedding model to use.
+        texts (list): The texts to embed.
+
+    Returns:
+        list: One embedding vector per text.
+    """
+    return embedding_model.embed_documents(texts)
@@ -0,0 +1,218 @@
+# lexical_index.py
+
+import os
+import re
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+LEXICAL_INDEX_PATH = os.getenv(
+    "LEXICAL_INDEX_PATH", os.path.join(tempfile.gettempdir(), "youtube_research_lexical.sqlite3")
+)
+# Upper bound on indexed memories across namespaces; the oldest are pruned first
+LEXICAL_INDEX_MAX_DOCS = int(os.getenv("LEXICAL_INDEX_MAX_DOCS", "1000000"))
+# Expiry and size pruning runs once per this many adds in a process
+PRUNE_EVERY = 1000
+
+# Keeps @handles and dotted/hyphenated names (e.g. "mr-beast", "3blue1brown") as single tokens
+TOKEN_PATTERN = re.compile(r"@?[\w][\w.\-']*")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    rowid INTEGER PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    memory_id TEXT NOT NULL,
+    terms TEXT NOT NULL,
+    text TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    expires_at REAL,
+    UNIQUE (namespace, memory_id)
+);
+CREATE INDEX IF NOT EXISTS memories_expiry ON memories (expires_at) WHERE expires_at IS NOT NULL;
+CREATE VIRTUAL TABLE IF NOT EXISTS memory_fts USING fts5(
+    terms, namespace, content='memories', content_rowid='rowid',
+    tokenize="unicode61 remove_diacritics 2 tokenchars '@.-'''"
+);
+CREATE TRIGGER IF NOT EXISTS memories_ai AFTER INSERT ON memories BEGIN
+    INSERT INTO memory_fts (rowid, terms, namespace) VALUES (new.rowid, new.terms, new.namespace);
+END;
+CREATE TRIGGER IF NOT EXISTS memories_ad AFTER DELETE ON memories BEGIN
+    INSERT INTO memory_fts (memory_fts, rowid, terms, namespace) VALUES ('delete', old.rowid, old.terms, old.namespace);
+END;
+"""
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into lowercase terms. Handles keep their '@' and also index the bare name.
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        token = token.strip(".-'")
+        if not token:
+            continue
+        tokens.append(token)
+        if token.startswith("@") and len(token) > 1:
+            tokens.append(token[1:])
+    return tokens
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+class LexicalIndex:
+    """
+    Host-shared BM25 index over stored memories, in SQLite FTS5.
+
+    Every worker, and a restarted one, searches the same file, so lexical
+    results cover all memories written on the host rather than the ones this
+    process happened to store. Texts are indexed as their tokenize() terms
+    with a tokenizer that keeps @, dots, hyphens and apostrophes inside
+    tokens, and FTS5 ranks with bm25() over the terms column only. Expired
+    memories, and the oldest beyond LEXICAL_INDEX_MAX_DOCS, are pruned as
+    new ones are added.
+    """
+
+    def __init__(self, namespace: str = "", path: str = LEXICAL_INDEX_PATH,
+                 max_docs: int = LEXICAL_INDEX_MAX_DOCS):
+        self.namespace = namespace or "default"
+        self.path = path
+        self.max_docs = max_docs
+        self._local = threading.local()
+        self._adds = 0
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def __len__(self) -> int:
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM memories WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+
+    def add(self, doc_id: str, text: str, metadata: Optional[dict] = None) -> None:
+        """
+        Adds (or replaces) a document.
+
+        Args:
+            doc_id (str): The memory ID.
+            text (str): The text to index.
+            metadata (dict): Stored alongside so lexical-only hits can be returned.
+        """
+        metadata = metadata or {}
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM memories WHERE namespace = ? AND memory_id = ?", (self.namespace, doc_id))
+            conn.execute(
+                "INSERT INTO memories (namespace, memory_id, terms, text, metadata, expires_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (self.namespace, doc_id, " ".join(tokenize(text)), text, json.dumps(metadata),
+                 metadata.get("expires_at"))
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._adds += 1
+        if self._adds % PRUNE_EVERY == 0:
+            self.prune()
+
+    def remove(self, doc_id: str) -> None:
+        """Removes a document if present."""
+        self._connect().execute(
+            "DELETE FROM memories WHERE namespace = ? AND memory_id = ?", (self.namespace, doc_id)
+        )
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """
+        Deletes expired memories (in every namespace) and the oldest beyond max_docs.
+
+        Returns:
+            int: Number of memories deleted.
+        """
+        conn = self._connect()
+        deleted = conn.execute(
+            "DELETE FROM memories WHERE expires_at IS NOT NULL AND expires_at <= ?", (now or time.time(),)
+        ).rowcount
+        excess = conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0] - self.max_docs
+        if excess > 0:
+            deleted += conn.execute(
+                "DELETE FROM memories WHERE rowid IN (SELECT rowid FROM memories ORDER BY rowid LIMIT ?)", (excess,)
+            ).rowcount
+        return deleted
+
+    def get(self, doc_id: str) -> Optional[Tuple[str, dict]]:
+        """Returns the stored (text, metadata) for a document."""
+        row = self._connect().execute(
+            "SELECT text, metadata FROM memories WHERE namespace = ? AND memory_id = ?", (self.namespace, doc_id)
+        ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """
+        Scores documents against the query with BM25.
+
+        Args:
+            query (str): The query text.
+            top_k (int): Number of results to return.
+
+        Returns:
+            list: (doc_id, score) pairs, best first.
+        """
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return []
+        match = f"namespace : {_quote(self.namespace)} AND ({' OR '.join(_quote(term) for term in terms)})"
+        rows = self._connect().execute(
+            "SELECT m.memory_id, -bm25(memory_fts, 1.0, 0.0) FROM memory_fts"
+            " JOIN memories m ON m.rowid = memory_fts.rowid"
+            " WHERE memory_fts MATCH ? ORDER BY bm25(memory_fts, 1.0, 0.0) LIMIT ?",
+            (match, top_k)
+        ).fetchall()
+        return [(memory_id, score) for memory_id, score in rows]
+
+def reciprocal_rank_fusion(rankings: List[List[str]], top_k: int, k: int = 60) -> List[str]:
+    """
+    Fuses several ranked ID lists with reciprocal-rank fusion.
+
+    Each list contributes 1 / (k + rank) per ID, so items ranked well by either
+    retriever rise to the top without having to calibrate their raw scores.
+
+    Args:
+        rankings (list): Ranked lists of IDs, best first.
+        top_k (int): Number of IDs to return.
+        k (int): Damping constant; 60 is the value from the original RRF paper.
+
+    Returns:
+        list: Fused IDs, best first.
+    """
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)[:top_k]
+
+_indexes: Dict[str, LexicalIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_lexical_index(namespace: str = "") -> LexicalIndex:
+    """
+    Returns the process-wide handle on the lexical index for a memory namespace.
+    """
+    index = _indexes.get(namespace)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(namespace)
+            if index is None:
+                index = _indexes[namespace] = LexicalIndex(namespace)
+    return index
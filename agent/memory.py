@@ -3,10 +3,59 @@
 from langchain_community.vectorstores import Pinecone
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_core.documents import Document
-from pinecone_client import index, upsert_data, query_data
+from shared_cache import get_cache, make_key
+from .memory_queue import get_memory_queue
+from .lexical_index import get_lexical_index, reciprocal_rank_fusion
+from .memory_backend import write_vectors, search_vectors
+from .embeddings import embed_query
 import uuid
+import time
+from typing import Optional
 
-def store_memory(text: str, metadata: dict, embedding_model: GoogleGenerativeAIEmbeddings) -> None:
+# Candidates drawn from each retriever per requested result before fusion
+HYBRID_CANDIDATE_MULTIPLIER = 4
+
+def embed_text(text: str, embedding_model: GoogleGenerativeAIEmbeddings) -> list[float]:
+    """
+    Embeds text through the shared cache so each distinct text is embedded once per host.
+
+    Args:
+        text (str): The text to embed.
+        embedding_model: The embedding model to use.
+
+    Returns:
+        list: The embedding vector.
+    """
+    key = make_key(getattr(embedding_model, "model", ""), text)
+    return get_cache().get_or_compute("embedding", key, lambda: embed_query(embedding_model, text))
+
+def memory_namespace(user_id: Optional[str] = None, session_id: Optional[str] = None) -> str:
+    """
+    Returns the Pinecone namespace that holds one user's or session's memories.
+
+    Args:
+        user_id (str): The user the memories belong to.
+        session_id (str): The session the memories belong to, used when there is no user.
+
+    Returns:
+        str: The namespace name; the default namespace when neither is given.
+    """
+    if user_id:
+        return f"user-{user_id}"
+    if session_id:
+        return f"session-{session_id}"
+    return ""
+
+def _memory_metadata(text: str, metadata: dict, ttl_seconds: Optional[float]) -> dict:
+    now = time.time()
+    record = {"text": text, **metadata, "created_at": now}
+    if ttl_seconds:
+        # Expired memories are skipped on retrieval and removed by compaction
+        record["expires_at"] = now + ttl_seconds
+    return record
+
+def store_memory(text: str, metadata: dict, embedding_model: GoogleGenerativeAIEmbeddings,
+                 namespace: str = "", ttl_seconds: Optional[float] = None) -> None:
     """
     Stores the given text and metadata into the Pinecone vector store.
 
@@ -14,46 +63,97 @@ def store_memory(text: str, metadata: dict, embedding_model: GoogleGenerativeAIE
         text (str): The text to store.
         metadata (dict): Additional metadata for the document.
         embedding_model: The embedding model to use.
+        namespace (str): The namespace to store into, see memory_namespace().
+        ttl_seconds (float): Optional lifetime of the memory.
     """
     # Generate embedding for the text
-    embedding = embedding_model.embed_query(text)
+    embedding = embed_text(text, embedding_model)
     
     # Generate a unique ID for this memory
     memory_id = str(uuid.uuid4())
     
-    # Store in Pinecone
-    upsert_data(
-        id=memory_id,
-        vector=embedding,
-        metadata={"text": text, **metadata}
+    # Store in Pinecone (or the local store) and the lexical index
+    write_vectors([(memory_id, embedding, _memory_metadata(text, metadata, ttl_seconds))], namespace=namespace)
+
+def store_memory_async(text: str, metadata: dict, embedding_model: GoogleGenerativeAIEmbeddings,
+                       namespace: str = "", ttl_seconds: Optional[float] = None) -> str:
+    """
+    Queues the given text and metadata for storage without waiting on the
+    embedding call or the Pinecone upsert.
+
+    Args:
+        text (str): The text to store.
+        metadata (dict): Additional metadata for the document.
+        embedding_model: The embedding model to use.
+        namespace (str): The namespace to store into, see memory_namespace().
+        ttl_seconds (float): Optional lifetime of the memory.
+
+    Returns:
+        str: The ID the memory will be stored under.
+    """
+    return get_memory_queue(embedding_model).enqueue(
+        text, _memory_metadata(text, metadata, ttl_seconds), namespace=namespace
     )
 
-def retrieve_memory(query: str, embedding_model: GoogleGenerativeAIEmbeddings, top_k: int = 5) -> list[Document]:
+def retrieve_memory(query: str, embedding_model: GoogleGenerativeAIEmbeddings, top_k: int = 5,
+                    namespace: str = "", hybrid: bool = True) -> list[Document]:
     """
     Retrieves similar memories from the Pinecone vector store based on the query.
 
+    With hybrid retrieval the dense results are fused with BM25 matches from the
+    host-shared lexical index, so exact channel names, titles and handles are
+    found even when their embeddings are not close to the query's.
+
     Args:
         query (str): The input query text.
         embedding_model: The embedding model used for similarity search.
         top_k (int): Number of results to return.
+        namespace (str): The namespace to search, see memory_namespace().
+        hybrid (bool): Fuse vector and lexical results with reciprocal-rank fusion.
 
     Returns:
         list: A list of retrieved Document objects.
     """
     # Generate embedding for the query
-    query_embedding = embedding_model.embed_query(query)
+    query_embedding = embed_text(query, embedding_model)
     
-    # Query Pinecone
-    results = query_data(vector=query_embedding, top_k=top_k)
+    lexical_index = get_lexical_index(namespace)
+    hybrid = hybrid and len(lexical_index) > 0
+    candidates = top_k * HYBRID_CANDIDATE_MULTIPLIER if hybrid else top_k
     
-    # Convert results to Document objects
-    documents = []
+    # Query Pinecone (or the local store)
+    results = search_vectors(query_embedding, top_k=candidates, namespace=namespace)
+    
+    now = time.time()
+    records = {}
     for match in results:
+        if match.metadata and match.metadata.get("expires_at", now + 1) <= now:
+            continue
         if match.metadata and "text" in match.metadata:
-            doc = Document(
-                page_content=match.metadata["text"],
-                metadata={k: v for k, v in match.metadata.items() if k != "text"}
-            )
-            documents.append(doc)
+            records[match.id] = match.metadata
+    ranked_ids = list(records)
+    
+    if hybrid:
+        lexical_ids = []
+        for memory_id, _ in lexical_index.search(query, top_k=candidates):
+            stored = lexical_index.get(memory_id)
+            if stored is None:  # removed by another worker since the search
+                continue
+            _, metadata = stored
+            if metadata.get("expires_at", now + 1) <= now:
+                continue
+            records.setdefault(memory_id, metadata)
+            lexical_ids.append(memory_id)
+        ranked_ids = reciprocal_rank_fusion([ranked_ids, lexical_ids], top_k=top_k)
+    
+    # Convert results to Document objects
+    documents = []
+    for memory_id in ranked_ids[:top_k]:
+        metadata = records[memory_id]
+        doc = Document(
+            page_content=metadata["text"],
+            metadata={k: v for k, v in metadata.items() if k != "text"}
+        )
+        documents.append(doc)
     
     return documents
@@ -0,0 +1,112 @@
+# memory_backend.py
+
+import os
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from pinecone_client import (
+    upsert_batch, query_data, fetch_data, list_ids, update_metadata, delete_batch, namespace_sizes
+)
+from .embedding_store import get_embedding_store
+from .ann_index import ANN_INDEX_DIR, get_ann_index
+from .lexical_index import get_lexical_index
+
+# "pinecone" (default), "local" for the quantized on-disk embedding store (exact
+# search) or "ann" for the on-disk IVF index (approximate, for large corpora)
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "pinecone").lower()
+LOCAL_MEMORY_DIR = os.getenv("LOCAL_MEMORY_DIR", "memory_store")
+
+def _local_store(namespace: str = ""):
+    """The on-disk store for a namespace, or None when memories live in Pinecone."""
+    if MEMORY_BACKEND == "local":
+        return get_embedding_store(LOCAL_MEMORY_DIR, namespace)
+    if MEMORY_BACKEND == "ann":
+        return get_ann_index(ANN_INDEX_DIR, namespace)
+    return None
+
+def write_vectors(vectors: List[Tuple[str, List[float], Dict[str, Any]]], namespace: str = "") -> None:
+    """
+    Writes (id, vector, metadata) tuples to the configured vector backend and
+    adds their texts to the lexical index.
+
+    Args:
+        vectors (list): Memories to store; metadata must include "text".
+        namespace (str): The namespace to store into.
+    """
+    store = _local_store(namespace)
+    if store is not None:
+        store.add(vectors)
+    else:
+        upsert_batch(vectors, namespace=namespace)
+    lexical_index = get_lexical_index(namespace)
+    for memory_id, _, metadata in vectors:
+        lexical_index.add(memory_id, metadata["text"], metadata)
+
+def search_vectors(vector: List[float], top_k: int = 5, namespace: str = "") -> list:
+    """
+    Queries the configured vector backend.
+
+    Returns:
+        list: Matches with id, score and metadata attributes.
+    """
+    store = _local_store(namespace)
+    if store is not None:
+        return store.query(vector, top_k=top_k)
+    return query_data(vector=vector, top_k=top_k, namespace=namespace)
+
+def load_vectors(namespace: str = "", batch_size: int = 100) -> tuple:
+    """
+    Loads every vector and its metadata from a namespace of the configured backend.
+
+    Returns:
+        tuple: (ids, float32 matrix of vectors, list of metadata dicts)
+    """
+    loaded_ids, vectors, metadata = [], [], []
+    store = _local_store(namespace)
+    if store is not None:
+        for memory_id, vector, meta in store.records():
+            loaded_ids.append(memory_id)
+            vectors.append(vector)
+            metadata.append(meta)
+    else:
+        ids = list_ids(namespace)
+        for start in range(0, len(ids), batch_size):
+            records = fetch_data(ids[start:start + batch_size], namespace=namespace)
+            for memory_id, record in records.items():
+                loaded_ids.append(memory_id)
+                vectors.append(record.values)
+                metadata.append(dict(record.metadata or {}))
+    matrix = np.asarray(vectors, dtype=np.float32) if vectors else np.zeros((0, 0), dtype=np.float32)
+    return loaded_ids, matrix, metadata
+
+def update_vector_metadata(memory_id: str, metadata: Dict[str, Any], namespace: str = "") -> None:
+    """Sets selected metadata fields of a stored memory."""
+    store = _local_store(namespace)
+    if store is not None:
+        store.update_metadata(memory_id, metadata)
+    else:
+        update_metadata(memory_id, metadata, namespace=namespace)
+
+def delete_vectors(ids: List[str], namespace: str = "") -> None:
+    """Deletes memories from the configured vector backend and the lexical index."""
+    store = _local_store(namespace)
+    if store is not None:
+        store.delete(ids)
+    else:
+        delete_batch(ids, namespace=namespace)
+    lexical_index = get_lexical_index(namespace)
+    for memory_id in ids:
+        lexical_index.remove(memory_id)
+
+def vector_namespace_sizes() -> Dict[str, int]:
+    """
+    Returns the number of stored memories per namespace of the configured backend.
+    """
+    if MEMORY_BACKEND not in ("local", "ann"):
+        return namespace_sizes()
+    root = LOCAL_MEMORY_DIR if MEMORY_BACKEND == "local" else ANN_INDEX_DIR
+    if not os.path.isdir(root):
+        return {}
+    return {
+        name: len(_local_store(name)) for name in sorted(os.listdir(root))
+        if os.path.exists(os.path.join(root, name, "meta.json"))
+    }
@@ -0,0 +1,157 @@
+# memory_maintenance.py
+
+import time
+import logging
+import argparse
+from typing import Any, Dict, List, Optional
+import numpy as np
+from .memory_backend import (
+    load_vectors, search_vectors, update_vector_metadata, delete_vectors, vector_namespace_sizes
+)
+
+logger = logging.getLogger(__name__)
+
+# Cosine similarity above which two memories are treated as the same memory
+DUPLICATE_THRESHOLD = 0.97
+FETCH_BATCH_SIZE = 100
+LATENCY_SAMPLES = 5
+
+def _measure_query_latency(namespace: str, matrix: np.ndarray, samples: int = LATENCY_SAMPLES) -> Optional[float]:
+    """
+    Measures the mean latency in milliseconds of top-5 queries against a namespace,
+    using stored vectors as the query vectors.
+    """
+    if len(matrix) == 0:
+        return None
+    picks = np.random.default_rng(0).choice(len(matrix), size=min(samples, len(matrix)), replace=False)
+    timings = []
+    for i in picks:
+        start = time.perf_counter()
+        search_vectors(matrix[i].tolist(), top_k=5, namespace=namespace)
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(sum(timings) / len(timings), 2)
+
+def find_duplicates(matrix: np.ndarray, metadata: List[dict],
+                    threshold: float = DUPLICATE_THRESHOLD) -> Dict[int, List[int]]:
+    """
+    Groups near-duplicate memories by cosine similarity of their vectors.
+
+    Memories are visited newest first; each memory not yet claimed keeps every
+    older memory whose similarity to it is at least ``threshold``.
+
+    Args:
+        matrix: One vector per row.
+        metadata: Metadata per row, used for the created_at ordering.
+        threshold: Minimum cosine similarity for a duplicate.
+
+    Returns:
+        dict: Row index of each kept memory -> row indices it absorbs.
+    """
+    if len(matrix) == 0:
+        return {}
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    unit = matrix / np.maximum(norms, 1e-12)
+    order = sorted(range(len(matrix)), key=lambda i: metadata[i].get("created_at", 0), reverse=True)
+    unit = unit[order]
+
+    claimed = np.zeros(len(order), dtype=bool)
+    groups: Dict[int, List[int]] = {}
+    for position in range(len(order)):
+        if claimed[position]:
+            continue
+        # Compare this memory against all later (older) unclaimed ones in one pass
+        similarities = unit[position + 1:] @ unit[position]
+        hits = np.nonzero((similarities >= threshold) & ~claimed[position + 1:])[0] + position + 1
+        if len(hits):
+            claimed[hits] = True
+            groups[order[position]] = [order[h] for h in hits]
+    return groups
+
+def compact_namespace(namespace: str = "", threshold: float = DUPLICATE_THRESHOLD,
+                      dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Expires memories past their TTL and merges near-duplicates in one namespace
+    of the configured backend (Pinecone, or the on-disk local/ann stores).
+
+    Args:
+        namespace: The namespace to compact.
+        threshold: Minimum cosine similarity for two memories to be merged.
+        dry_run: Report what would change without writing.
+
+    Returns:
+        dict: Counts of expired and merged memories and query latency before/after.
+    """
+    ids, matrix, metadata = load_vectors(namespace, batch_size=FETCH_BATCH_SIZE)
+    latency_before = _measure_query_latency(namespace, matrix)
+
+    now = time.time()
+    expired = [i for i, meta in enumerate(metadata) if meta.get("expires_at", now + 1) <= now]
+    expired_rows = set(expired)
+    live = [i for i in range(len(ids)) if i not in expired_rows]
+
+    groups = find_duplicates(matrix[live], [metadata[i] for i in live], threshold) if live else {}
+    # Map group indices (positions within `live`) back to namespace rows
+    merged = {live[keep]: [live[d] for d in dupes] for keep, dupes in groups.items()}
+
+    to_delete = [ids[i] for i in expired]
+    for keep, dupes in merged.items():
+        to_delete.extend(ids[d] for d in dupes)
+        if not dry_run:
+            kept = metadata[keep]
+            update_vector_metadata(ids[keep], {
+                "merged_count": kept.get("merged_count", 1) + sum(metadata[d].get("merged_count", 1) for d in dupes),
+                "first_seen_at": min(metadata[i].get("created_at", now) for i in [keep, *dupes]),
+            }, namespace=namespace)
+
+    if to_delete and not dry_run:
+        delete_vectors(to_delete, namespace=namespace)
+
+    deleted_ids = set(to_delete)
+    remaining = [i for i in live if ids[i] not in deleted_ids]
+    latency_after = latency_before if dry_run else _measure_query_latency(namespace, matrix[remaining])
+    return {
+        "namespace": namespace,
+        "vectors_before": len(ids),
+        "expired": len(expired),
+        "merged": len(to_delete) - len(expired),
+        "vectors_after": len(ids) - (0 if dry_run else len(to_delete)),
+        "query_ms_before": latency_before,
+        "query_ms_after": latency_after,
+    }
+
+def compact_memories(namespaces: Optional[List[str]] = None, threshold: float = DUPLICATE_THRESHOLD,
+                     dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Runs compaction over the given namespaces, or over every namespace in the index.
+
+    Returns:
+        dict: Index size before/after and the per-namespace reports.
+    """
+    sizes_before = vector_namespace_sizes()
+    targets = namespaces if namespaces is not None else list(sizes_before)
+    reports = []
+    for namespace in targets:
+        logger.info("Compacting memory namespace '%s'", namespace)
+        reports.append(compact_namespace(namespace, threshold=threshold, dry_run=dry_run))
+    sizes_after = vector_namespace_sizes()
+    return {
+        "index_size_before": sum(sizes_before.values()),
+        "index_size_after": sum(sizes_after.values()),
+        "namespaces": reports,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Expire and deduplicate stored memories")
+    parser.add_argument("--namespace", action="append", help="Namespace to compact (repeatable, default: all)")
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD, help="Cosine similarity for duplicates")
+    parser.add_argument("--dry-run", action="store_true", help="Report without deleting or merging")
+    args = parser.parse_args()
+
+    report = compact_memories(args.namespace, threshold=args.threshold, dry_run=args.dry_run)
+    print(f"Index size: {report['index_size_before']} -> {report['index_size_after']} vectors")
+    for ns in report["namespaces"]:
+        print(
+            f"  '{ns['namespace']}': {ns['vectors_before']} -> {ns['vectors_after']} "
+            f"(expired {ns['expired']}, merged {ns['merged']}), "
+            f"query {ns['query_ms_before']}ms -> {ns['query_ms_after']}ms"
+        )
@@ -0,0 +1,183 @@
+# memory_queue.py
+
+import os
+import time
+import uuid
+import queue
+import atexit
+import logging
+import threading
+from typing import Optional
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from shared_cache import get_cache, make_key
+from metrics import gauge, histogram, counter
+from .memory_backend import write_vectors
+from .embeddings import embed_documents
+
+logger = logging.getLogger(__name__)
+
+MEMORY_QUEUE_MAX_SIZE = int(os.getenv("MEMORY_QUEUE_MAX_SIZE", "1000"))
+MEMORY_QUEUE_BATCH_SIZE = int(os.getenv("MEMORY_QUEUE_BATCH_SIZE", "32"))
+MEMORY_QUEUE_MAX_AGE = float(os.getenv("MEMORY_QUEUE_MAX_AGE", "2.0"))
+
+queue_depth = gauge("memory_queue_depth", "Memories waiting to be embedded and upserted")
+flush_latency = histogram("memory_queue_flush_seconds", "Time to embed and upsert one batch of memories")
+flush_size = histogram("memory_queue_flush_size", "Memories per flushed batch", buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+flush_failures = counter("memory_queue_failed_total", "Memories dropped because their batch failed")
+
+_SHUTDOWN = object()
+
+class MemoryWriteQueue:
+    """
+    Write-behind queue for memories.
+
+    Callers enqueue (text, metadata) and return immediately; a background thread
+    drains the queue in batches, embeds each batch with one embed_documents call
+    and writes it to Pinecone in one upsert request. A batch is flushed when it reaches
+    ``batch_size`` items or when its oldest item is ``max_age`` seconds old.
+    The queue is bounded, so a stalled upstream pushes back on producers instead
+    of growing without limit.
+    """
+
+    def __init__(self, embedding_model: GoogleGenerativeAIEmbeddings,
+                 max_size: int = MEMORY_QUEUE_MAX_SIZE,
+                 batch_size: int = MEMORY_QUEUE_BATCH_SIZE,
+                 max_age: float = MEMORY_QUEUE_MAX_AGE):
+        self.embedding_model = embedding_model
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self._queue: queue.Queue = queue.Queue(maxsize=max_size)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="memory-write-behind", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, text: str, metadata: dict, namespace: str = "", timeout: Optional[float] = None) -> str:
+        """
+        Queue a memory for storage.
+
+        Args:
+            text (str): The text to store.
+            metadata (dict): Metadata to store with the text (the text is added).
+            namespace (str): The namespace to store into.
+            timeout (float): Seconds to wait for room when the queue is full;
+                None blocks until there is room.
+
+        Returns:
+            str: The ID the memory will be stored under.
+
+        Raises:
+            queue.Full: If the queue stayed full for ``timeout`` seconds.
+        """
+        if self._closed:
+            raise RuntimeError("Memory queue is closed")
+        memory_id = str(uuid.uuid4())
+        self._queue.put((memory_id, text, metadata, namespace), timeout=timeout)
+        queue_depth.set(self._queue.qsize())
+        return memory_id
+
+    def close(self, timeout: float = 30.0) -> None:
+        """Stop accepting memories and wait for everything queued to be flushed."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_SHUTDOWN)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning("Memory queue did not drain within %ss; %d items lost", timeout, self._queue.qsize())
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _SHUTDOWN:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_age
+            shutdown = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _SHUTDOWN:
+                    shutdown = True
+                    break
+                batch.append(item)
+            queue_depth.set(self._queue.qsize())
+            self._flush(batch)
+            if shutdown:
+                # Anything enqueued before close() is still ahead of us; drain it
+                self._drain()
+                return
+
+    def _drain(self) -> None:
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _SHUTDOWN:
+                continue
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+        queue_depth.set(0)
+
+    def _flush(self, batch: list) -> None:
+        start = time.perf_counter()
+        try:
+            cache = get_cache()
+            model_name = getattr(self.embedding_model, "model", "")
+            keys = [make_key(model_name, item[1]) for item in batch]
+            embeddings = [cache.get("embedding", key) for key in keys]
+
+            # Embed only the texts the shared cache has not seen, in one call
+            missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+            if missing:
+                fresh = embed_documents(self.embedding_model, [batch[i][1] for i in missing])
+                for i, embedding in zip(missing, fresh):
+                    embeddings[i] = embedding
+                    cache.set("embedding", keys[i], embedding)
+
+            # One upsert per namespace; a batch almost always shares one
+            by_namespace: dict = {}
+            for (memory_id, text, metadata, namespace), embedding in zip(batch, embeddings):
+                by_namespace.setdefault(namespace, []).append(
+                    (memory_id, embedding, {"text": text, **metadata})
+                )
+            for namespace, vectors in by_namespace.items():
+                write_vectors(vectors, namespace=namespace)
+            flush_size.observe(len(batch))
+        except Exception as e:
+            flush_failures.inc(len(batch))
+            logger.error("Failed to flush %d memories: %s", len(batch), e)
+        finally:
+            flush_latency.observe(time.perf_counter() - start)
+
+_memory_queue: Optional[MemoryWriteQueue] = None
+_memory_queue_lock = threading.Lock()
+
+def get_memory_queue(embedding_model: GoogleGenerativeAIEmbeddings) -> MemoryWriteQueue:
+    """
+    Returns the process-wide write-behind queue, starting it on first use.
+    """
+    global _memory_queue
+    if _memory_queue is None:
+        with _memory_queue_lock:
+            if _memory_queue is None:
+                _memory_queue = MemoryWriteQueue(embedding_model)
+                atexit.register(_memory_queue.close)
+    return _memory_queue
+
+def shutdown_memory_queue(timeout: float = 30.0) -> None:
+    """
+    Drains and stops the write-behind queue if it was started.
+    """
+    if _memory_queue is not None:
+        _memory_queue.close(timeout)
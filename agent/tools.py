@@ -1,6 +1,8 @@
-import requests
 from dotenv import load_dotenv
 import os
+from concurrent.futures import ThreadPoolExecutor
+from .trending import search_trending, search_trending_many, TRENDING_CONCURRENCY
+from prompts import script_prompt
 
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -10,18 +12,23 @@ from langchain.chat_models import ChatGoogleGenerativeAI
 llm = ChatGoogleGenerativeAI(model="gemini-1.5-pro-latest", google_api_key=GEMINI_API_KEY)
 
 def search_trending_topics(topic):
-    url = f"https://serper.dev/search"
-    headers = {"X-API-KEY": "your_serper_key_here"}  # Replace this if you get access
-    params = {"q": topic}
-    try:
-        response = requests.get(url, headers=headers, params=params)
-        return str(response.json())
-    except:
-        return "Unable to fetch trending topics."
+    return [result.to_dict() for result in search_trending(topic)]
 
 def generate_script(topic):
-    prompt = f"""
-    Write a detailed and engaging YouTube script for the topic: {topic}.
-    Include: Hook, Introduction, 3 Key Points, and a Conclusion with CTA.
+    return llm.invoke(script_prompt(topic)).content
+
+def build_content_calendar(topics, max_workers=TRENDING_CONCURRENCY):
+    """
+    Scripts for a whole content calendar: one concurrent fan-out for the
+    trending searches, then one for the scripts, instead of a serial call per topic.
     """
-    return llm.invoke(prompt).content
+    trending = search_trending_many(topics, max_workers=max_workers)
+    topics = list(trending)
+    if not topics:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(topics))) as executor:
+        scripts = executor.map(lambda topic: llm.invoke(script_prompt(topic, trending[topic])).content, topics)
+        return [
+            {"topic": topic, "trending": [result.to_dict() for result in trending[topic]], "script": script}
+            for topic, script in zip(topics, scripts)
+        ]
@@ -0,0 +1,118 @@
+# trending.py
+
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from shared_cache import get_cache, make_key
+
+logger = logging.getLogger(__name__)
+
+# Point SERPER_URL at a local stub server to test without the real API
+SERPER_URL = os.getenv("SERPER_URL", "https://google.serper.dev/search")
+SERPER_API_KEY = os.getenv("SERPER_API_KEY", "")
+TRENDING_TTL = float(os.getenv("TRENDING_TTL", str(60 * 60)))
+TRENDING_CONCURRENCY = int(os.getenv("TRENDING_CONCURRENCY", "8"))
+TRENDING_TIMEOUT = float(os.getenv("TRENDING_TIMEOUT", "10"))
+TRENDING_MAX_RESULTS = int(os.getenv("TRENDING_MAX_RESULTS", "10"))
+
+class TrendingResult:
+    """
+    One search result for a topic.
+    """
+    __slots__ = ("topic", "title", "link", "snippet", "position", "date")
+
+    def __init__(self, topic: str, title: str, link: str, snippet: str, position: int, date: str = ""):
+        self.topic = topic
+        self.title = title
+        self.link = link
+        self.snippet = snippet
+        self.position = position
+        self.date = date
+
+    @classmethod
+    def from_api(cls, topic: str, item: Dict[str, Any]) -> "TrendingResult":
+        """
+        Build a result from one "organic" entry of a Serper search response.
+        """
+        return cls(
+            topic=topic,
+            title=item.get("title", ""),
+            link=item.get("link", ""),
+            snippet=item.get("snippet", ""),
+            position=int(item.get("position", 0)),
+            date=item.get("date", "")
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """
+    Shared HTTP session: keep-alive connections pooled up to the fan-out width,
+    with retries on rate limiting and transient server errors.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            retry = Retry(total=2, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504),
+                          allowed_methods=frozenset({"GET", "POST"}))
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=TRENDING_CONCURRENCY, max_retries=retry)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"X-API-KEY": SERPER_API_KEY, "Content-Type": "application/json"})
+            _session = session
+    return _session
+
+def _fetch_topic(topic: str) -> Optional[List[Dict[str, Any]]]:
+    try:
+        response = get_session().post(
+            SERPER_URL, json={"q": topic, "num": TRENDING_MAX_RESULTS}, timeout=TRENDING_TIMEOUT
+        )
+        response.raise_for_status()
+        organic = response.json().get("organic", [])
+        return [TrendingResult.from_api(topic, item).to_dict() for item in organic[:TRENDING_MAX_RESULTS]]
+    except (requests.RequestException, ValueError) as e:
+        logger.error("Error fetching trending topics for %s: %s", topic, e)
+        return None
+
+def search_trending(topic: str) -> List[TrendingResult]:
+    """
+    Search results for a topic, cached per topic for TRENDING_TTL seconds.
+
+    Args:
+        topic: The topic to search for
+
+    Returns:
+        Parsed results; empty if the search failed (failures are not cached)
+    """
+    items = get_cache().get_or_compute(
+        "trending", make_key(topic.strip().lower()), lambda: _fetch_topic(topic), ttl=TRENDING_TTL
+    )
+    return [TrendingResult(**item) for item in items or []]
+
+def search_trending_many(topics: List[str], max_workers: int = TRENDING_CONCURRENCY) -> Dict[str, List[TrendingResult]]:
+    """
+    Search many topics concurrently, at most max_workers requests in flight.
+
+    Args:
+        topics: Topics to search for; duplicates are fetched once
+        max_workers: Concurrency limit for the fan-out
+
+    Returns:
+        Results keyed by topic, in the order given
+    """
+    unique = list(dict.fromkeys(topics))
+    if not unique:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unique))) as executor:
+        results = dict(zip(unique, executor.map(search_trending, unique)))
+    return results
@@ -0,0 +1,264 @@
+import os
+import math
+import time
+import heapq
+import asyncio
+import ipaddress
+import logging
+import itertools
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException, Request
+from metrics import counter, gauge, histogram
+
+logger = logging.getLogger(__name__)
+
+def _parse_limits(value: str) -> Dict[str, int]:
+    limits = {}
+    for part in value.split(","):
+        if "=" in part:
+            name, limit = part.split("=", 1)
+            limits[name.strip()] = int(limit)
+    return limits
+
+# Concurrent requests allowed against each upstream, per worker process
+UPSTREAM_LIMITS = _parse_limits(os.getenv("UPSTREAM_LIMITS", "gemini=8,youtube=16"))
+# Waiting requests beyond this are rejected outright
+ADMISSION_QUEUE_MAX = int(os.getenv("ADMISSION_QUEUE_MAX", "64"))
+# Requests whose expected (or actual) queue wait exceeds this are shed with 503
+ADMISSION_LATENCY_TARGET = float(os.getenv("ADMISSION_LATENCY_TARGET", "2.0"))
+# Per-client token bucket: sustained requests/sec and burst size (0 disables)
+CLIENT_RATE = float(os.getenv("CLIENT_RATE", "2.0"))
+CLIENT_BURST = float(os.getenv("CLIENT_BURST", "10"))
+MAX_TRACKED_CLIENTS = 10000
+# Comma-separated proxy addresses or CIDRs whose X-Forwarded-For / X-Client-Id are believed
+TRUSTED_PROXIES = [ipaddress.ip_network(part.strip(), strict=False)
+                   for part in os.getenv("TRUSTED_PROXIES", "").split(",") if part.strip()]
+
+# Lower value is served first; clients may demote themselves with X-Request-Class
+PRIORITIES = {"interactive": 0, "analytics": 1, "batch": 2}
+
+QUEUE_WAIT = histogram("admission_queue_wait_seconds", "Time requests spent waiting for admission")
+QUEUE_DEPTH = gauge("admission_queue_depth", "Requests waiting for admission")
+REJECTED = counter("admission_rejected_total", "Requests rejected by admission control")
+IN_FLIGHT = gauge("upstream_in_flight", "Admitted requests holding an upstream slot")
+
+class Overloaded(HTTPException):
+    """
+    Raised when a request is shed; carries a Retry-After header.
+    """
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(status_code=status_code, detail=detail,
+                         headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+class TokenBuckets:
+    """
+    One token bucket per client, refilled lazily on each request.
+    """
+
+    def __init__(self, rate: float = CLIENT_RATE, burst: float = CLIENT_BURST,
+                 max_clients: int = MAX_TRACKED_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, client: str) -> float:
+        """
+        Take a token for the client. Returns 0 on success, else seconds until one is available.
+        """
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[client] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+class AdmissionController:
+    """
+    Per-upstream concurrency limits with a bounded priority wait queue.
+
+    A request names the upstreams it will call and holds one slot on each
+    while it runs. When a slot is busy the request waits in a heap ordered by
+    priority, then arrival. The expected wait is estimated from the queue
+    ahead of it and a moving average of hold times; if that already exceeds
+    the latency target the request is rejected immediately instead of
+    queueing into a timeout.
+    """
+
+    def __init__(self, limits: Dict[str, int] = None, queue_max: int = ADMISSION_QUEUE_MAX,
+                 latency_target: float = ADMISSION_LATENCY_TARGET):
+        self.limits = dict(UPSTREAM_LIMITS if limits is None else limits)
+        self.queue_max = queue_max
+        self.latency_target = latency_target
+        self.in_use: Dict[str, int] = {name: 0 for name in self.limits}
+        self.hold_time: Dict[str, float] = {name: 0.5 for name in self.limits}
+        self._waiters: List[list] = []
+        self._sequence = itertools.count()
+
+    def _fits(self, upstreams: Tuple[str, ...]) -> bool:
+        return all(self.in_use[name] < self.limits[name] for name in upstreams if name in self.limits)
+
+    def _take(self, upstreams: Tuple[str, ...]) -> None:
+        for name in upstreams:
+            if name in self.limits:
+                self.in_use[name] += 1
+                IN_FLIGHT.inc(labels={"upstream": name})
+
+    def expected_wait(self, upstreams: Tuple[str, ...], priority: int) -> float:
+        ahead = sum(1 for entry in self._waiters if entry[0] <= priority and not entry[3].done())
+        return max(
+            ((ahead + 1) * self.hold_time[name] / self.limits[name] for name in upstreams if name in self.limits),
+            default=0.0
+        )
+
+    async def acquire(self, route: str, upstreams: Tuple[str, ...], priority: int) -> None:
+        start = time.monotonic()
+        if not self._waiters and self._fits(upstreams):
+            self._take(upstreams)
+            QUEUE_WAIT.observe(0.0, labels={"route": route})
+            return
+
+        expected = self.expected_wait(upstreams, priority)
+        if len(self._waiters) >= self.queue_max or expected > self.latency_target:
+            REJECTED.inc(labels={"route": route, "reason": "queue"})
+            raise Overloaded(503, "Server is overloaded, retry later", expected)
+
+        future = asyncio.get_running_loop().create_future()
+        entry = [priority, next(self._sequence), upstreams, future]
+        heapq.heappush(self._waiters, entry)
+        QUEUE_DEPTH.set(len(self._waiters))
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.latency_target)
+        except asyncio.TimeoutError:
+            if future.done():
+                # Granted in the same tick the timeout fired; keep the slot
+                pass
+            else:
+                future.cancel()
+                self._remove(entry)
+                REJECTED.inc(labels={"route": route, "reason": "timeout"})
+                raise Overloaded(503, "Server is overloaded, retry later", self.expected_wait(upstreams, priority))
+        except asyncio.CancelledError:
+            # Client went away while queued; give back a slot if one was granted meanwhile
+            if future.done() and not future.cancelled():
+                self.release(upstreams, 0.0)
+            else:
+                future.cancel()
+                self._remove(entry)
+            raise
+        finally:
+            QUEUE_DEPTH.set(len(self._waiters))
+        QUEUE_WAIT.observe(time.monotonic() - start, labels={"route": route})
+
+    def _remove(self, entry: list) -> None:
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+
+    def release(self, upstreams: Tuple[str, ...], held: float) -> None:
+        for name in upstreams:
+            if name in self.limits:
+                self.in_use[name] -= 1
+                IN_FLIGHT.dec(labels={"upstream": name})
+                if held > 0:
+                    self.hold_time[name] = 0.8 * self.hold_time[name] + 0.2 * held
+        # Strict priority: grant from the head until it no longer fits
+        while self._waiters:
+            entry = self._waiters[0]
+            if entry[3].done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._fits(entry[2]):
+                break
+            heapq.heappop(self._waiters)
+            self._take(entry[2])
+            entry[3].set_result(None)
+        QUEUE_DEPTH.set(len(self._waiters))
+
+_controller: Optional[AdmissionController] = None
+_buckets: Optional[TokenBuckets] = None
+
+def get_controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController()
+    return _controller
+
+def _trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+def client_key(request: Request) -> str:
+    """
+    Identify the caller by peer address.
+
+    Headers are client-controlled, so X-Client-Id and X-Forwarded-For are
+    only honoured when the peer is one of TRUSTED_PROXIES; the client is then
+    the nearest forwarded address that is not itself a trusted proxy.
+    """
+    peer = request.client.host if request.client else "unknown"
+    if not _trusted(peer):
+        return peer
+    client_id = request.headers.get("x-client-id")
+    if client_id:
+        return client_id
+    hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _trusted(hop):
+            return hop
+    return hops[0] if hops else peer
+
+def request_priority(request: Request, default: str) -> int:
+    """
+    The route's priority class, or a lower one if the client asks for it.
+    """
+    priority = PRIORITIES[default]
+    requested = PRIORITIES.get(request.headers.get("x-request-class", ""), priority)
+    return max(priority, requested)
+
+def rate_limit(request: Request, route: str) -> None:
+    """
+    Take a token from the client's bucket, or raise Overloaded(429).
+
+    admit() does this first; routes that hold no upstream slots (e.g. enqueueing
+    a job) call it directly.
+    """
+    global _buckets
+    if CLIENT_RATE > 0:
+        if _buckets is None:
+            _buckets = TokenBuckets()
+        wait = _buckets.take(client_key(request))
+        if wait > 0:
+            REJECTED.inc(labels={"route": route, "reason": "rate_limit"})
+            raise Overloaded(429, "Too many requests", wait)
+
+@asynccontextmanager
+async def admit(request: Request, route: str, upstreams: Tuple[str, ...], priority: str = "interactive"):
+    """
+    Hold upstream slots for the duration of a request, or raise Overloaded.
+
+    Usage:
+        async with admit(request, "/api/chat", ("gemini",)):
+            result = await run_in_threadpool(run_agent, question)
+    """
+    rate_limit(request, route)
+
+    controller = get_controller()
+    await controller.acquire(route, upstreams, request_priority(request, priority))
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        controller.release(upstreams, time.monotonic() - start)
@@ -1,16 +1,20 @@
 import os
+import re
 import logging
 import google.generativeai as genai
 from dotenv import load_dotenv
-from youtube_utils import get_channel_info, get_latest_videos, extract_channel_name
-from pinecone import Pinecone, ServerlessSpec
-from typing import Dict, Any, Optional
-
-# Configure logging with more detailed format
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from youtube_utils import get_channel_info, get_channel_record, get_latest_videos, extract_channel_name, add_snapshot_listener
+from search_index import get_search_index, index_snapshot
+from leaderboards import update_leaderboards
+from digests import get_digest_service, analysis_prompt, analyzed_channel
+from prompts import script_prompt
+from shared_cache import get_cache, make_key
+from pinecone_client import get_index
+from transport import recorded, RECORDING, REPLAYING
+from logging_setup import configure_logging, stage
+from typing import Callable, Dict, Any, Iterator, Optional
+
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Load environment variables
@@ -27,7 +31,7 @@ required_vars = [
 
 for var in required_vars:
     if not os.getenv(var):
-        logger.error(f"Missing required environment variable: {var}")
+        logger.error("Missing required environment variable: %s", var)
         raise EnvironmentError(f"Missing required environment variable: {var}")
 
 # Initialize Gemini
@@ -37,52 +41,78 @@ try:
     model = genai.GenerativeModel('gemini-pro')
     logger.info("Gemini initialized successfully")
 except Exception as e:
-    logger.error(f"Failed to initialize Gemini: {str(e)}")
+    logger.error("Failed to initialize Gemini: %s", e)
     raise
 
-# Initialize Pinecone
+# Initialize Pinecone (index name, dimension and metric come from pinecone_client)
 try:
     logger.info("Initializing Pinecone...")
-    pc = Pinecone(
-        api_key=os.getenv("PINECONE_API_KEY")
-    )
-    
-    # Check if index exists, create if it doesn't
-    if os.getenv("PINECONE_INDEX") not in pc.list_indexes().names():
-        pc.create_index(
-            name=os.getenv("PINECONE_INDEX"),
-            dimension=1536,
-            metric='euclidean',
-            spec=ServerlessSpec(
-                cloud=os.getenv("PINECONE_CLOUD"),
-                region=os.getenv("PINECONE_REGION")
-            )
-        )
-    
-    index = pc.Index(os.getenv("PINECONE_INDEX"))
+    index = get_index()
     logger.info("Pinecone initialized successfully")
 except Exception as e:
-    logger.error(f"Failed to initialize Pinecone: {str(e)}")
+    logger.error("Failed to initialize Pinecone: %s", e)
     raise
 
+# Everything fetched from YouTube is added to the local full-text index and leaderboards
+add_snapshot_listener(index_snapshot)
+add_snapshot_listener(update_leaderboards)
+
+# "which of MrBeast's videos mention Minecraft", "which videos by mkbhd talk about iPhone"
+MENTION_PATTERNS = [
+    re.compile(r"(?:which|what)\s+(?:of\s+)?(?P<channel>[\w .-]+?)(?:'s)?\s+videos?\s+"
+               r"(?:mention|talk about|are about|feature|cover)s?\s+(?P<term>.+?)[?.!]*$", re.IGNORECASE),
+    re.compile(r"(?:which|what)\s+videos?\s+(?:from|by|of)\s+(?P<channel>[\w .-]+?)\s+"
+               r"(?:mention|talk about|are about|feature|cover)s?\s+(?P<term>.+?)[?.!]*$", re.IGNORECASE),
+]
+
+@recorded("gemini")
+def generate_text(prompt: str) -> str:
+    """
+    Generate a Gemini completion and return its text.
+    """
+    return model.generate_content(prompt).text
+
+def stream_text(prompt: str) -> Iterator[str]:
+    """
+    Generate a Gemini completion as it is produced, chunk by chunk.
+
+    Cached answers and recorded/replayed sessions come back as a single chunk.
+    """
+    cache = get_cache()
+    key = make_key("stream", prompt)
+    cached = cache.get("answer", key)
+    if cached is not None:
+        yield cached
+        return
+    chunks = []
+    if RECORDING or REPLAYING:
+        chunks.append(generate_text(prompt))
+        yield chunks[0]
+    else:
+        for chunk in model.generate_content(prompt, stream=True):
+            if chunk.text:
+                chunks.append(chunk.text)
+                yield chunk.text
+    cache.set("answer", key, "".join(chunks))
+
 def analyze_youtube_query(query: str) -> Dict[str, Any]:
     """
     Analyze a YouTube-related query and fetch relevant information.
     """
     try:
-        logger.info(f"Analyzing YouTube query: {query}")
+        logger.info("Analyzing YouTube query: %.80s", query)
         channel_name = extract_channel_name(query)
         if not channel_name:
-            logger.warning(f"Could not extract channel name from query: {query}")
+            logger.warning("Could not extract channel name from query: %.80s", query)
             return {"error": "Could not extract channel name from query"}
 
-        logger.info(f"Extracted channel name: {channel_name}")
+        logger.info("Extracted channel name: %s", channel_name)
         channel_info = get_channel_info(channel_name)
         if not channel_info:
-            logger.warning(f"Could not find channel information for: {channel_name}")
+            logger.warning("Could not find channel information for: %s", channel_name)
             return {"error": f"Could not find channel information for {channel_name}"}
 
-        logger.info(f"Fetching latest videos for channel: {channel_name}")
+        logger.info("Fetching latest videos for channel: %s", channel_name)
         latest_videos = get_latest_videos(channel_name, max_results=5)
         
         result = {
@@ -93,35 +123,158 @@ def analyze_youtube_query(query: str) -> Dict[str, Any]:
         logger.info("Successfully analyzed YouTube query")
         return result
     except Exception as e:
-        logger.error(f"Error analyzing YouTube query: {str(e)}", exc_info=True)
+        logger.error("Error analyzing YouTube query: %s", e, exc_info=True)
         return {"error": f"Failed to analyze YouTube query: {str(e)}"}
 
+def youtube_prompt(question: str, youtube_data: Dict[str, Any]) -> str:
+    return f"""
+            Question: {question}
+            Channel Info: {youtube_data['channel_info']}
+            Latest Videos: {youtube_data['latest_videos']}
+            Please provide a detailed analysis based on this information.
+            """
+
+def response_version(question: str, context: str = "general") -> Optional[str]:
+    """
+    A version key for run_agent(question, context), computed without calling Gemini.
+
+    The key is derived from whatever will produce the body. Generated answers
+    are versioned by their answer-cache entry (the prompt it is keyed by and
+    the cached text), so an answer regenerated after its entry expired gets a
+    new version; channel analyses are versioned by the stored digest.
+    Returns None when the body cannot be versioned up front (no cached
+    answer or digest yet, a mention question answered from the local index,
+    an unknown channel); the response is then validated by its body hash.
+    """
+    cache = get_cache()
+    if context != "youtube":
+        answer = cache.get("answer", make_key("general", question))
+        return make_key("general", question, answer) if answer is not None else None
+    if parse_mention_question(question):
+        return None
+    channel_name = analyzed_channel(question)
+    if channel_name:
+        return get_digest_service().version(channel_name)
+    channel_name = extract_channel_name(question)
+    channel_info = get_channel_info(channel_name) if channel_name else None
+    if not channel_info:
+        return None
+    prompt = youtube_prompt(question, {"channel_info": channel_info,
+                                       "latest_videos": get_latest_videos(channel_name, max_results=5)})
+    answer = cache.get("answer", make_key("youtube", prompt))
+    return make_key("youtube", prompt, answer) if answer is not None else None
+
+def generate_script(topic: str, progress: Optional[Callable[[str, float], None]] = None) -> Dict[str, Any]:
+    """
+    Write a full YouTube script for a topic. Long-running; submitted as a job.
+    """
+    progress = progress or (lambda stage, fraction: None)
+    prompt = script_prompt(topic)
+    progress("generating", 0.1)
+    script = get_cache().get_or_compute("answer", make_key("script", prompt), lambda: generate_text(prompt))
+    progress("done", 1.0)
+    return {"topic": topic, "script": script}
+
+def analyze_channel(channel_name: str, max_videos: int = 50,
+                    progress: Optional[Callable[[str, float], None]] = None) -> Dict[str, Any]:
+    """
+    Deep analysis of a channel over its recent uploads. Long-running; submitted as a job.
+    """
+    progress = progress or (lambda stage, fraction: None)
+    progress("fetching channel", 0.05)
+    channel_info = get_channel_info(channel_name)
+    if not channel_info:
+        return {"error": f"Could not find channel information for {channel_name}"}
+
+    progress("fetching videos", 0.2)
+    videos = get_latest_videos(channel_name, max_results=min(max_videos, 50))
+
+    progress("analyzing", 0.5)
+    prompt = analysis_prompt(channel_info, videos)
+    analysis = get_cache().get_or_compute("answer", make_key("analysis", prompt), lambda: generate_text(prompt))
+    progress("done", 1.0)
+    return {"analysis": analysis, "channel_info": channel_info, "videos_analyzed": len(videos)}
+
+def parse_mention_question(question: str) -> Optional[tuple]:
+    """
+    Return (channel name, search terms) for "which videos mention X" questions.
+    """
+    for pattern in MENTION_PATTERNS:
+        match = pattern.search(question.strip())
+        if match:
+            return match.group("channel").strip(), match.group("term").strip().strip("\"'")
+    return None
+
+def answer_mention_locally(channel_name: str, term: str) -> Optional[Dict[str, Any]]:
+    """
+    Answer a mention question from the local full-text index, without search.list or the LLM.
+
+    Returns None unless every video the channel reports has been indexed, so a
+    partially indexed channel falls back to the normal path rather than
+    answering from a subset.
+    """
+    channel = get_channel_record(channel_name)
+    if not channel:
+        return None
+    index = get_search_index()
+    indexed = index.count(channel.channel_id)
+    if not indexed or indexed < channel.video_count:
+        return None
+    matches = index.search(term, channel_id=channel.channel_id, limit=25)
+    total = index.count_matches(term, channel_id=channel.channel_id) if matches else 0
+    if matches:
+        titles = "\n".join(f"- {match['title']} ({match['published_at'][:10]})" for match in matches)
+        shown = f" (the best {len(matches)} shown)" if total > len(matches) else ""
+        answer = f"{total} of the {indexed} indexed {channel.name} videos mention {term}{shown}:\n{titles}"
+    else:
+        answer = f"None of the {indexed} indexed {channel.name} videos mention {term}."
+    return {
+        "answer": answer,
+        "youtube_data": {"channel_info": channel.to_dict(), "matches": matches,
+                         "match_count": total, "indexed_videos": indexed}
+    }
+
 def run_agent(question: str, context: str = "general") -> Dict[str, Any]:
     """
     Run the agent with the given question and context.
     """
     try:
-        logger.info(f"Running agent with question: {question}, context: {context}")
+        logger.info("Running agent (context: %s, %d chars): %.80s", context, len(question), question)
         
         if context == "youtube":
+            # Mention questions are answered from the local index when it covers the channel
+            mention = parse_mention_question(question)
+            if mention:
+                local = answer_mention_locally(*mention)
+                if local:
+                    logger.info("Answered mention question locally for %s", mention[0])
+                    return local
+
+            # "Analyze this channel" questions are served from the precomputed digest
+            channel_name = analyzed_channel(question)
+            if channel_name:
+                with stage("digest"):
+                    digest = get_digest_service().answer(channel_name)
+                if digest:
+                    return digest
+
             # Handle YouTube-specific queries
-            youtube_data = analyze_youtube_query(question)
+            with stage("youtube"):
+                youtube_data = analyze_youtube_query(question)
             if "error" in youtube_data:
-                logger.warning(f"YouTube analysis error: {youtube_data['error']}")
+                logger.warning("YouTube analysis error: %s", youtube_data["error"])
                 return youtube_data
 
             # Generate response using Gemini
-            prompt = f"""
-            Question: {question}
-            Channel Info: {youtube_data['channel_info']}
-            Latest Videos: {youtube_data['latest_videos']}
-            Please provide a detailed analysis based on this information.
-            """
-            
+            prompt = youtube_prompt(question, youtube_data)
+
             logger.info("Generating response with Gemini")
-            response = model.generate_content(prompt)
+            with stage("gemini"):
+                answer = get_cache().get_or_compute(
+                    "answer", make_key("youtube", prompt), lambda: generate_text(prompt)
+                )
             result = {
-                "answer": response.text,
+                "answer": answer,
                 "youtube_data": youtube_data
             }
             logger.info("Successfully generated response")
@@ -129,11 +282,14 @@ def run_agent(question: str, context: str = "general") -> Dict[str, Any]:
         else:
             # Handle general queries using Gemini
             logger.info("Processing general query with Gemini")
-            response = model.generate_content(question)
-            result = {"answer": response.text}
+            with stage("gemini"):
+                answer = get_cache().get_or_compute(
+                    "answer", make_key("general", question), lambda: generate_text(question)
+                )
+            result = {"answer": answer}
             logger.info("Successfully generated response")
             return result
             
     except Exception as e:
-        logger.error(f"Error in run_agent: {str(e)}", exc_info=True)
+        logger.error("Error in run_agent: %s", e, exc_info=True)
         return {"error": f"Failed to process query: {str(e)}"} 
\ No newline at end of file
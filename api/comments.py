@@ -0,0 +1,253 @@
+import os
+import re
+import time
+import logging
+from collections import Counter
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from googleapiclient.errors import HttpError
+from shared_cache import get_cache
+from records import parse_timestamp
+from youtube_utils import get_youtube_client
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 100             # commentThreads.list maximum
+MAX_PAGES = 1000            # 100k top-level comments
+# Pages a request fetches itself on a cache miss; the full scan runs as a "comments" job
+INLINE_PAGES = int(os.getenv("COMMENTS_INLINE_PAGES", "5"))
+TOP_TERMS = 20
+# Term counts are pruned back to half this size when they grow past it,
+# which keeps memory constant however many comments stream through
+TERM_CAPACITY = 5000
+COMMENTS_TTL = 7 * 24 * 3600
+POSITIVE_THRESHOLD = 0.05
+
+TOKEN_PATTERN = re.compile(r"[a-z][a-z']+")
+
+LEXICON = {
+    # positive
+    "love": 1.0, "loved": 1.0, "amazing": 1.0, "awesome": 1.0, "great": 0.8, "best": 0.8,
+    "good": 0.6, "nice": 0.5, "helpful": 0.8, "useful": 0.7, "thanks": 0.6, "thank": 0.6,
+    "excellent": 1.0, "beautiful": 0.8, "perfect": 0.9, "favorite": 0.8, "favourite": 0.8,
+    "funny": 0.6, "hilarious": 0.8, "inspiring": 0.9, "informative": 0.7, "brilliant": 0.9,
+    "fantastic": 1.0, "enjoyed": 0.8, "enjoy": 0.6, "wow": 0.6, "incredible": 0.9, "cool": 0.5,
+    "legend": 0.7, "underrated": 0.5, "clear": 0.4, "wholesome": 0.8, "masterpiece": 1.0,
+    # negative
+    "hate": -1.0, "hated": -1.0, "terrible": -1.0, "awful": -1.0, "worst": -1.0, "bad": -0.7,
+    "boring": -0.7, "clickbait": -0.9, "fake": -0.8, "scam": -1.0, "annoying": -0.7,
+    "disappointed": -0.8, "disappointing": -0.8, "waste": -0.8, "stupid": -0.8, "cringe": -0.7,
+    "wrong": -0.5, "misleading": -0.8, "sad": -0.4, "unsubscribed": -0.9, "dislike": -0.7,
+    "poor": -0.6, "useless": -0.8, "overrated": -0.5, "ads": -0.3, "sponsor": -0.2,
+}
+NEGATORS = frozenset({"not", "no", "never", "isn't", "wasn't", "don't", "doesn't", "didn't", "can't"})
+STOPWORDS = frozenset("""
+    the and for that this with you your are was but have has had not just what all from they them
+    his her its our out about more can will would like get got when how who why one there their
+    been also very much really it's i'm don't can't that's than then too some any into over only
+    even video videos channel he she we me my so do did does is in on of to a an it at be as or if
+""".split())
+
+# Precompiled lexicon: word -> row of WEIGHTS; row 0 is "not in the lexicon"
+_WORD_IDS = {word: i + 1 for i, word in enumerate(LEXICON)}
+WEIGHTS = np.array([0.0] + list(LEXICON.values()))
+_NEGATOR_ID = len(WEIGHTS)
+WEIGHTS = np.append(WEIGHTS, 0.0)
+
+def score_batch(texts: List[str]) -> Tuple[np.ndarray, List[List[str]]]:
+    """
+    Sentiment scores in [-1, 1] for a batch of comments.
+
+    Every token in the batch is mapped to a lexicon row once; per-comment
+    sums come from one np.bincount over the flattened tokens. A lexicon word
+    right after a negator in the same comment counts with the opposite sign.
+
+    Returns:
+        The scores and each comment's tokens (reused for term counting)
+    """
+    tokens = [TOKEN_PATTERN.findall(text.lower()) for text in texts]
+    lengths = np.fromiter((len(t) for t in tokens), dtype=np.int64, count=len(tokens))
+    if not lengths.sum():
+        return np.zeros(len(texts)), tokens
+    ids = np.fromiter(
+        (_NEGATOR_ID if word in NEGATORS else _WORD_IDS.get(word, 0) for words in tokens for word in words),
+        dtype=np.int64
+    )
+    doc = np.repeat(np.arange(len(texts)), lengths)
+    weights = WEIGHTS[ids]
+    # Flip a weight when the previous token is a negator from the same comment
+    negated = np.zeros(len(ids), dtype=bool)
+    negated[1:] = (ids[:-1] == _NEGATOR_ID) & (doc[1:] == doc[:-1])
+    weights = np.where(negated, -weights, weights)
+    sums = np.bincount(doc, weights=weights, minlength=len(texts))
+    return np.clip(sums / np.sqrt(np.maximum(lengths, 1)), -1.0, 1.0), tokens
+
+class CommentStats:
+    """
+    Running sentiment and term aggregates for a video's (or channel's) comments.
+
+    Serializable to a dict so it can be cached and resumed: a refresh only
+    fetches threads not older than ``newest_at`` and folds in those whose IDs
+    are not in ``newest_ids`` (the threads already counted at that instant).
+    ``complete`` is False when the scan stopped at its page limit.
+    """
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        data = data or {}
+        self.count = data.get("count", 0)
+        self.positive = data.get("positive", 0)
+        self.negative = data.get("negative", 0)
+        self.score_sum = data.get("score_sum", 0.0)
+        self.score_sq_sum = data.get("score_sq_sum", 0.0)
+        self.likes = data.get("likes", 0)
+        self.newest_at = data.get("newest_at", 0.0)
+        self.newest_ids = set(data.get("newest_ids", []))
+        self.updated_at = data.get("updated_at", 0.0)
+        self.complete = data.get("complete", True)
+        self.terms = Counter(data.get("terms", {}))
+
+    def add_batch(self, texts: List[str], likes: List[int], published: List[float],
+                  ids: Optional[List[str]] = None) -> None:
+        if not texts:
+            return
+        newest = max(published)
+        if newest > self.newest_at:
+            self.newest_at, self.newest_ids = newest, set()
+        if ids is not None:
+            self.newest_ids.update(i for i, at in zip(ids, published) if at == self.newest_at)
+        scores, tokens = score_batch(texts)
+        self.count += len(texts)
+        self.positive += int((scores > POSITIVE_THRESHOLD).sum())
+        self.negative += int((scores < -POSITIVE_THRESHOLD).sum())
+        self.score_sum += float(scores.sum())
+        self.score_sq_sum += float((scores ** 2).sum())
+        self.likes += sum(likes)
+        for words in tokens:
+            self.terms.update(word for word in words if word not in STOPWORDS and len(word) > 2)
+        if len(self.terms) > TERM_CAPACITY:
+            self.terms = Counter(dict(self.terms.most_common(TERM_CAPACITY // 2)))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count, "positive": self.positive, "negative": self.negative,
+            "score_sum": self.score_sum, "score_sq_sum": self.score_sq_sum, "likes": self.likes,
+            "newest_at": self.newest_at, "newest_ids": sorted(self.newest_ids),
+            "updated_at": self.updated_at, "complete": self.complete,
+            "terms": dict(self.terms.most_common(TERM_CAPACITY // 2)),
+        }
+
+    def summary(self, top_terms: int = TOP_TERMS) -> Dict[str, Any]:
+        mean = self.score_sum / self.count if self.count else 0.0
+        variance = self.score_sq_sum / self.count - mean ** 2 if self.count else 0.0
+        return {
+            "comments_analyzed": self.count,
+            "sentiment": {
+                "mean": round(mean, 4),
+                "stddev": round(max(variance, 0.0) ** 0.5, 4),
+                "positive_share": round(self.positive / self.count, 4) if self.count else 0.0,
+                "negative_share": round(self.negative / self.count, 4) if self.count else 0.0,
+            },
+            "comment_likes": self.likes,
+            "top_terms": [{"term": term, "count": count} for term, count in self.terms.most_common(top_terms)],
+            "updated_at": self.updated_at,
+            "complete": self.complete,
+        }
+
+def iter_comment_pages(video_id: Optional[str] = None, channel_id: Optional[str] = None,
+                       max_pages: int = MAX_PAGES) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield commentThreads.list pages, newest first, one page in memory at a time.
+
+    Args:
+        video_id: Comments on one video
+        channel_id: Comments on all of a channel's videos (used when video_id is None)
+        max_pages: Upper bound on pages fetched
+
+    Yields:
+        Lists of up to 100 thread items
+    """
+    youtube = get_youtube_client()
+    params = {"part": "snippet", "maxResults": PAGE_SIZE, "order": "time", "textFormat": "plainText"}
+    if video_id:
+        params["videoId"] = video_id
+    else:
+        params["allThreadsRelatedToChannelId"] = channel_id
+    page_token = None
+    for _ in range(max_pages):
+        request_params = dict(params, pageToken=page_token) if page_token else params
+        response = youtube.commentThreads().list(**request_params).execute()
+        yield response.get("items", [])
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return
+
+def ingest_comments(video_id: Optional[str] = None, channel_id: Optional[str] = None,
+                    stats: Optional[CommentStats] = None, max_pages: int = MAX_PAGES,
+                    progress: Optional[Callable[[str, float], None]] = None) -> CommentStats:
+    """
+    Stream comment pages into stats, stopping at the first thread older than those counted.
+
+    Threads posted at the same instant as the newest counted one are told
+    apart by ID, so none are skipped or counted twice. progress(stage,
+    fraction) is called once per page, which keeps a job's lease alive
+    through a long scan.
+    """
+    stats = stats or CommentStats()
+    progress = progress or (lambda stage, fraction: None)
+    seen_until, seen_ids = stats.newest_at, set(stats.newest_ids)
+    pages = 0
+    reached_seen = False
+    for items in iter_comment_pages(video_id, channel_id, max_pages):
+        pages += 1
+        texts, likes, published, ids = [], [], [], []
+        for item in items:
+            comment = item["snippet"]["topLevelComment"]["snippet"]
+            published_at = parse_timestamp(comment.get("publishedAt", ""))
+            if published_at < seen_until:
+                reached_seen = True
+                break
+            if published_at == seen_until and item["id"] in seen_ids:
+                continue
+            texts.append(comment.get("textDisplay", ""))
+            likes.append(int(comment.get("likeCount", 0)))
+            published.append(published_at)
+            ids.append(item["id"])
+        stats.add_batch(texts, likes, published, ids)
+        progress("fetching comments", min(pages / max_pages, 0.99))
+        if reached_seen:
+            break
+    # Stopping below the overall MAX_PAGES bound with more pages left leaves older threads uncounted
+    stats.complete = reached_seen or pages < max_pages or max_pages >= MAX_PAGES
+    stats.updated_at = time.time()
+    return stats
+
+def analyze_comments(video_id: Optional[str] = None, channel_id: Optional[str] = None,
+                     refresh: bool = False, max_pages: int = MAX_PAGES,
+                     progress: Optional[Callable[[str, float], None]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Sentiment and top terms for a video's or channel's comments.
+
+    Results are cached per video (or channel). With refresh=True only the
+    threads posted since the cached aggregate are fetched and added to it.
+    A scan cut short by ``max_pages`` is cached with "complete": False; the
+    next full scan starts over rather than resuming from it. progress is
+    passed to ingest_comments().
+
+    Returns:
+        The summary dict, or None when comments are disabled or the fetch failed
+    """
+    key = f"video:{video_id}" if video_id else f"channel:{channel_id}"
+    cache = get_cache()
+    cached = cache.get("comments", key)
+    if cached is not None and not refresh:
+        return CommentStats(cached).summary()
+    base = cached if cached is not None and cached.get("complete", True) else None
+    try:
+        stats = ingest_comments(video_id, channel_id, CommentStats(base), max_pages=max_pages,
+                                progress=progress)
+    except HttpError as e:
+        logger.error("Error fetching comments for %s: %s", key, e)
+        return CommentStats(cached).summary() if cached is not None else None
+    cache.set("comments", key, stats.to_dict(), ttl=COMMENTS_TTL)
+    logger.info("Analyzed %d comments for %s", stats.count, key)
+    return stats.summary()
@@ -0,0 +1,412 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import tempfile
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from shared_cache import make_key
+from records import Channel, Video
+from metrics import counter
+
+logger = logging.getLogger(__name__)
+
+DIGESTS_PATH = os.getenv("DIGESTS_PATH", os.path.join(tempfile.gettempdir(), "youtube_research_digests.sqlite3"))
+# Comma-separated channel names always included in the batch, on top of those users asked about
+DIGEST_CHANNELS = [name.strip() for name in os.getenv("DIGEST_CHANNELS", "").split(",") if name.strip()]
+# Latest uploads a digest is based on; a new one among them makes the digest stale
+DIGEST_VIDEOS = int(os.getenv("DIGEST_VIDEOS", "10"))
+# Relative subscriber or view change that makes a digest stale
+DIGEST_CHANGE_THRESHOLD = float(os.getenv("DIGEST_CHANGE_THRESHOLD", "0.05"))
+DIGEST_MAX_AGE = float(os.getenv("DIGEST_MAX_AGE", str(7 * 24 * 3600)))
+
+# Explicit whole-channel analysis only: "analyze the channel mkbhd", "give me an overview of
+# channel veritasium", "analyse MrBeast's channel", "mkbhd channel breakdown", "give me a channel
+# analysis of mkbhd". Each form captures the channel name in its own named group. Questions
+# about particular videos ("summarize MrBeast's latest video") take the normal path.
+_CHANNEL_NAME = r"(?!(?:a|an|the|this|that|my|your|his|her|their|our|channel)\b)@?\w+(?:[.-]\w+)*"
+_ANALYSIS_NOUN = r"(?:analysis|overview|breakdown|summary|digest)"
+ANALYZE_PATTERN = re.compile(
+    rf"\b(?:analy[sz]e|summari[sz]e|{_ANALYSIS_NOUN}\s+of)\s+(?:the\s+|this\s+)?"
+    rf"(?:(?P<owner>{_CHANNEL_NAME})(?:'s)?\s+channel\b|channel\s+(?P<named>{_CHANNEL_NAME}))"
+    rf"|\bchannel\s+{_ANALYSIS_NOUN}\s+(?:of|for)\s+(?P<target>{_CHANNEL_NAME})"
+    rf"|\b(?P<subject>{_CHANNEL_NAME})(?:'s)?\s+channel\s+{_ANALYSIS_NOUN}\b(?!\s+(?:of|for)\b)",
+    re.IGNORECASE
+)
+
+def analyzed_channel(question: str) -> Optional[str]:
+    """
+    The channel an explicit whole-channel analysis question names, or None for any other question.
+    """
+    match = ANALYZE_PATTERN.search(question)
+    if match is None:
+        return None
+    return next(name for name in match.group("owner", "named", "target", "subject") if name)
+
+digest_requests = counter("digest_requests_total", "Channel analysis requests by digest result")
+digest_generations = counter("digest_generations_total", "LLM digest generations by trigger")
+
+def analysis_prompt(channel_info: Dict[str, Any], videos: List[Dict[str, Any]]) -> str:
+    return f"""
+    Channel Info: {channel_info}
+    Recent Videos: {videos}
+    Please provide an in-depth analysis of this channel: content themes, upload cadence,
+    which formats and titles perform best, audience engagement, and concrete recommendations.
+    """
+
+def snapshot_of(channel: Channel, videos: List[Video]) -> Dict[str, Any]:
+    """
+    The statistics a digest depends on, with raw integers.
+    """
+    latest = sorted(videos, key=lambda video: video.published_at, reverse=True)[:DIGEST_VIDEOS]
+    return {
+        "subscribers": channel.subscriber_count,
+        "views": channel.view_count,
+        "videos": channel.video_count,
+        "latest": [video.video_id for video in latest],
+    }
+
+def snapshot_version(snapshot: Dict[str, Any]) -> str:
+    return make_key("digest", json.dumps(snapshot, sort_keys=True))[:16]
+
+def change_reason(basis: Dict[str, Any], current: Dict[str, Any],
+                  threshold: float = DIGEST_CHANGE_THRESHOLD) -> Optional[str]:
+    """
+    Why a digest generated from basis no longer describes current, or None.
+
+    View and subscriber counts drift on every fetch; only new uploads or a
+    relative change beyond the threshold are worth another LLM call.
+    """
+    if set(current["latest"]) - set(basis["latest"]):
+        return "new uploads"
+    for field in ("subscribers", "views"):
+        if abs(current[field] - basis[field]) > threshold * max(basis[field], 1):
+            return field
+    return None
+
+def is_fresh(entry: Optional[Dict[str, Any]], channel: Channel, videos: List[Video]) -> bool:
+    """
+    Whether a stored digest still describes the channel: young enough and no change_reason().
+    """
+    return (entry is not None and entry["digest"] is not None
+            and time.time() - entry["generated_at"] <= DIGEST_MAX_AGE
+            and change_reason(entry["snapshot"], snapshot_of(channel, videos)) is None)
+
+def stale_reason(entry: Dict[str, Any], channel: Channel, videos: List[Video]) -> Optional[str]:
+    """
+    Why a stored digest should be regenerated (a change_reason() or "age"), or None.
+    """
+    reason = change_reason(entry["snapshot"], snapshot_of(channel, videos))
+    if reason is None and time.time() - entry["generated_at"] > DIGEST_MAX_AGE:
+        reason = "age"
+    return reason
+
+def fetch_channel(channel_name: str) -> Optional[Tuple[Channel, List[Video]]]:
+    """
+    A channel and its latest uploads, through the shared cache.
+    """
+    from youtube_utils import get_channel_record, get_video_table
+    channel = get_channel_record(channel_name)
+    if channel is None:
+        return None
+    table = get_video_table(channel.channel_id, DIGEST_VIDEOS)
+    return channel, list(table) if table else []
+
+def generate_digest(prompt: str) -> str:
+    from agent import generate_text
+    return generate_text(prompt)
+
+def schedule_regeneration(channel_name: str) -> None:
+    from jobs import submit_job
+    submit_job("digest", {"channel": channel_name})
+
+class DigestStore:
+    """
+    SQLite table of tracked channels and their latest digest.
+
+    A channel is tracked from the first time someone asks for its analysis.
+    Request and generation counts live in the same file, so the figures
+    cover every worker and batch run on the host.
+    """
+
+    def __init__(self, path: str = DIGESTS_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self) -> None:
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS digests ("
+            " channel_id TEXT PRIMARY KEY, channel_name TEXT NOT NULL, tracked_at REAL NOT NULL,"
+            " last_requested REAL, requests INTEGER NOT NULL DEFAULT 0,"
+            " version TEXT, snapshot TEXT, digest TEXT, youtube_data TEXT,"
+            " generated_at REAL, generation_seconds REAL)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS digest_stats (name TEXT PRIMARY KEY, value REAL NOT NULL)")
+
+    def track(self, channel_id: str, channel_name: str, requested: bool = False) -> None:
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO digests (channel_id, channel_name, tracked_at, last_requested, requests)"
+            " VALUES (?, ?, ?, ?, ?) ON CONFLICT (channel_id) DO UPDATE SET channel_name = excluded.channel_name,"
+            " last_requested = COALESCE(excluded.last_requested, last_requested),"
+            " requests = requests + excluded.requests",
+            (channel_id, channel_name, now, now if requested else None, int(requested))
+        )
+
+    def get(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT * FROM digests WHERE channel_id = ?", (channel_id,)).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        for field in ("snapshot", "youtube_data"):
+            if entry[field] is not None:
+                entry[field] = json.loads(entry[field])
+        return entry
+
+    def tracked(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Tracked channels, most requested first.
+        """
+        rows = self._connect().execute(
+            "SELECT channel_id, channel_name, requests FROM digests ORDER BY requests DESC, tracked_at"
+            + (" LIMIT ?" if limit else ""), (limit,) if limit else ()
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def save(self, channel_id: str, channel_name: str, snapshot: Dict[str, Any], digest: str,
+             youtube_data: Dict[str, Any], seconds: float) -> str:
+        version = snapshot_version(snapshot)
+        self.track(channel_id, channel_name)
+        self._connect().execute(
+            "UPDATE digests SET version = ?, snapshot = ?, digest = ?, youtube_data = ?,"
+            " generated_at = ?, generation_seconds = ? WHERE channel_id = ?",
+            (version, json.dumps(snapshot), digest, json.dumps(youtube_data), time.time(), seconds, channel_id)
+        )
+        return version
+
+    def bump(self, name: str, amount: float = 1.0) -> None:
+        self._connect().execute(
+            "INSERT INTO digest_stats (name, value) VALUES (?, ?)"
+            " ON CONFLICT (name) DO UPDATE SET value = value + excluded.value", (name, amount)
+        )
+
+    def counts(self) -> Dict[str, float]:
+        return {row["name"]: row["value"] for row in self._connect().execute("SELECT * FROM digest_stats")}
+
+class DigestService:
+    """
+    Serves channel analyses from stored digests and regenerates them only
+    when the channel's snapshot has changed meaningfully.
+
+    The batch (refresh) is meant to run off-peak; an interactive request for
+    a channel whose digest went stale gets the stored digest at once while a
+    regeneration job is queued. Only a channel with no digest at all costs an
+    LLM call on the request path.
+    """
+
+    def __init__(self, store: Optional[DigestStore] = None,
+                 fetch: Callable[[str], Optional[Tuple[Channel, List[Video]]]] = fetch_channel,
+                 generate: Callable[[str], str] = generate_digest,
+                 schedule: Callable[[str], None] = schedule_regeneration):
+        self.store = store or DigestStore()
+        self.fetch = fetch
+        self.generate = generate
+        self.schedule = schedule
+
+    def materialize(self, channel_name: str, trigger: str,
+                    fetched: Optional[Tuple[Channel, List[Video]]] = None,
+                    progress: Optional[Callable[[str, float], None]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Generate and store the digest for a channel.
+
+        Args:
+            channel_name: Name to resolve, as in get_channel_info()
+            trigger: What caused the LLM call (interactive, stale, batch), for the stats
+            fetched: The channel and videos when the caller has them already
+            progress: Optional progress(stage, fraction) callback, as job handlers get
+
+        Returns:
+            The stored entry, or None when the channel cannot be found
+        """
+        progress = progress or (lambda stage, fraction: None)
+        fetched = fetched or self.fetch(channel_name)
+        if fetched is None:
+            return None
+        channel, videos = fetched
+        progress("generating", 0.3)
+        youtube_data = {"channel_info": channel.to_dict(), "latest_videos": [video.to_dict() for video in videos]}
+        start = time.perf_counter()
+        digest = self.generate(analysis_prompt(youtube_data["channel_info"], youtube_data["latest_videos"]))
+        seconds = time.perf_counter() - start
+        progress("saving", 0.9)
+        version = self.store.save(channel.channel_id, channel_name, snapshot_of(channel, videos),
+                                  digest, youtube_data, seconds)
+        self.store.bump(f"llm_calls_{trigger}")
+        digest_generations.inc(labels={"trigger": trigger})
+        logger.info("Generated digest %s for %s (%s) in %.1fs", version, channel_name, trigger, seconds)
+        return self.store.get(channel.channel_id)
+
+    def answer(self, channel_name: str) -> Optional[Dict[str, Any]]:
+        """
+        The analysis of a channel for an interactive request, as run_agent() returns it.
+        """
+        start = time.perf_counter()
+        fetched = self.fetch(channel_name)
+        if fetched is None:
+            return None
+        channel, videos = fetched
+        self.store.track(channel.channel_id, channel_name, requested=True)
+        entry = self.store.get(channel.channel_id)
+        reason = None
+        if entry is None or entry["digest"] is None:
+            result = "miss"
+            entry = self.materialize(channel_name, "interactive", fetched)
+        else:
+            result = "hit"
+            reason = stale_reason(entry, channel, videos)
+            if reason is not None:
+                result = "stale"
+                try:
+                    self.schedule(channel_name)
+                except Exception as e:
+                    logger.error("Could not schedule digest regeneration for %s: %s", channel_name, e)
+        elapsed = time.perf_counter() - start
+        self.store.bump(f"requests_{result}")
+        self.store.bump(f"seconds_{result}", elapsed)
+        digest_requests.inc(labels={"result": result})
+        return {
+            "answer": entry["digest"],
+            "youtube_data": entry["youtube_data"],
+            "digest": {"version": entry["version"], "generated_at": entry["generated_at"],
+                       "stale": reason is not None, "stale_reason": reason},
+        }
+
+    def version(self, channel_name: str) -> Optional[str]:
+        """
+        A version key for what answer() would return, without its side effects.
+
+        The stored digest's version and generation time identify the analysis
+        text; the stale reason is part of the response too. None when there is
+        no stored digest yet (answer() would generate one) or no such channel.
+        """
+        fetched = self.fetch(channel_name)
+        if fetched is None:
+            return None
+        channel, videos = fetched
+        entry = self.store.get(channel.channel_id)
+        if entry is None or entry["digest"] is None:
+            return None
+        return f"digest:{entry['version']}:{entry['generated_at']}:{stale_reason(entry, channel, videos)}"
+
+    def regenerate(self, channel_name: str,
+                   progress: Optional[Callable[[str, float], None]] = None) -> Dict[str, Any]:
+        """
+        Job handler: regenerate a stale digest unless another worker already did.
+        """
+        progress = progress or (lambda stage, fraction: None)
+        progress("fetching channel", 0.05)
+        fetched = self.fetch(channel_name)
+        if fetched is None:
+            return {"error": f"Could not find channel information for {channel_name}"}
+        channel, videos = fetched
+        entry = self.store.get(channel.channel_id)
+        # Same test as the request path, so ordinary view drift does not cost an LLM call
+        if is_fresh(entry, channel, videos):
+            return {"channel": channel_name, "version": entry["version"], "regenerated": False}
+        entry = self.materialize(channel_name, "stale", fetched, progress=progress)
+        return {"channel": channel_name, "version": entry["version"], "regenerated": True}
+
+    def refresh(self, force: bool = False, limit: Optional[int] = None,
+                channel_names: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Batch pass over the tracked channels: regenerate digests that are
+        missing or meaningfully changed, skip the rest.
+        """
+        summary = {"tracked": 0, "regenerated": 0, "unchanged": 0, "failed": 0}
+        names = [row["channel_name"] for row in self.store.tracked(limit)]
+        names += [name for name in (channel_names or []) + DIGEST_CHANNELS if name not in names]
+        for name in names:
+            summary["tracked"] += 1
+            try:
+                fetched = self.fetch(name)
+                if fetched is None:
+                    summary["failed"] += 1
+                    continue
+                channel, videos = fetched
+                entry = self.store.get(channel.channel_id)
+                if is_fresh(entry, channel, videos) and not force:
+                    summary["unchanged"] += 1
+                    self.store.bump("batch_unchanged")
+                    continue
+                self.materialize(name, "batch", fetched)
+                summary["regenerated"] += 1
+            except Exception as e:
+                summary["failed"] += 1
+                logger.error("Digest refresh failed for %s: %s", name, e)
+        return summary
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Requests by result with their mean latency, and the LLM calls made
+        against one call per request without digests.
+        """
+        counts = self.store.counts()
+        requests = {result: int(counts.get(f"requests_{result}", 0)) for result in ("hit", "stale", "miss")}
+        total = sum(requests.values())
+        llm_calls = {trigger: int(counts.get(f"llm_calls_{trigger}", 0)) for trigger in ("interactive", "stale", "batch")}
+        return {
+            "requests": requests,
+            "mean_latency_ms": {
+                result: round(counts.get(f"seconds_{result}", 0) / count * 1000, 2)
+                for result, count in requests.items() if count
+            },
+            "llm_calls": llm_calls,
+            "batch_unchanged": int(counts.get("batch_unchanged", 0)),
+            # Without digests every request is an LLM call
+            "llm_calls_avoided": round(1 - sum(llm_calls.values()) / total, 4) if total else None,
+            "request_llm_calls_avoided": round(1 - requests["miss"] / total, 4) if total else None,
+        }
+
+_service: Optional[DigestService] = None
+
+def get_digest_service() -> DigestService:
+    global _service
+    if _service is None:
+        _service = DigestService()
+    return _service
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate stale channel digests (run off-peak, e.g. from cron)")
+    parser.add_argument("--track", action="append", default=[], help="Also include this channel name")
+    parser.add_argument("--limit", type=int, default=None, help="Only the N most requested channels")
+    parser.add_argument("--force", action="store_true", help="Regenerate even unchanged digests")
+    parser.add_argument("--stats", action="store_true", help="Print the stats and exit")
+    args = parser.parse_args()
+    from logging_setup import configure_logging
+    configure_logging()
+    service = get_digest_service()
+    if not args.stats:
+        start = time.perf_counter()
+        summary = service.refresh(force=args.force, limit=args.limit, channel_names=args.track)
+        print(f"{summary['tracked']} channels: {summary['regenerated']} regenerated, "
+              f"{summary['unchanged']} unchanged, {summary['failed']} failed in {time.perf_counter() - start:.1f}s")
+    print(json.dumps(service.stats(), indent=2))
+
+if __name__ == "__main__":
+    main()
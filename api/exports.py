@@ -0,0 +1,162 @@
+import os
+import re
+import io
+import csv
+import zlib
+import time
+import uuid
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from shared_cache import get_cache, NAMESPACE_TTLS
+from records import Video, format_timestamp
+from responses import dumps
+from websub import fetch_videos
+from metrics import counter
+
+logger = logging.getLogger(__name__)
+
+# playlistItems.list and videos.list both take at most 50 items per call
+EXPORT_PAGE_SIZE = 50
+# Upper bound on pages streamed per export (100k videos)
+EXPORT_MAX_PAGES = int(os.getenv("EXPORT_MAX_PAGES", "2000"))
+EXPORT_GZIP_LEVEL = 5
+EXPORT_TTL = NAMESPACE_TTLS["export"]
+
+CHANNEL_ID_PATTERN = re.compile(r"^UC[A-Za-z0-9_-]{22}$")
+COLUMNS = ("video_id", "title", "published_at", "duration", "view_count", "like_count", "comment_count")
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+PAGES = counter("export_pages_total", "Channel export pages streamed, by source")
+
+def uploads_playlist(channel_id: str) -> str:
+    """
+    The ID of a channel's uploads playlist (UC... -> UU...), without a channels.list call.
+    """
+    return "UU" + channel_id[2:]
+
+def export_row(video: Video) -> List[Any]:
+    """
+    One export row in COLUMNS order: raw integer counts, duration in seconds.
+    """
+    return [video.video_id, video.title, format_timestamp(video.published_at), video.duration,
+            video.view_count, video.like_count, video.comment_count]
+
+def fetch_page(channel_id: str, page_token: Optional[str]) -> Dict[str, Any]:
+    """
+    One page of a channel's uploads: a playlistItems.list call for the next
+    50 video IDs and a videos.list call for their statistics.
+
+    Returns:
+        {"rows": export rows, newest first, "next": the next page token or None}
+    """
+    from youtube_utils import get_youtube_client
+    response = get_youtube_client().playlistItems().list(
+        part="contentDetails",
+        playlistId=uploads_playlist(channel_id),
+        maxResults=EXPORT_PAGE_SIZE,
+        pageToken=page_token
+    ).execute()
+    video_ids = [item["contentDetails"]["videoId"] for item in response.get("items", [])]
+    rows = []
+    if video_ids:
+        # Private and deleted videos are in the playlist but not in videos.list
+        by_id = {item["id"]: item for item in fetch_videos(video_ids)}
+        rows = [export_row(Video.from_api(by_id[video_id])) for video_id in video_ids if video_id in by_id]
+    return {"rows": rows, "next": response.get("nextPageToken")}
+
+def iter_pages(channel_id: str, fetch: Callable[[str, Optional[str]], Dict[str, Any]] = fetch_page,
+               max_pages: int = EXPORT_MAX_PAGES) -> Iterator[List[List[Any]]]:
+    """
+    Yield a channel's uploads one page of rows at a time, newest first.
+
+    Page tokens are offsets into the uploads playlist, so pages fetched at
+    different times do not line up once the channel uploads again. Cached
+    pages therefore belong to a snapshot: the first page carries a version,
+    later pages are keyed by that version and their page token, and all of
+    them expire together with the first page. A new first page starts a new
+    snapshot and every later page is fetched again with it.
+    """
+    cache = get_cache()
+    head_key = f"{channel_id}:head"
+    head = cache.get("export", head_key)
+    fresh = head is None
+    if fresh:
+        head = dict(fetch(channel_id, None), version=uuid.uuid4().hex[:16], expires_at=time.time() + EXPORT_TTL)
+        cache.set("export", head_key, head, ttl=EXPORT_TTL)
+    PAGES.inc(labels={"source": "upstream" if fresh else "cache"})
+    yield head["rows"]
+
+    page_token = head["next"]
+    for _ in range(1, max_pages):
+        if not page_token:
+            return
+        key = f"{channel_id}:{head['version']}:{page_token}"
+        page = cache.get("export", key)
+        if page is None:
+            if not fresh:
+                # Evicted before its snapshot expired: finish from upstream and
+                # make the next export start a new snapshot
+                logger.warning("Export snapshot of %s lost a page; starting a new one next time", channel_id)
+                cache.delete("export", head_key)
+                fresh = True
+            page = fetch(channel_id, page_token)
+            ttl = head["expires_at"] - time.time()
+            if ttl > 0:
+                cache.set("export", key, page, ttl=ttl)
+            PAGES.inc(labels={"source": "upstream"})
+        else:
+            PAGES.inc(labels={"source": "cache"})
+        yield page["rows"]
+        page_token = page["next"]
+
+def encode_ndjson(rows: List[List[Any]]) -> bytes:
+    return b"".join(dumps(dict(zip(COLUMNS, row))) + b"\n" for row in rows)
+
+def encode_csv(rows: List[List[Any]]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+def export_channel(channel_id: str, format: str = "ndjson", compress: bool = False,
+                   fetch: Callable[[str, Optional[str]], Dict[str, Any]] = fetch_page,
+                   max_pages: int = EXPORT_MAX_PAGES) -> Iterator[bytes]:
+    """
+    Stream every upload of a channel as NDJSON or CSV, optionally gzipped.
+
+    One page (50 rows) is held in memory at a time whatever the channel's
+    size. With compression each page is sync-flushed so the client can
+    decompress rows as they arrive instead of waiting for the whole file.
+
+    Args:
+        channel_id: A UC... channel ID
+        format: "ndjson" or "csv"
+        compress: Gzip the stream
+        fetch: Page fetcher, fetch_page() unless testing
+        max_pages: Upper bound on pages streamed
+
+    Yields:
+        Chunks of the encoded (and possibly compressed) file
+    """
+    encode = encode_csv if format == "csv" else encode_ndjson
+    compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31) if compress else None
+
+    def emit(data: bytes) -> bytes:
+        if compressor is None:
+            return data
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    if format == "csv":
+        yield emit(",".join(COLUMNS).encode() + b"\n")
+    count = 0
+    try:
+        for rows in iter_pages(channel_id, fetch, max_pages):
+            if rows:
+                count += len(rows)
+                yield emit(encode(rows))
+    except Exception as e:
+        # The response has started, so the best signal left is an unterminated body
+        logger.error("Export of %s failed after %d rows: %s", channel_id, count, e)
+        raise
+    if compressor is not None:
+        yield compressor.flush()
+    logger.info("Exported %d videos of %s as %s", count, channel_id, format)
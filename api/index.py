@@ -1,16 +1,33 @@
 import os
+import json
+import asyncio
 import logging
-from fastapi import FastAPI, Request, HTTPException
+from contextlib import AsyncExitStack
+from typing import Optional
+from fastapi import FastAPI, Request, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse, Response
+from fastapi.concurrency import run_in_threadpool, iterate_in_threadpool
+from starlette.background import BackgroundTask
 from dotenv import load_dotenv
-from agent import run_agent
+from agent import run_agent, stream_text, response_version
+from metrics import render_metrics
+from responses import json_response, version_etag, precondition_response
+from profiling import ProfilingMiddleware, recent_profiles, read_profile, is_admin, profiled
+from admission import admit, rate_limit, Overloaded
+from comments import analyze_comments, INLINE_PAGES as COMMENTS_INLINE_PAGES
+from leaderboards import get_leaderboards
+from digests import get_digest_service
+from exports import export_channel, CHANNEL_ID_PATTERN, FORMATS
+from websub import get_subscriber, WEBSUB_CALLBACK, WEBSUB_RENEW_INTERVAL
+from thumbnails import (get_thumbnail_service, ThumbnailNotFound, ThumbnailUnavailable, SIZES, VIDEO_ID_PATTERN,
+                        CACHE_CONTROL)
+from sessions import get_session_manager, resolve_channel, build_prompt
+from jobs import (get_job_store, submit_job, start_job_workers, stop_job_workers, UnknownJobKind,
+                  JobQueueFull, FINISHED_STATUSES, JOB_QUEUE_RETRY_AFTER)
+from logging_setup import configure_logging, RequestLoggingMiddleware
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Load environment variables
@@ -28,7 +45,7 @@ required_env_vars = [
 
 for var in required_env_vars:
     if not os.getenv(var):
-        logger.error(f"Missing required environment variable: {var}")
+        logger.error("Missing required environment variable: %s", var)
         raise EnvironmentError(f"Missing required environment variable: {var}")
 
 app = FastAPI()
@@ -42,37 +59,337 @@ app.add_middleware(
     allow_headers=["*"],
     expose_headers=["*"]
 )
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RequestLoggingMiddleware)
+
+async def answer_question(request: Request, question: str, context: str, route: str,
+                          upstreams: tuple, priority: str):
+    """
+    Run the agent behind admission control, with conditional requests.
+
+    The ETag comes from response_version(), which only reads the cached
+    answer or stored digest the body is built from, so a poll whose answer is
+    unchanged gets 304 (GET/HEAD) or 412 (POST) before run_agent() is called.
+    Without a version the ETag is the body hash json_response() computes.
+    """
+    async with admit(request, route, upstreams, priority=priority):
+        version = await run_in_threadpool(response_version, question, context)
+        etag = version_etag(request, version) if version else None
+        precondition = precondition_response(request, etag) if etag else None
+        if precondition is not None:
+            return precondition
+        result = await run_in_threadpool(profiled(run_agent), question, context=context)
+    # Errors are never validated by the snapshot version
+    return json_response(request, result, etag=None if "error" in result else etag)
+
+async def read_question(request: Request, question: Optional[str]) -> str:
+    if question is None and request.method == "POST":
+        data = await request.json()
+        question = data.get("question")
+    if not question:
+        raise HTTPException(status_code=400, detail="Question is required")
+    return question
 
 @app.post("/api/youtube")
-async def youtube_question(request: Request):
+@app.get("/api/youtube")
+async def youtube_question(request: Request, question: Optional[str] = None):
     try:
         logger.info("Received YouTube question request")
-        data = await request.json()
-        question = data.get("question")
-        if not question:
-            raise HTTPException(status_code=400, detail="Question is required")
-        
-        result = run_agent(question, context="youtube")
-        return JSONResponse(content=result)
+        question = await read_question(request, question)
+        return await answer_question(request, question, "youtube", "/api/youtube",
+                                     ("youtube", "gemini"), priority="analytics")
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error processing YouTube question: {str(e)}", exc_info=True)
+        logger.error("Error processing YouTube question: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/chat")
-async def chat_question(request: Request):
+@app.get("/api/chat")
+async def chat_question(request: Request, question: Optional[str] = None):
     try:
         logger.info("Received chat question request")
-        data = await request.json()
-        question = data.get("question")
-        if not question:
-            raise HTTPException(status_code=400, detail="Question is required")
-        
-        result = run_agent(question)
-        return JSONResponse(content=result)
+        question = await read_question(request, question)
+        return await answer_question(request, question, "general", "/api/chat",
+                                     ("gemini",), priority="interactive")
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error processing chat question: {str(e)}", exc_info=True)
+        logger.error("Error processing chat question: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/comments/{video_id}")
+async def comment_summary(video_id: str, request: Request, refresh: bool = False):
+    # A request scans at most INLINE_PAGES pages; the rest of the scan runs as a job
+    async with admit(request, "/api/comments", ("youtube",), priority="analytics"):
+        summary = await run_in_threadpool(profiled(analyze_comments), video_id, refresh=refresh,
+                                          max_pages=COMMENTS_INLINE_PAGES)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Comments not available for this video")
+    if not summary["complete"]:
+        try:
+            summary["job"] = (await run_in_threadpool(submit_job, "comments", {"video_id": video_id}))["id"]
+        except JobQueueFull as e:
+            logger.warning("Not queueing the full comment scan of %s: %s", video_id, e)
+    return json_response(request, summary)
+
+@app.get("/api/leaderboards/{metric}")
+async def leaderboard(metric: str, request: Request, k: int = 10, channels: str = ""):
+    boards = await run_in_threadpool(get_leaderboards)
+    if metric not in boards.metrics:
+        raise HTTPException(status_code=404, detail=f"Unknown metric; choose from {', '.join(boards.metrics)}")
+    channel_ids = {c for c in channels.split(",") if c} or None
+    entries = await run_in_threadpool(boards.top, metric, max(1, min(k, 100)), channel_ids)
+    return json_response(request, {"metric": metric, "entries": entries})
+
+@app.get("/api/digests/stats")
+async def digest_stats(request: Request):
+    return json_response(request, await run_in_threadpool(get_digest_service().stats))
+
+@app.get("/api/channel/{channel_id}/export")
+async def channel_export(channel_id: str, request: Request, format: str = "ndjson"):
+    if format not in FORMATS or not CHANNEL_ID_PATTERN.match(channel_id):
+        raise HTTPException(status_code=400, detail=f"Invalid channel ID or format; formats are {', '.join(FORMATS)}")
+    compress = "gzip" in request.headers.get("accept-encoding", "")
+    # The YouTube slot is held for as long as the stream runs. It is released
+    # when the body finishes or is abandoned, and by the background task in
+    # case the body never starts; closing the stack twice is harmless.
+    stack = AsyncExitStack()
+    await stack.enter_async_context(admit(request, "/api/channel/export", ("youtube",), priority="batch"))
+
+    async def body():
+        try:
+            async for chunk in iterate_in_threadpool(export_channel(channel_id, format, compress)):
+                yield chunk
+        finally:
+            await stack.aclose()
+
+    headers = {
+        "Content-Disposition": f'attachment; filename="{channel_id}.{format}"',
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body(), media_type=FORMATS[format], headers=headers,
+                             background=BackgroundTask(stack.aclose))
+
+@app.get("/api/thumbnails/{video_id}")
+async def thumbnail(video_id: str, request: Request, size: str = "medium"):
+    if size not in SIZES or not VIDEO_ID_PATTERN.match(video_id):
+        raise HTTPException(status_code=400, detail=f"Invalid video ID or size; sizes are {', '.join(SIZES)}")
+    try:
+        data, digest = await get_thumbnail_service().get(video_id, size)
+    except ThumbnailNotFound:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    except ThumbnailUnavailable as e:
+        logger.warning("%s", e)
+        raise HTTPException(status_code=502, detail="Thumbnail source unavailable")
+    headers = {"ETag": f'"{digest}"', "Cache-Control": CACHE_CONTROL}
+    if f'"{digest}"' in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, media_type="image/jpeg", headers=headers)
+
+@app.on_event("startup")
+def start_jobs():
+    start_job_workers()
+
+@app.on_event("startup")
+def load_leaderboards():
+    get_leaderboards()
+
+async def sweep_sessions():
+    manager = get_session_manager()
+    while True:
+        await asyncio.sleep(60)
+        manager.evict_idle()
+
+@app.on_event("startup")
+async def start_session_sweeper():
+    asyncio.ensure_future(sweep_sessions())
+
+@app.websocket("/api/ws")
+async def chat_socket(websocket: WebSocket):
+    """
+    Stateful chat: channels fetched, recent turns and context documents stay
+    on the server, so follow-ups skip the lookups and the client sends only
+    the new question. Answers are streamed as chunk messages.
+
+    Client messages:
+        {"type": "question", "question": "..."}
+        {"type": "context", "documents": ["...", ...]}
+    """
+    await websocket.accept()
+    manager = get_session_manager()
+    session = manager.open(websocket.query_params.get("session_id"))
+    await websocket.send_json({"type": "session", "session_id": session.session_id})
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except (ValueError, KeyError):  # not JSON, or a binary frame
+                message = None
+            session.touch()
+            if not isinstance(message, dict):
+                await websocket.send_json({"type": "error", "detail": "Messages must be JSON objects"})
+                continue
+            if message.get("type") == "context":
+                session.set_documents(message.get("documents") or [])
+                await websocket.send_json({"type": "context", "documents": len(session.documents)})
+                continue
+            question = message.get("question")
+            if not question:
+                await websocket.send_json({"type": "error", "detail": "Question is required"})
+                continue
+            try:
+                async with admit(websocket, "/api/ws", ("youtube", "gemini"), priority="interactive"):
+                    youtube_data, reused = await run_in_threadpool(profiled(resolve_channel), session, question)
+                    chunks = iter(stream_text(build_prompt(session, question, youtube_data)))
+                    await websocket.send_json({"type": "start", "reused": reused})
+                    answer = []
+                    while True:
+                        chunk = await run_in_threadpool(next, chunks, None)
+                        if chunk is None:
+                            break
+                        answer.append(chunk)
+                        await websocket.send_json({"type": "chunk", "text": chunk})
+            except Overloaded as e:
+                await websocket.send_json({"type": "error", "detail": e.detail,
+                                           "retry_after": int(e.headers["Retry-After"])})
+                continue
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                logger.error("Error answering WebSocket question: %s", e, exc_info=True)
+                await websocket.send_json({"type": "error", "detail": str(e)})
+                continue
+            session.add_turn("user", question)
+            session.add_turn("assistant", "".join(answer))
+            await websocket.send_json({"type": "end", "answer": "".join(answer),
+                                       "youtube_data": youtube_data, "reused": reused})
+    except WebSocketDisconnect:
+        logger.info("Session %s disconnected", session.session_id)
+
+@app.on_event("shutdown")
+def stop_jobs():
+    stop_job_workers()
+
+async def renew_subscriptions():
+    subscriber = get_subscriber()
+    while True:
+        renewed = await run_in_threadpool(subscriber.renew_due)
+        if renewed:
+            logger.info("Renewed %d WebSub subscriptions", renewed)
+        await asyncio.sleep(WEBSUB_RENEW_INTERVAL)
+
+@app.on_event("startup")
+async def start_websub():
+    get_subscriber().batcher.start()
+    if WEBSUB_CALLBACK:
+        asyncio.ensure_future(renew_subscriptions())
+
+@app.on_event("shutdown")
+def stop_websub():
+    get_subscriber().batcher.stop()
+
+@app.get("/api/websub/callback", response_class=PlainTextResponse)
+async def websub_verify(request: Request):
+    status, body = await run_in_threadpool(get_subscriber().verify, dict(request.query_params))
+    return PlainTextResponse(body, status_code=status)
+
+@app.post("/api/websub/callback")
+async def websub_notify(request: Request, channel_id: str = ""):
+    result = await get_subscriber().receive(channel_id, request.headers.get("x-hub-signature"), request.stream())
+    # Hubs retry anything but 2xx, so rejected notifications are acknowledged too
+    return json_response(request, result, status_code=202)
+
+@app.post("/api/admin/websub/subscriptions", status_code=202)
+async def websub_subscribe(request: Request):
+    if not is_admin(request.headers.get("authorization")):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    data = await request.json()
+    channel_id = data.get("channel_id")
+    if not channel_id:
+        raise HTTPException(status_code=400, detail="channel_id is required")
+    subscriber = get_subscriber()
+    action = subscriber.unsubscribe if data.get("mode") == "unsubscribe" else subscriber.subscribe
+    try:
+        await run_in_threadpool(action, channel_id)
+    except RuntimeError as e:
+        # Not configured (callback or secret missing)
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Hub request failed: {e}")
+    return json_response(request, await run_in_threadpool(subscriber.store.get, channel_id), status_code=202)
+
+@app.get("/api/admin/websub/subscriptions")
+async def websub_subscriptions(request: Request):
+    if not is_admin(request.headers.get("authorization")):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return json_response(request, {"subscriptions": await run_in_threadpool(get_subscriber().store.all)})
+
+@app.post("/api/jobs", status_code=202)
+async def create_job(request: Request):
+    rate_limit(request, "/api/jobs")
+    data = await request.json()
+    try:
+        job = await run_in_threadpool(submit_job, data.get("kind", ""), data.get("params") or {})
+    except (UnknownJobKind, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except JobQueueFull as e:
+        raise Overloaded(503, f"Job queue is full: {e}", JOB_QUEUE_RETRY_AFTER)
+    logger.info("Job %s (%s) %s", job["id"], job["kind"], "deduplicated" if job["deduplicated"] else "queued")
+    return json_response(request, job, status_code=202)
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, request: Request):
+    job = await run_in_threadpool(get_job_store().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return json_response(request, job)
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    store = get_job_store()
+    if await run_in_threadpool(store.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        last = None
+        while True:
+            job = await run_in_threadpool(store.get, job_id)
+            if job is None:
+                return
+            state = (job["status"], job["stage"], job["progress"])
+            if state != last:
+                last = state
+                event = "result" if job["status"] in FINISHED_STATUSES else "progress"
+                yield f"event: {event}\ndata: {json.dumps(job, default=str)}\n\n"
+            if job["status"] in FINISHED_STATUSES:
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return render_metrics()
+
+@app.get("/api/admin/profiles")
+async def list_profiles(request: Request):
+    if not is_admin(request.headers.get("authorization")):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return json_response(request, {"profiles": recent_profiles()})
+
+@app.get("/api/admin/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str, request: Request):
+    if not is_admin(request.headers.get("authorization")):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    profile = read_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy"} 
\ No newline at end of file
@@ -0,0 +1,69 @@
+import os
+import json
+import time
+from typing import Optional
+
+# Every index the app creates must match the Gemini embedding model
+EMBEDDING_DIMENSION = 768
+METRIC = "cosine"
+
+# The alias names the index the app should use. Reindexing builds a new index
+# next to the live one and flips the alias once the new index is ready, so the
+# application never points at a half-built or missing index. The alias is a
+# marker vector in the home index (PINECONE_INDEX), so every host and worker
+# reads the same value; the home index itself is never deleted by reset.
+HOME_INDEX = os.getenv("PINECONE_INDEX")
+ALIAS_NAMESPACE = "__index_alias__"
+ALIAS_ID = "active-index"
+
+# How often workers re-read the alias; deleting a demoted index must wait longer
+ALIAS_CHECK_INTERVAL = float(os.getenv("PINECONE_ALIAS_CHECK_INTERVAL", "5.0"))
+
+# Written by earlier versions on the host running the admin CLI; read only
+# until the first promote writes the shared alias
+INDEX_ALIAS_FILE = os.getenv(
+    "PINECONE_INDEX_ALIAS_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".pinecone_index.json")
+)
+
+def _read_alias_file() -> Optional[str]:
+    try:
+        with open(INDEX_ALIAS_FILE) as f:
+            return json.load(f).get("active")
+    except (FileNotFoundError, ValueError):
+        return None
+
+def read_alias(pc) -> Optional[str]:
+    """
+    Return the index name the shared alias points at, if any.
+
+    Args:
+        pc: Pinecone client. The home index must exist; errors from Pinecone
+            are raised so callers can keep their current index rather than fall
+            back to the wrong one.
+    """
+    if not HOME_INDEX:
+        return _read_alias_file()
+    marker = pc.Index(HOME_INDEX).fetch(ids=[ALIAS_ID], namespace=ALIAS_NAMESPACE).vectors.get(ALIAS_ID)
+    if marker is None:
+        return _read_alias_file()
+    return (marker.metadata or {}).get("active")
+
+def resolve_index_name(pc=None) -> Optional[str]:
+    """
+    Return the index the app should use: the alias target, else PINECONE_INDEX.
+
+    Without a client (e.g. when replaying recorded traffic offline) the alias
+    is not read.
+    """
+    return (read_alias(pc) if pc is not None else None) or HOME_INDEX
+
+def write_alias(pc, index_name: str) -> None:
+    """
+    Point the shared alias at a new index. A single upsert replaces the marker,
+    so readers see either the old or the new target.
+    """
+    # Cosine indexes reject all-zero vectors; the values are never queried
+    values = [1.0] + [0.0] * (EMBEDDING_DIMENSION - 1)
+    metadata = {"active": index_name, "previous": read_alias(pc) or "", "updated_at": time.time()}
+    pc.Index(HOME_INDEX).upsert(vectors=[(ALIAS_ID, values, metadata)], namespace=ALIAS_NAMESPACE)
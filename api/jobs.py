@@ -0,0 +1,343 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import argparse
+import tempfile
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from shared_cache import make_key
+from logging_setup import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Jobs live in a SQLite file shared by every HTTP worker and job worker on the host,
+# so any process can enqueue, poll or run any job.
+JOBS_PATH = os.getenv("JOBS_PATH", os.path.join(tempfile.gettempdir(), "youtube_research_jobs.sqlite3"))
+# Background job threads started inside each HTTP worker; 0 leaves jobs to `python jobs.py`
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# A running job whose worker has not reported progress for this long is handed to another worker
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+# Finished jobs are kept this long for later retrieval
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+# Submissions are refused once this many jobs are waiting, rather than queueing work nobody will see
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "1000"))
+# Retry-After sent with a refused submission
+JOB_QUEUE_RETRY_AFTER = 30.0
+POLL_INTERVAL = 1.0
+
+FINISHED_STATUSES = ("succeeded", "failed")
+
+class UnknownJobKind(ValueError):
+    """Raised when a job is submitted for a kind with no handler."""
+
+class JobQueueFull(RuntimeError):
+    """Raised when a job is submitted while JOB_MAX_PENDING jobs are already waiting."""
+
+def default_handlers() -> Dict[str, Callable[[Dict[str, Any], Callable[[str, float], None]], Any]]:
+    """
+    Job kinds and their handlers. Each handler gets the job params and a
+    progress(stage, fraction) callback and returns a JSON-serializable result.
+    """
+    from agent import generate_script, analyze_channel
+    from digests import get_digest_service
+    from comments import analyze_comments
+    return {
+        "script": lambda params, progress: generate_script(params["topic"], progress=progress),
+        "analysis": lambda params, progress: analyze_channel(
+            params["channel"], max_videos=int(params.get("max_videos", 50)), progress=progress
+        ),
+        "digest": lambda params, progress: get_digest_service().regenerate(params["channel"], progress=progress),
+        "comments": lambda params, progress: analyze_comments(
+            params["video_id"], refresh=True, progress=progress
+        ),
+    }
+
+REQUIRED_PARAMS = {"script": ("topic",), "analysis": ("channel",), "digest": ("channel",), "comments": ("video_id",)}
+
+class JobStore:
+    """
+    SQLite-backed job table.
+
+    Identical active jobs (same kind and params) share one row: a partial
+    unique index on the dedup key only covers pending and running jobs, so a
+    duplicate submission returns the existing job while a finished job can be
+    resubmitted.
+
+    Claiming a job stamps it with a token for the claiming worker; progress
+    and completion only apply while the job is still running under that
+    token, so a worker whose lease expired cannot overwrite the result of the
+    worker that took the job over.
+    """
+
+    def __init__(self, path: str = JOBS_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self) -> None:
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL, dedup_key TEXT NOT NULL,"
+            " status TEXT NOT NULL, stage TEXT, progress REAL NOT NULL DEFAULT 0,"
+            " result TEXT, error TEXT, created_at REAL NOT NULL, started_at REAL,"
+            " finished_at REAL, heartbeat REAL, worker TEXT)"
+        )
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if "worker" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN worker TEXT")
+        conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_dedup ON jobs (dedup_key)"
+            " WHERE status IN ('pending', 'running')"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    def submit(self, kind: str, params: Dict[str, Any], max_pending: int = JOB_MAX_PENDING) -> Dict[str, Any]:
+        """
+        Enqueue a job, or return the identical job that is already pending or running.
+
+        Raises:
+            JobQueueFull: max_pending jobs are already waiting
+
+        Returns:
+            The job record plus "deduplicated": True when an existing job was returned
+        """
+        dedup_key = make_key(kind, json.dumps(params, sort_keys=True))
+        job_id = uuid.uuid4().hex
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE dedup_key = ? AND status IN ('pending', 'running')", (dedup_key,)
+            ).fetchone()
+            if row is None:
+                pending = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'pending'").fetchone()[0]
+                if pending >= max_pending:
+                    raise JobQueueFull(f"{pending} jobs are already waiting")
+                conn.execute(
+                    "INSERT INTO jobs (id, kind, params, dedup_key, status, stage, created_at)"
+                    " VALUES (?, ?, ?, ?, 'pending', 'queued', ?)",
+                    (job_id, kind, json.dumps(params), dedup_key, time.time())
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return dict(self.get(job_id), deduplicated=False)
+        return dict(self.get(row["id"]), deduplicated=True)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        del job["dedup_key"], job["heartbeat"], job["worker"]
+        return job
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Atomically take the oldest pending job (or one whose worker stopped heartbeating).
+
+        Returns:
+            The job record plus "worker", the token to pass to progress() and finish()
+        """
+        conn = self._connect()
+        now = time.time()
+        worker = uuid.uuid4().hex
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = 'pending', stage = 'requeued' WHERE status = 'running' AND heartbeat < ?",
+                (now - JOB_LEASE_SECONDS,)
+            )
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'pending' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', stage = 'started', started_at = ?, heartbeat = ?, worker = ?"
+                    " WHERE id = ?",
+                    (now, now, worker, row["id"])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return dict(self.get(row["id"]), worker=worker) if row is not None else None
+
+    def progress(self, job_id: str, worker: str, stage: str, fraction: float) -> bool:
+        """
+        Record progress and renew the lease. Returns False once the job is no longer this worker's.
+        """
+        return self._connect().execute(
+            "UPDATE jobs SET stage = ?, progress = ?, heartbeat = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (stage, min(max(fraction, 0.0), 1.0), time.time(), job_id, worker)
+        ).rowcount > 0
+
+    def finish(self, job_id: str, worker: str, result: Any = None, error: Optional[str] = None) -> bool:
+        """
+        Store the outcome. Returns False (and stores nothing) once the job is no longer this worker's.
+        """
+        if error:
+            updated = self._connect().execute(
+                "UPDATE jobs SET status = 'failed', stage = 'failed', error = ?, finished_at = ?"
+                " WHERE id = ? AND worker = ? AND status = 'running'",
+                (error, time.time(), job_id, worker)
+            ).rowcount
+        else:
+            updated = self._connect().execute(
+                "UPDATE jobs SET status = 'succeeded', stage = 'succeeded', progress = 1, result = ?, finished_at = ?"
+                " WHERE id = ? AND worker = ? AND status = 'running'",
+                (json.dumps(result, default=str), time.time(), job_id, worker)
+            ).rowcount
+        return updated > 0
+
+    def purge(self, older_than: float = JOB_RETENTION_SECONDS) -> int:
+        return self._connect().execute(
+            "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?",
+            (time.time() - older_than,)
+        ).rowcount
+
+class JobWorkers:
+    """
+    A pool of threads that claim and run jobs from the store.
+
+    The pool is sized by JOB_WORKERS independently of the HTTP workers; the
+    same pool can run in a dedicated process via `python jobs.py --workers N`.
+    """
+
+    def __init__(self, store: JobStore, handlers: Dict[str, Callable], size: int = JOB_WORKERS):
+        self.store = store
+        self.handlers = handlers
+        self.size = size
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self.size):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("Started %d job workers", self.size)
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job = self.store.claim()
+            except sqlite3.Error as e:
+                logger.error("Error claiming job: %s", e)
+                job = None
+            if job is None:
+                self._wake.wait(POLL_INTERVAL)
+                self._wake.clear()
+                continue
+            self.run_job(job)
+
+    def run_job(self, job: Dict[str, Any]) -> None:
+        job_id, worker = job["id"], job["worker"]
+        handler = self.handlers.get(job["kind"])
+        logger.info("Running %s job %s", job["kind"], job_id)
+        start = time.perf_counter()
+        try:
+            if handler is None:
+                raise UnknownJobKind(f"No handler for job kind {job['kind']}")
+            result = handler(job["params"], lambda stage, fraction: self.store.progress(job_id, worker, stage, fraction))
+            if isinstance(result, dict) and "error" in result:
+                finished = self.store.finish(job_id, worker, error=result["error"])
+            else:
+                finished = self.store.finish(job_id, worker, result=result)
+            if finished:
+                logger.info("Finished %s job %s in %.1fs", job["kind"], job_id, time.perf_counter() - start)
+            else:
+                logger.warning("Discarded result of %s job %s: its lease passed to another worker", job["kind"], job_id)
+        except Exception as e:
+            logger.error("Error running job %s: %s", job_id, e, exc_info=True)
+            self.store.finish(job_id, worker, error=str(e))
+
+_store: Optional[JobStore] = None
+_workers: Optional[JobWorkers] = None
+
+def get_job_store() -> JobStore:
+    global _store
+    if _store is None:
+        _store = JobStore()
+    return _store
+
+def submit_job(kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate and enqueue a job, waking the local workers.
+
+    Raises:
+        UnknownJobKind, ValueError: the kind or params are invalid
+        JobQueueFull: too many jobs are already waiting
+    """
+    if kind not in REQUIRED_PARAMS:
+        raise UnknownJobKind(f"Unknown job kind: {kind}")
+    missing = [name for name in REQUIRED_PARAMS[kind] if not params.get(name)]
+    if missing:
+        raise ValueError(f"Missing job parameters: {', '.join(missing)}")
+    job = get_job_store().submit(kind, params)
+    if _workers is not None:
+        _workers.wake()
+    return job
+
+def start_job_workers(size: int = JOB_WORKERS) -> Optional[JobWorkers]:
+    """
+    Start this process's job worker threads (no-op when size is 0).
+    """
+    global _workers
+    if size <= 0 or _workers is not None:
+        return _workers
+    store = get_job_store()
+    store.purge()
+    _workers = JobWorkers(store, default_handlers(), size)
+    _workers.start()
+    return _workers
+
+def stop_job_workers() -> None:
+    global _workers
+    if _workers is not None:
+        _workers.stop()
+        _workers = None
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a dedicated pool of job workers")
+    parser.add_argument("--workers", type=int, default=max(JOB_WORKERS, 1))
+    args = parser.parse_args()
+    configure_logging()
+    start_job_workers(args.workers)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stop_job_workers()
+
+if __name__ == "__main__":
+    main()
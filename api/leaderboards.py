@@ -0,0 +1,426 @@
+import os
+import time
+import heapq
+import sqlite3
+import logging
+import tempfile
+import threading
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+from records import Channel, Video
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_SIZE = 100
+WEEK = 7 * 24 * 3600
+MONTH = 30 * 24 * 3600
+# View-count samples older than this are dropped from a channel's history
+HISTORY_SECONDS = 2 * WEEK
+HISTORY_INTERVAL = 3600
+
+# Statistics behind the boards live in a SQLite file shared by every worker on
+# the host, so a restarted worker rebuilds its boards and workers see each
+# other's refreshes
+LEADERBOARDS_PATH = os.getenv(
+    "LEADERBOARDS_PATH", os.path.join(tempfile.gettempdir(), "youtube_research_leaderboards.sqlite3")
+)
+# How often a worker folds in rows written by the other workers
+LEADERBOARD_SYNC_INTERVAL = float(os.getenv("LEADERBOARD_SYNC_INTERVAL", "5"))
+# Re-read rows written this long before the last sync, for writers whose commits lag
+SYNC_OVERLAP = 2.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channels (
+    channel_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    subscribers INTEGER NOT NULL,
+    views INTEGER NOT NULL,
+    videos INTEGER NOT NULL,
+    views_gained_week INTEGER NOT NULL,
+    refreshed_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS channels_updated ON channels (updated_at);
+CREATE TABLE IF NOT EXISTS channel_views (
+    channel_id TEXT NOT NULL,
+    sampled_at REAL NOT NULL,
+    views INTEGER NOT NULL,
+    PRIMARY KEY (channel_id, sampled_at)
+);
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT PRIMARY KEY,
+    channel_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    published_at REAL NOT NULL,
+    views INTEGER NOT NULL,
+    likes INTEGER NOT NULL,
+    comments INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS videos_updated ON videos (updated_at);
+"""
+
+class TopK:
+    """
+    Exact top-K of a keyed, changing score, updated in O(K) per change.
+
+    A sorted buffer holds the best ``capacity`` (> K) keys. ``floor`` is an
+    upper bound on every score outside the buffer, so a key enters the buffer
+    only if it beats everything outside it. Scores that drop out of the buffer
+    shrink it; only when it shrinks below K is it rebuilt from all scores,
+    which the slack makes rare.
+    """
+
+    def __init__(self, k: int = LEADERBOARD_SIZE, slack: int = 2):
+        self.k = k
+        self.capacity = k * slack
+        self.scores: Dict[str, float] = {}
+        self._order: List[Tuple[float, str]] = []  # (-score, key), ascending = best first
+        self._members: Set[str] = set()
+        self._floor = float("-inf")
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def _evict_last(self) -> None:
+        neg, key = self._order.pop()
+        self._members.discard(key)
+        self._floor = max(self._floor, -neg)
+
+    def _remove_member(self, key: str, score: float) -> None:
+        i = bisect_left(self._order, (-score, key))
+        del self._order[i]
+        self._members.discard(key)
+
+    def update(self, key: str, score: float) -> None:
+        old = self.scores.get(key)
+        if old == score:
+            return
+        self.scores[key] = score
+        if key in self._members:
+            self._remove_member(key, old)
+        outside = len(self.scores) - len(self._order) - 1
+        if outside > 0 and score < self._floor:
+            # Some key outside the buffer may beat it, so it stays outside too
+            if len(self._order) < self.k:
+                self.rebuild()
+            return
+        insort(self._order, (-score, key))
+        self._members.add(key)
+        if len(self._order) > self.capacity:
+            self._evict_last()
+        elif len(self._order) == len(self.scores):
+            self._floor = float("-inf")
+
+    def remove(self, key: str) -> None:
+        score = self.scores.pop(key, None)
+        if score is not None and key in self._members:
+            self._remove_member(key, score)
+            if len(self._order) < self.k and len(self.scores) > len(self._order):
+                self.rebuild()
+
+    def rebuild(self) -> None:
+        best = heapq.nlargest(self.capacity + 1, self.scores.items(), key=lambda item: item[1])
+        self._order = sorted((-score, key) for key, score in best[:self.capacity])
+        self._members = {key for _, key in self._order}
+        self._floor = best[self.capacity][1] if len(best) > self.capacity else float("-inf")
+
+    def top(self, k: int, keep: Optional[Callable[[str], bool]] = None) -> List[Tuple[str, float]]:
+        """
+        The k best (key, score) pairs, optionally only keys passing keep().
+        """
+        result = []
+        for neg, key in self._order:
+            if keep is None or keep(key):
+                result.append((key, -neg))
+                if len(result) == k:
+                    return result
+        if len(self.scores) == len(self._order):
+            return result
+        # The buffer ran out before k keys passed the filter; fall back to a full scan
+        items = self.scores.items() if keep is None else ((key, s) for key, s in self.scores.items() if keep(key))
+        return heapq.nlargest(k, items, key=lambda item: item[1])
+
+class LeaderboardStore:
+    """
+    The latest statistics of every channel and video seen, plus each channel's
+    view-count history, in SQLite.
+
+    Weekly gains are computed here from the shared history, so every worker
+    reports the same value however the refreshes were spread across them.
+    """
+
+    def __init__(self, path: str = LEADERBOARDS_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def save_channel(self, channel: Channel, now: float) -> int:
+        """
+        Store a channel snapshot and sample its views.
+
+        Returns:
+            Views gained over the week before now
+        """
+        key = channel.channel_id
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            latest = conn.execute(
+                "SELECT MAX(sampled_at) FROM channel_views WHERE channel_id = ?", (key,)
+            ).fetchone()[0]
+            if latest is None or now - latest >= HISTORY_INTERVAL:
+                conn.execute("INSERT OR REPLACE INTO channel_views (channel_id, sampled_at, views) VALUES (?, ?, ?)",
+                             (key, now, channel.view_count))
+            else:
+                conn.execute("UPDATE channel_views SET views = ? WHERE channel_id = ? AND sampled_at = ?",
+                             (channel.view_count, key, latest))
+            # Keep the newest sample older than the history window as the oldest baseline
+            conn.execute(
+                "DELETE FROM channel_views WHERE channel_id = ? AND sampled_at < ("
+                " SELECT MAX(sampled_at) FROM channel_views WHERE channel_id = ? AND sampled_at <= ?)",
+                (key, key, now - HISTORY_SECONDS)
+            )
+            # Baseline: the latest sample at least a week old, else the oldest one we have
+            baseline = conn.execute(
+                "SELECT views FROM channel_views WHERE channel_id = ? AND sampled_at <= ?"
+                " ORDER BY sampled_at DESC LIMIT 1", (key, now - WEEK)
+            ).fetchone() or conn.execute(
+                "SELECT views FROM channel_views WHERE channel_id = ? ORDER BY sampled_at LIMIT 1", (key,)
+            ).fetchone()
+            gained = channel.view_count - baseline["views"]
+            conn.execute(
+                "INSERT OR REPLACE INTO channels"
+                " (channel_id, name, subscribers, views, videos, views_gained_week, refreshed_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, channel.name, channel.subscriber_count, channel.view_count, channel.video_count, gained, now,
+                 time.time())
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return gained
+
+    def save_videos(self, channel_id: str, videos: List[Video]) -> None:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO videos"
+                " (video_id, channel_id, title, published_at, views, likes, comments, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(v.video_id, channel_id, v.title, v.published_at, v.view_count, v.like_count, v.comment_count,
+                  time.time()) for v in videos]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def channels_since(self, since: float) -> List[sqlite3.Row]:
+        return self._connect().execute("SELECT * FROM channels WHERE updated_at >= ?", (since,)).fetchall()
+
+    def videos_since(self, since: float) -> List[sqlite3.Row]:
+        return self._connect().execute("SELECT * FROM videos WHERE updated_at >= ?", (since,)).fetchall()
+
+class Leaderboards:
+    """
+    Top-K boards over the channel and video statistics seen so far.
+
+    Fed by youtube_utils snapshot listeners, so each refresh costs a handful
+    of O(K) updates and a query is a slice of an already sorted buffer. With
+    a store, snapshots are also written to it, the boards are loaded from it
+    on first use and rows written by other workers are folded in at most
+    every LEADERBOARD_SYNC_INTERVAL seconds.
+
+    views_gained_week is the gain over the week before a channel's latest
+    refresh, so it only moves when the channel is refreshed; channels not
+    refreshed for a week drop off that board rather than show a stale gain.
+    """
+
+    CHANNEL_METRICS = ("subscribers", "views", "videos", "views_gained_week")
+    VIDEO_METRICS = ("video_views", "video_likes", "video_comments", "video_likes_month")
+
+    def __init__(self, k: int = LEADERBOARD_SIZE, store: Optional[LeaderboardStore] = None):
+        self.k = k
+        self.store = store
+        self.boards = {metric: TopK(k) for metric in self.CHANNEL_METRICS + self.VIDEO_METRICS}
+        self.channel_names: Dict[str, str] = {}
+        self.video_titles: Dict[str, str] = {}
+        self.video_channels: Dict[str, str] = {}
+        self.video_published: Dict[str, float] = {}
+        self.channel_videos: Dict[str, Set[str]] = {}
+        self.view_history: Dict[str, Deque[Tuple[float, int]]] = {}
+        self.channel_refreshed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._synced_at: Optional[float] = None
+
+    @property
+    def metrics(self) -> Tuple[str, ...]:
+        return self.CHANNEL_METRICS + self.VIDEO_METRICS
+
+    def _views_gained(self, channel_id: str, views: int, now: float) -> int:
+        history = self.view_history.setdefault(channel_id, deque())
+        if not history or now - history[-1][0] >= HISTORY_INTERVAL:
+            history.append((now, views))
+        else:
+            history[-1] = (history[-1][0], views)
+        while len(history) > 1 and history[1][0] <= now - HISTORY_SECONDS:
+            history.popleft()
+        # Baseline: the latest sample at least a week old, else the oldest one we have
+        baseline = history[0][1]
+        for sampled_at, sampled_views in history:
+            if sampled_at > now - WEEK:
+                break
+            baseline = sampled_views
+        return views - baseline
+
+    def _set_channel(self, key: str, name: str, subscribers: int, views: int, videos: int, gained: int,
+                     refreshed: float) -> None:
+        self.channel_names[key] = name
+        self.channel_refreshed[key] = refreshed
+        self.boards["subscribers"].update(key, subscribers)
+        self.boards["views"].update(key, views)
+        self.boards["videos"].update(key, videos)
+        self.boards["views_gained_week"].update(key, gained)
+
+    def _set_video(self, key: str, channel_id: str, title: str, published_at: float, views: int, likes: int,
+                   comments: int, now: float) -> None:
+        self.video_titles[key] = title
+        self.video_channels[key] = channel_id
+        self.channel_videos.setdefault(channel_id, set()).add(key)
+        self.video_published[key] = published_at
+        self.boards["video_views"].update(key, views)
+        self.boards["video_likes"].update(key, likes)
+        self.boards["video_comments"].update(key, comments)
+        if published_at >= now - MONTH:
+            self.boards["video_likes_month"].update(key, likes)
+
+    def update_channel(self, channel: Channel, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        if self.store is not None:
+            gained = self.store.save_channel(channel, now)
+        with self._lock:
+            if self.store is None:
+                gained = self._views_gained(channel.channel_id, channel.view_count, now)
+            self._set_channel(channel.channel_id, channel.name, channel.subscriber_count, channel.view_count,
+                              channel.video_count, gained, now)
+
+    def update_videos(self, channel_id: str, videos: Iterable[Video], now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        videos = list(videos)
+        if self.store is not None:
+            self.store.save_videos(channel_id, videos)
+        with self._lock:
+            for video in videos:
+                self._set_video(video.video_id, channel_id, video.title, video.published_at, video.view_count,
+                                video.like_count, video.comment_count, now)
+
+    def sync(self, force: bool = False) -> None:
+        """
+        Fold in rows the store gained since the last sync (all of them the first time).
+        """
+        if self.store is None:
+            return
+        if not force and self._synced_at is not None and time.time() - self._synced_at < LEADERBOARD_SYNC_INTERVAL:
+            return
+        with self._sync_lock:
+            now = time.time()
+            if not force and self._synced_at is not None and now - self._synced_at < LEADERBOARD_SYNC_INTERVAL:
+                return
+            since = float("-inf") if self._synced_at is None else self._synced_at - SYNC_OVERLAP
+            channels = self.store.channels_since(since)
+            videos = self.store.videos_since(since)
+            with self._lock:
+                for row in channels:
+                    self._set_channel(row["channel_id"], row["name"], row["subscribers"], row["views"],
+                                      row["videos"], row["views_gained_week"], row["refreshed_at"])
+                for row in videos:
+                    self._set_video(row["video_id"], row["channel_id"], row["title"], row["published_at"],
+                                    row["views"], row["likes"], row["comments"], now)
+            if self._synced_at is None:
+                logger.info("Loaded leaderboards: %d channels, %d videos", len(channels), len(videos))
+            self._synced_at = now
+
+    def top(self, metric: str, k: int = 10, channel_ids: Optional[Set[str]] = None,
+            now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        The k best channels or videos for a metric.
+
+        Args:
+            metric: One of Leaderboards.metrics
+            k: Number of entries
+            channel_ids: Only these channels (or videos of these channels)
+
+        Returns:
+            Ranked entries with raw metric values
+        """
+        self.sync()
+        board = self.boards[metric]
+        is_video = metric in self.VIDEO_METRICS
+        keep = None
+        if metric == "video_likes_month":
+            since = (time.time() if now is None else now) - MONTH
+            keep = lambda key: self.video_published.get(key, 0) >= since
+        elif metric == "views_gained_week":
+            since = (time.time() if now is None else now) - WEEK
+            keep = lambda key: self.channel_refreshed.get(key, 0) >= since
+        with self._lock:
+            if channel_ids is not None:
+                # A followed set is small: rank just its members instead of filtering the whole board
+                keys = (video for c in channel_ids for video in self.channel_videos.get(c, ())) if is_video \
+                    else channel_ids
+                candidates = ((key, board.scores[key]) for key in keys
+                              if key in board.scores and (keep is None or keep(key)))
+                ranked = heapq.nlargest(k, candidates, key=lambda item: item[1])
+            else:
+                ranked = board.top(min(k, self.k) if keep is None else k, keep)
+        entries = []
+        for rank, (key, value) in enumerate(ranked, 1):
+            entry = {"rank": rank, "value": int(value)}
+            if is_video:
+                entry.update(video_id=key, title=self.video_titles.get(key, ""),
+                             channel_id=self.video_channels.get(key, ""),
+                             url=f"https://youtube.com/watch?v={key}")
+            else:
+                entry.update(channel_id=key, name=self.channel_names.get(key, ""))
+            entries.append(entry)
+        return entries
+
+_leaderboards: Optional[Leaderboards] = None
+_leaderboards_lock = threading.Lock()
+
+def get_leaderboards() -> Leaderboards:
+    """
+    The process's leaderboards, loaded from the shared store on first use.
+    """
+    global _leaderboards
+    with _leaderboards_lock:
+        if _leaderboards is None:
+            _leaderboards = Leaderboards(store=LeaderboardStore())
+            _leaderboards.sync(force=True)
+    return _leaderboards
+
+def update_leaderboards(channel_id: str, channel: Optional[Channel], videos: List[Video]) -> None:
+    """
+    Snapshot listener: fold freshly fetched statistics into the leaderboards.
+    """
+    boards = get_leaderboards()
+    if channel is not None:
+        boards.update_channel(channel)
+    if videos:
+        boards.update_videos(channel_id, videos)
@@ -0,0 +1,245 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" for one structured record per line, "text" for the old human-readable format
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Fraction of requests per route whose INFO lines are kept, e.g. "/api/chat=0.1,/api/youtube=0.1"
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+# Record the calling file and line; the stack walk is the largest part of creating a record
+LOG_CALLER = os.getenv("LOG_CALLER", "false").lower() == "true"
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+REQUEST_ID_HEADER = b"x-request-id"
+# Loggers of modules under this directory (and the request logger) skip unsampled records early
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+_route: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("route", default=None)
+_sampled: contextvars.ContextVar[bool] = contextvars.ContextVar("sampled", default=True)
+_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("timings", default=None)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+dropped_records = 0
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    rates = {}
+    for item in spec.split(","):
+        if "=" in item:
+            route, rate = item.split("=", 1)
+            rates[route.strip()] = float(rate)
+    return rates
+
+SAMPLE_RATES = parse_sample_rates(LOG_SAMPLE_RATES)
+
+def get_request_id() -> Optional[str]:
+    return _request_id.get()
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a stage of the current request; the duration lands in its summary record.
+
+    Usage:
+        with stage("youtube"):
+            channel_info = get_channel_info(channel_name)
+    """
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+class SampledLogger(logging.Logger):
+    """
+    Logger that skips INFO and below for unsampled requests before a record is built.
+
+    Only this package's loggers are switched to it (see sample_package_loggers);
+    third-party loggers keep their class and are sampled by ContextFilter.
+    """
+
+    def isEnabledFor(self, level: int) -> bool:
+        if level <= logging.INFO and not _sampled.get():
+            return False
+        return super().isEnabledFor(level)
+
+class ContextFilter(logging.Filter):
+    """
+    Stamp records with the current request and drop INFO and below for unsampled requests.
+
+    Runs on the calling thread, before the record is queued, so the context
+    variables are those of the request that logged it. Also catches records
+    from loggers that bypass SampledLogger.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.INFO and not _sampled.get():
+            return False
+        record.request_id = _request_id.get()
+        record.route = _route.get()
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record: time, level, logger, message, request context and any extra fields.
+    """
+
+    # Attributes every LogRecord has; anything else was passed with extra=
+    RESERVED = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self.RESERVED and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class BackgroundQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock prepare() formats the whole record, traceback included, on the
+    caller's thread. Only the %-interpolation happens here, so the arguments
+    are captured as they are now; JSON encoding, tracebacks and the write
+    itself happen on the listener thread. A full queue drops the record
+    rather than blocking the request.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        global dropped_records
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records += 1
+
+def _is_package_logger(name: str) -> bool:
+    if name == "request":
+        return True
+    path = getattr(sys.modules.get(name), "__file__", None)
+    if not path:
+        return False
+    path = os.path.abspath(path)
+    return path.startswith(PACKAGE_ROOT + os.sep) and "site-packages" not in path
+
+def sample_package_loggers() -> None:
+    """
+    Switch the existing loggers of this package's modules to SampledLogger.
+
+    Called by configure_logging and again by RequestLoggingMiddleware, once the
+    app's modules have been imported; a logger created later still has its
+    unsampled records dropped by ContextFilter, only after they are built.
+    """
+    for name, existing in list(logging.Logger.manager.loggerDict.items()):
+        if type(existing) is logging.Logger and _is_package_logger(name):
+            existing.__class__ = SampledLogger
+
+def configure_logging(stream=None) -> None:
+    """
+    Route every logger through one queue drained by a background thread.
+
+    Safe to call from every entry module; only the first call installs the handlers.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    sample_package_loggers()
+    # The switches the logging HOWTO lists for skipping unused record fields
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+    if not LOG_CALLER:
+        logging._srcfile = None
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    handler = BackgroundQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(ContextFilter())
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+def shutdown_logging() -> None:
+    """
+    Flush queued records and stop the listener thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+class RequestLoggingMiddleware:
+    """
+    ASGI middleware giving every request an ID, a sampling decision and stage timings.
+
+    The ID comes from an incoming X-Request-Id header or is generated, and is
+    echoed in the response. When the request ends one summary record carries
+    its status, duration and stage timings; it is subject to the route's
+    sample rate unless the request failed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.logger = logging.getLogger("request")
+        sample_package_loggers()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+
+        header = next((v for k, v in scope["headers"] if k == REQUEST_ID_HEADER), None)
+        request_id = header.decode("latin-1")[:64] if header else f"{random.getrandbits(64):016x}"
+        route = scope["path"]
+        rate = SAMPLE_RATES.get(route, 1.0)
+        timings: Dict[str, float] = {}
+        tokens = (_request_id.set(request_id), _route.set(route),
+                  _sampled.set(rate >= 1.0 or random.random() < rate), _timings.set(timings))
+        status = 500 if scope["type"] == "http" else 101
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(REQUEST_ID_HEADER, request_id.encode())]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            level = logging.WARNING if status >= 500 else logging.INFO
+            self.logger.log(level, "%s %s %d", scope.get("method", "WS"), route, status, extra={
+                "status": status,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+                "stages": {name: round(ms, 2) for name, ms in timings.items()},
+            })
+            for var, token in zip((_request_id, _route, _sampled, _timings), tokens):
+                var.reset(token)
@@ -1,13 +1,20 @@
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from agent.agent import run_agent, get_youtube_client
-from typing import Optional, Dict, Any
+from agent.memory import memory_namespace
+from agent.memory_queue import shutdown_memory_queue
+from agent.memory_maintenance import compact_memories, DUPLICATE_THRESHOLD
+from metrics import render_metrics
+from profiling import ProfilingMiddleware, recent_profiles, read_profile, is_admin, profiled
+from admission import admit
+from logging_setup import configure_logging, RequestLoggingMiddleware
+from typing import Optional, Dict, Any, List
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
@@ -25,10 +32,21 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Opt-in per-request profiling (signed X-Profile header or PROFILE_SAMPLE_RATE)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RequestLoggingMiddleware)
+
+# Flush queued memories before the worker exits
+@app.on_event("shutdown")
+def drain_memory_queue():
+    shutdown_memory_queue()
 
 # Request and Response schemas
 class Query(BaseModel):
     question: str
+    # Memories of the exchange go to this user's (or session's) namespace
+    user_id: Optional[str] = None
+    session_id: Optional[str] = None
 
 class YouTubeResponse(BaseModel):
     response: str
@@ -41,10 +59,15 @@ class ChatResponse(BaseModel):
     success: bool = True
     error: Optional[str] = None
 
+class CompactionRequest(BaseModel):
+    namespaces: Optional[List[str]] = None
+    threshold: float = DUPLICATE_THRESHOLD
+    dry_run: bool = False
+
 # Error handler for generic exceptions
 @app.exception_handler(Exception)
 async def generic_exception_handler(request: Request, exc: Exception):
-    logger.error(f"Error processing request: {str(exc)}")
+    logger.error("Error processing request: %s", exc)
     return JSONResponse(
         status_code=500,
         content={
@@ -56,12 +79,13 @@ async def generic_exception_handler(request: Request, exc: Exception):
 
 # Route to process YouTube-related questions
 @app.post("/youtube", response_model=YouTubeResponse)
-async def youtube_question(query: Query):
+async def youtube_question(query: Query, request: Request):
     try:
-        logger.info(f"Received YouTube question: {query.question}")
+        logger.info("Received YouTube question: %.80s", query.question)
         
         # Call your main agent logic with YouTube-specific context
-        result = run_agent(query.question, context="youtube")
+        async with admit(request, "/youtube", ("youtube", "gemini"), priority="analytics"):
+            result = await run_in_threadpool(profiled(run_agent), query.question, context="youtube")
         
         response = YouTubeResponse(
             response=result["response"],
@@ -72,8 +96,10 @@ async def youtube_question(query: Query):
         logger.info("Successfully processed YouTube question")
         return response
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error processing YouTube question: {str(e)}")
+        logger.error("Error processing YouTube question: %s", e)
         raise HTTPException(
             status_code=500,
             detail=str(e)
@@ -81,12 +107,15 @@ async def youtube_question(query: Query):
 
 # Route to process general chat questions
 @app.post("/chat", response_model=ChatResponse)
-async def chat_question(query: Query):
+async def chat_question(query: Query, request: Request):
     try:
-        logger.info(f"Received chat question: {query.question}")
+        logger.info("Received chat question: %.80s", query.question)
         
         # Call your main agent logic with general context
-        result = run_agent(query.question, context="general")
+        async with admit(request, "/chat", ("gemini",), priority="interactive"):
+            namespace = memory_namespace(query.user_id, query.session_id)
+            result = await run_in_threadpool(profiled(run_agent), query.question, context="general",
+                                             namespace=namespace)
         
         response = ChatResponse(
             response=result["response"],
@@ -96,8 +125,10 @@ async def chat_question(query: Query):
         logger.info("Successfully processed chat question")
         return response
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error processing chat question: {str(e)}")
+        logger.error("Error processing chat question: %s", e)
         raise HTTPException(
             status_code=500,
             detail=str(e)
@@ -130,12 +161,42 @@ async def test_youtube_api():
             }
             
     except Exception as e:
-        logger.error(f"YouTube API test failed: {str(e)}")
+        logger.error("YouTube API test failed: %s", e)
         return {
             "status": "error",
             "message": str(e)
         }
 
+# Memory maintenance: expire TTL'd memories and merge near-duplicates
+# Deletes vectors, so it takes the admin token like the profile routes
+@app.post("/memory/compact")
+def compact_memory(body: CompactionRequest, request: Request):
+    if not is_admin(request.headers.get("authorization")):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    logger.info("Starting memory compaction")
+    return compact_memories(body.namespaces, threshold=body.threshold, dry_run=body.dry_run)
+
+# Prometheus metrics for this worker
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return render_metrics()
+
+# Recently captured request profiles
+@app.get("/admin/profiles")
+def list_profiles(request: Request):
+    if not is_admin(request.headers.get("authorization")):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return {"profiles": recent_profiles()}
+
+@app.get("/admin/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str, request: Request):
+    if not is_admin(request.headers.get("authorization")):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    profile = read_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
 # Root route for testing
 @app.get("/")
 def read_root():
@@ -1,32 +1,76 @@
 import os
+import time
+import logging
+import threading
 from pinecone import Pinecone, ServerlessSpec
 from dotenv import load_dotenv
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from index_config import (
+    EMBEDDING_DIMENSION, METRIC, HOME_INDEX, ALIAS_NAMESPACE, ALIAS_CHECK_INTERVAL, resolve_index_name
+)
+from transport import REPLAYING, recorded, encode_matches, decode_matches, encode_vectors, decode_vectors
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Load from .env
 api_key = os.getenv("PINECONE_API_KEY")
-index_name = os.getenv("PINECONE_INDEX")
 cloud = os.getenv("PINECONE_CLOUD", "aws")
 region = os.getenv("PINECONE_REGION", "us-east-1")
 
 # Create Pinecone client
 pc = Pinecone(api_key=api_key)
 
-# Create index if it doesn't exist
-if index_name not in pc.list_indexes().names():
+# Create the home index if it doesn't exist, since it holds the alias (skipped
+# when replaying recorded traffic offline)
+if not REPLAYING and HOME_INDEX not in pc.list_indexes().names():
     pc.create_index(
-        name=index_name,
-        dimension=768,  # dimension for Gemini embeddings
-        metric="cosine",
+        name=HOME_INDEX,
+        dimension=EMBEDDING_DIMENSION,
+        metric=METRIC,
         spec=ServerlessSpec(cloud=cloud, region=region)
     )
 
+# The shared alias, when set, overrides PINECONE_INDEX
+index_name = resolve_index_name(None if REPLAYING else pc)
+
 # Connect to index
-index = pc.Index(index_name)
+index = None if REPLAYING else pc.Index(index_name)
+
+_alias_lock = threading.Lock()
+_alias_checked_at = time.monotonic()
 
-def upsert_data(id: str, vector: List[float], metadata: Optional[Dict[str, Any]] = None) -> None:
+def get_index():
+    """
+    Get the active index, following the shared alias when it is flipped to a new index.
+    
+    Returns:
+        The Pinecone index handle
+    """
+    global index, index_name, _alias_checked_at
+    now = time.monotonic()
+    if REPLAYING or now - _alias_checked_at < ALIAS_CHECK_INTERVAL:
+        return index
+    with _alias_lock:
+        if now - _alias_checked_at < ALIAS_CHECK_INTERVAL:
+            return index
+        _alias_checked_at = now
+        try:
+            target = resolve_index_name(pc)
+        except Exception as e:
+            # Keep serving from the current index; the next check retries
+            logger.warning("Could not read the index alias: %s", e)
+            return index
+        if target and target != index_name:
+            logger.info("Index alias moved from '%s' to '%s'", index_name, target)
+            index_name = target
+            index = pc.Index(target)
+    return index
+
+@recorded("pinecone")
+def upsert_data(id: str, vector: List[float], metadata: Optional[Dict[str, Any]] = None,
+                namespace: str = "") -> None:
     """
     Upsert a vector with metadata into the Pinecone index.
     
@@ -34,35 +78,120 @@ def upsert_data(id: str, vector: List[float], metadata: Optional[Dict[str, Any]]
         id: Unique identifier for the vector
         vector: The vector to store
         metadata: Optional metadata dictionary
+        namespace: Namespace (partition) to write to
     """
-    index.upsert(vectors=[(id, vector, metadata or {})])
+    get_index().upsert(vectors=[(id, vector, metadata or {})], namespace=namespace)
 
-def query_data(vector: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+@recorded("pinecone")
+def upsert_batch(vectors: List[Tuple[str, List[float], Dict[str, Any]]], namespace: str = "") -> None:
+    """
+    Upsert several vectors in a single request.
+
+    Args:
+        vectors: (id, vector, metadata) tuples to store
+        namespace: Namespace (partition) to write to
+    """
+    if vectors:
+        get_index().upsert(vectors=vectors, namespace=namespace)
+
+@recorded("pinecone", encode=encode_matches, decode=decode_matches)
+def query_data(vector: List[float], top_k: int = 5, namespace: str = "") -> List[Dict[str, Any]]:
     """
     Query the index for similar vectors.
     
     Args:
         vector: Query vector
         top_k: Number of results to return
+        namespace: Namespace (partition) to search
         
     Returns:
         List of matches with their scores and metadata
     """
-    results = index.query(
+    results = get_index().query(
         vector=vector,
         top_k=top_k,
+        namespace=namespace,
         include_metadata=True
     )
     return results.matches
 
-def delete_data(id: str) -> None:
+@recorded("pinecone", encode=encode_vectors, decode=decode_vectors)
+def fetch_data(ids: List[str], namespace: str = "") -> Dict[str, Any]:
+    """
+    Fetch stored vectors and metadata by ID.
+    
+    Args:
+        ids: IDs to fetch (at most 1000 per call)
+        namespace: Namespace (partition) to read from
+        
+    Returns:
+        Mapping of ID to vector record
+    """
+    return get_index().fetch(ids=ids, namespace=namespace).vectors
+
+@recorded("pinecone")
+def list_ids(namespace: str = "") -> List[str]:
+    """
+    List every vector ID in a namespace.
+    
+    Args:
+        namespace: Namespace (partition) to list
+        
+    Returns:
+        List of vector IDs
+    """
+    ids = []
+    for page in get_index().list(namespace=namespace):
+        ids.extend(page)
+    return ids
+
+@recorded("pinecone")
+def update_metadata(id: str, metadata: Dict[str, Any], namespace: str = "") -> None:
+    """
+    Overwrite selected metadata fields of a stored vector.
+    
+    Args:
+        id: ID of the vector to update
+        metadata: Fields to set
+        namespace: Namespace (partition) of the vector
+    """
+    get_index().update(id=id, set_metadata=metadata, namespace=namespace)
+
+@recorded("pinecone")
+def delete_data(id: str, namespace: str = "") -> None:
     """
     Delete a vector from the index.
     
     Args:
         id: ID of the vector to delete
+        namespace: Namespace (partition) of the vector
+    """
+    get_index().delete(ids=[id], namespace=namespace)
+
+@recorded("pinecone")
+def delete_batch(ids: List[str], namespace: str = "") -> None:
+    """
+    Delete several vectors, 1000 IDs per request.
+    
+    Args:
+        ids: IDs of the vectors to delete
+        namespace: Namespace (partition) of the vectors
+    """
+    for start in range(0, len(ids), 1000):
+        get_index().delete(ids=ids[start:start + 1000], namespace=namespace)
+
+@recorded("pinecone")
+def namespace_sizes() -> Dict[str, int]:
+    """
+    Get the number of stored vectors per namespace.
+    
+    Returns:
+        Mapping of namespace to vector count
     """
-    index.delete(ids=[id])
+    stats = get_index().describe_index_stats()
+    return {
+        name: summary.vector_count for name, summary in stats.namespaces.items() if name != ALIAS_NAMESPACE
+    }
 
 def list_indexes() -> List[str]:
     """
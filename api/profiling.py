@@ -0,0 +1,340 @@
+import io
+import os
+import re
+import sys
+import hmac
+import json
+import time
+import uuid
+import random
+import pstats
+import hashlib
+import logging
+import cProfile
+import threading
+import contextvars
+from contextlib import contextmanager
+from collections import Counter
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Requests carrying a valid signed X-Profile header are always profiled
+PROFILE_SECRET = os.getenv("PROFILE_SECRET", "")
+# Fraction of unsigned requests profiled at random (0 disables sampling)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# "sample": statistical stack sampling, "cprofile": deterministic, in profiled() pool work only
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sample")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+# Signed headers older than this are rejected so a leaked header cannot be replayed forever
+SIGNATURE_MAX_AGE = 300
+
+PROFILE_HEADER = b"x-profile"
+ENABLED = bool(PROFILE_SECRET) or PROFILE_SAMPLE_RATE > 0
+
+# Stored profiles are "<unix time>-<route>-<id>.<collapsed|txt>" with a "<same stem>.json" metadata file
+PROFILE_META_PATTERN = re.compile(r"^(\d+)-.*-([0-9a-f]{12})\.json$")
+# cProfile's hook is per interpreter on 3.12+, so only one cprofile capture runs at a time
+_cprofile_lock = threading.Lock()
+_active: contextvars.ContextVar[Optional[Union["StackSampler", "ThreadProfiles"]]] = contextvars.ContextVar(
+    "active_profile", default=None
+)
+
+def sign(path: str, timestamp: Optional[int] = None, secret: str = PROFILE_SECRET) -> str:
+    """
+    Build an X-Profile header value for a request path: "<unix time>:<hex HMAC-SHA256>".
+    """
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    digest = hmac.new(secret.encode(), f"{timestamp}:{path}".encode(), hashlib.sha256).hexdigest()
+    return f"{timestamp}:{digest}"
+
+def verify(header: str, path: str) -> bool:
+    if not PROFILE_SECRET:
+        return False
+    try:
+        timestamp = int(header.split(":", 1)[0])
+    except ValueError:
+        return False
+    if abs(time.time() - timestamp) > SIGNATURE_MAX_AGE:
+        return False
+    return hmac.compare_digest(header, sign(path, timestamp))
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class StackSampler:
+    """
+    Statistical profiler for one request.
+
+    A background thread reads the stacks of the threads serving the request
+    every PROFILE_INTERVAL seconds via sys._current_frames() and counts each
+    distinct stack, which is exactly the collapsed-stack flamegraph format.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.threads = {threading.get_ident()}
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in list(self.threads):
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        """Samples the calling thread for the duration of the block."""
+        ident = threading.get_ident()
+        self.threads.add(ident)
+        try:
+            yield
+        finally:
+            # The pool thread goes on to serve other requests
+            self.threads.discard(ident)
+
+class ThreadProfiles:
+    """
+    cProfile profiles of one request's profiled() work, one per call.
+
+    The event loop is not profiled: across an await it runs other requests'
+    coroutines, which a profiler enabled there would charge to this one.
+    Each profiled() call enables its own profiler on the pool thread, one
+    call at a time; stats() merges them.
+    """
+
+    def __init__(self):
+        self.profilers: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self._running = threading.Lock()
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        """Profiles the calling thread for the duration of the block."""
+        if not self._running.acquire(blocking=False):
+            # Another call of this request is being profiled; cProfile cannot hook two threads at once
+            yield
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+        finally:
+            self._running.release()
+        with self._lock:
+            self.profilers.append(profiler)
+
+    def stats(self) -> Optional[pstats.Stats]:
+        with self._lock:
+            profilers = list(self.profilers)
+        stats = None
+        for profiler in profilers:
+            if stats is None:
+                stats = pstats.Stats(profiler, stream=io.StringIO())
+            else:
+                stats.add(profiler)
+        return stats
+
+def profiled(fn: Callable) -> Callable:
+    """
+    Wrap a function run in a thread pool so its thread is profiled with the request.
+
+    The request's context (and so its profile) is copied into the worker
+    thread; the thread is tracked only while the function runs.
+    """
+    def wrapper(*args, **kwargs):
+        profile = _active.get()
+        if profile is None:
+            return fn(*args, **kwargs)
+        with profile.track():
+            return fn(*args, **kwargs)
+    return wrapper
+
+def _meta_files() -> List[str]:
+    """
+    Metadata files in PROFILE_DIR, newest first. Every worker process writes
+    to the same directory, so this is the one list of stored profiles.
+    """
+    try:
+        names = os.listdir(PROFILE_DIR)
+    except FileNotFoundError:
+        return []
+    matches = sorted(filter(None, map(PROFILE_META_PATTERN.match, names)),
+                     key=lambda match: int(match.group(1)), reverse=True)
+    return [os.path.join(PROFILE_DIR, match.group(0)) for match in matches]
+
+def _remove(meta_file: str) -> None:
+    stem = meta_file[:-len(".json")]
+    for path in (stem + ".collapsed", stem + ".txt", meta_file):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _store(meta: Dict[str, Any], body: str) -> None:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(meta["file"], "w") as f:
+        f.write(body)
+    # The metadata goes last: a profile is listed only once its body is complete
+    meta_file = os.path.splitext(meta["file"])[0] + ".json"
+    with open(meta_file + ".tmp", "w") as f:
+        json.dump({k: v for k, v in meta.items() if k != "file"}, f)
+    os.replace(meta_file + ".tmp", meta_file)
+    for stale in _meta_files()[PROFILE_KEEP:]:
+        _remove(stale)
+
+def recent_profiles() -> List[Dict[str, Any]]:
+    """
+    Metadata of the most recent profiles, newest first.
+    """
+    profiles = []
+    for meta_file in _meta_files()[:PROFILE_KEEP]:
+        try:
+            with open(meta_file) as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            # Pruned by another process since the listing, or still being replaced
+            continue
+    return profiles
+
+def read_profile(profile_id: str) -> Optional[str]:
+    """
+    The stored profile: collapsed stacks for sampled profiles, a pstats listing for cProfile ones.
+    """
+    suffix = f"-{profile_id}.json"
+    meta_file = next((path for path in _meta_files() if path.endswith(suffix)), None)
+    if meta_file is None:
+        return None
+    stem = meta_file[:-len(".json")]
+    for path in (stem + ".collapsed", stem + ".txt"):
+        try:
+            with open(path) as f:
+                return f.read()
+        except FileNotFoundError:
+            continue
+        except OSError:
+            return None
+    return None
+
+def is_admin(token: Optional[str]) -> bool:
+    """
+    Admin endpoints accept the profiling secret as a bearer token.
+    """
+    return bool(PROFILE_SECRET) and bool(token) and hmac.compare_digest(token, f"Bearer {PROFILE_SECRET}")
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles single requests on demand.
+
+    A request is profiled when it carries a valid signed X-Profile header or
+    is picked by PROFILE_SAMPLE_RATE. The response gets an X-Profile-Id header
+    naming the stored profile. With neither a secret nor a sample rate
+    configured the middleware is a single attribute check per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not ENABLED or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        trigger = None
+        header = next((v for k, v in scope["headers"] if k == PROFILE_HEADER), None)
+        if header is not None and verify(header.decode("latin-1"), scope["path"]):
+            trigger = "header"
+        elif PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            trigger = "sample"
+        if trigger is None:
+            return await self.app(scope, receive, send)
+        if PROFILE_MODE == "cprofile" and not _cprofile_lock.acquire(blocking=False):
+            logger.debug("Not profiling %s: another cprofile capture is running", scope["path"])
+            return await self.app(scope, receive, send)
+
+        profile_id = uuid.uuid4().hex[:12]
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        started_at = time.time()
+        start = time.perf_counter()
+        if PROFILE_MODE == "cprofile":
+            profiles = ThreadProfiles()
+            token = _active.set(profiles)
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                _active.reset(token)
+                _cprofile_lock.release()
+                body = self._pstats_text(profiles)
+                self._finish(profile_id, scope, trigger, started_at, start, "cprofile", body, None)
+        else:
+            sampler = StackSampler()
+            token = _active.set(sampler)
+            sampler.start()
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                sampler.stop()
+                _active.reset(token)
+                self._finish(profile_id, scope, trigger, started_at, start, "sample", sampler.collapsed(), sampler.samples)
+
+    @staticmethod
+    def _pstats_text(profiles: ThreadProfiles) -> str:
+        stream = io.StringIO()
+        stats = profiles.stats()
+        if stats is not None:
+            stats.stream = stream
+            stats.sort_stats("cumulative").print_stats(60)
+        return stream.getvalue()
+
+    @staticmethod
+    def _finish(profile_id: str, scope, trigger: str, started_at: float, start: float,
+                mode: str, body: str, samples: Optional[int]) -> None:
+        duration_ms = (time.perf_counter() - start) * 1000
+        extension = "collapsed" if mode == "sample" else "txt"
+        route = scope["path"].strip("/").replace("/", "_") or "root"
+        meta = {
+            "id": profile_id,
+            "method": scope["method"],
+            "path": scope["path"],
+            "trigger": trigger,
+            "mode": mode,
+            "started_at": started_at,
+            "duration_ms": round(duration_ms, 2),
+            "samples": samples,
+            "file": os.path.join(PROFILE_DIR, f"{int(started_at)}-{route}-{profile_id}.{extension}"),
+        }
+        try:
+            _store(meta, body)
+            logger.info("Stored %s profile %s for %s %s (%.0f ms)", mode, profile_id, scope["method"], scope["path"], duration_ms)
+        except OSError as e:
+            logger.error("Error storing profile %s: %s", profile_id, e)
@@ -0,0 +1,18 @@
+from typing import Any, List, Optional
+
+def script_prompt(topic: str, trending: Optional[List[Any]] = None) -> str:
+    """
+    The prompt for a full YouTube script, shared by the script job and the agent's tools.
+
+    Args:
+        topic: The video topic
+        trending: Search results (with title and snippet) currently trending around it
+    """
+    prompt = f"""
+    Write a detailed and engaging YouTube script for the topic: {topic}.
+    Include: Hook, Introduction, 3 Key Points, and a Conclusion with CTA.
+    """
+    if trending:
+        headlines = "\n".join(f"- {result.title}: {result.snippet}" for result in trending[:5])
+        prompt += f"\n    Currently trending around this topic:\n{headlines}\n"
+    return prompt
@@ -0,0 +1,225 @@
+import os
+import re
+import time
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+DURATION_PATTERN = re.compile(r"P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?")
+# Public origin of this API (e.g. https://api.example.com). Thumbnail URLs are
+# made absolute with it; unset, they are relative to the API's origin, which a
+# frontend on another origin must resolve against NEXT_PUBLIC_API_URL.
+PUBLIC_API_URL = os.getenv("PUBLIC_API_URL", "").rstrip("/")
+
+def format_number(num: int) -> str:
+    """
+    Format large numbers into readable strings (e.g., 1000000 -> 1M).
+    """
+    if num >= 1000000000:
+        return f"{num/1000000000:.1f}B"
+    elif num >= 1000000:
+        return f"{num/1000000:.1f}M"
+    elif num >= 1000:
+        return f"{num/1000:.1f}K"
+    return str(num)
+
+def parse_timestamp(value: str) -> float:
+    """
+    Parse an API timestamp (e.g. 2024-03-01T12:00:00Z) to epoch seconds.
+    """
+    if not value:
+        return 0.0
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+def format_timestamp(timestamp: float) -> str:
+    """
+    Format epoch seconds the way the API reports timestamps.
+    """
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp))
+
+def parse_duration(duration: str) -> int:
+    """
+    Convert an ISO 8601 duration (e.g. PT1H2M3S) to seconds.
+    """
+    match = DURATION_PATTERN.fullmatch(duration or "")
+    if not match:
+        return 0
+    days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+def format_duration(seconds: int) -> str:
+    """
+    Convert seconds back to an ISO 8601 duration.
+    """
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    parts = [f"{hours}H" if hours else "", f"{minutes}M" if minutes else "", f"{seconds}S" if seconds else ""]
+    return "PT" + ("".join(parts) or "0S")
+
+class Channel:
+    """
+    A channel with raw statistics. Formatting happens only in to_dict().
+    """
+    __slots__ = ("channel_id", "name", "description", "subscriber_count", "video_count", "view_count")
+
+    def __init__(self, channel_id: str, name: str, description: str,
+                 subscriber_count: int, video_count: int, view_count: int):
+        self.channel_id = channel_id
+        self.name = name
+        self.description = description
+        self.subscriber_count = subscriber_count
+        self.video_count = video_count
+        self.view_count = view_count
+
+    @classmethod
+    def from_api(cls, item: Dict[str, Any]) -> "Channel":
+        """
+        Build a Channel from a channels.list item (snippet and statistics parts).
+        """
+        stats = item["statistics"]
+        return cls(
+            channel_id=item["id"],
+            name=item["snippet"]["title"],
+            description=item["snippet"]["description"],
+            subscriber_count=int(stats.get("subscriberCount", 0)),
+            video_count=int(stats.get("videoCount", 0)),
+            view_count=int(stats.get("viewCount", 0))
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize with human-readable numbers, as returned by get_channel_info().
+        """
+        return {
+            "name": self.name,
+            "description": self.description,
+            "subscriber_count": format_number(self.subscriber_count),
+            "video_count": format_number(self.video_count),
+            "view_count": format_number(self.view_count),
+            "channel_id": self.channel_id
+        }
+
+    def to_raw_dict(self) -> Dict[str, Any]:
+        """
+        Serialize with raw integers.
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class Video:
+    """
+    A video with raw statistics and a parsed publish time.
+    """
+    __slots__ = ("video_id", "title", "description", "published_at", "view_count",
+                 "like_count", "comment_count", "duration", "thumbnail")
+
+    def __init__(self, video_id: str, title: str, description: str, published_at: float,
+                 view_count: int, like_count: int, comment_count: int, duration: int,
+                 thumbnail: str = ""):
+        self.video_id = video_id
+        self.title = title
+        self.description = description
+        self.published_at = published_at
+        self.view_count = view_count
+        self.like_count = like_count
+        self.comment_count = comment_count
+        self.duration = duration
+        self.thumbnail = thumbnail
+
+    @classmethod
+    def from_api(cls, item: Dict[str, Any]) -> "Video":
+        """
+        Build a Video from a videos.list item (snippet, statistics and contentDetails parts).
+        """
+        snippet = item["snippet"]
+        stats = item.get("statistics", {})
+        thumbnails = snippet.get("thumbnails", {})
+        return cls(
+            video_id=item["id"],
+            title=snippet["title"],
+            description=snippet.get("description", ""),
+            published_at=parse_timestamp(snippet.get("publishedAt", "")),
+            view_count=int(stats.get("viewCount", 0)),
+            like_count=int(stats.get("likeCount", 0)),
+            comment_count=int(stats.get("commentCount", 0)),
+            duration=parse_duration(item.get("contentDetails", {}).get("duration", "")),
+            thumbnail=(thumbnails.get("high") or thumbnails.get("default") or {}).get("url", "")
+        )
+
+    @property
+    def url(self) -> str:
+        return f"https://youtube.com/watch?v={self.video_id}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize with human-readable numbers, as returned by get_latest_videos().
+        """
+        return {
+            "title": self.title,
+            "description": self.description,
+            "published_at": format_timestamp(self.published_at),
+            "views": format_number(self.view_count),
+            "likes": format_number(self.like_count),
+            "comments": format_number(self.comment_count),
+            "duration": format_duration(self.duration),
+            "url": self.url,
+            # Served through the caching proxy instead of hot-linking the full-size image
+            "thumbnail": f"{PUBLIC_API_URL}/api/thumbnails/{self.video_id}?size=medium"
+        }
+
+    def to_raw_dict(self) -> Dict[str, Any]:
+        """
+        Serialize with raw integers and epoch-second timestamps.
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class VideoTable:
+    """
+    Columnar container for many videos.
+
+    Numeric fields live in typed arrays (8 bytes per value, no per-value
+    objects) and strings in parallel lists, so a cached list of videos costs a
+    fraction of the equivalent list of dicts. Rows are materialized as Video
+    records only when iterated or serialized.
+    """
+
+    NUMERIC_COLUMNS = ("published_at", "view_count", "like_count", "comment_count", "duration")
+    TEXT_COLUMNS = ("video_id", "title", "description", "thumbnail")
+
+    def __init__(self, videos: Optional[List[Video]] = None):
+        self.video_id: List[str] = []
+        self.title: List[str] = []
+        self.description: List[str] = []
+        self.thumbnail: List[str] = []
+        self.published_at = array("d")
+        self.view_count = array("q")
+        self.like_count = array("q")
+        self.comment_count = array("q")
+        self.duration = array("q")
+        for video in videos or []:
+            self.append(video)
+
+    def __len__(self) -> int:
+        return len(self.video_id)
+
+    def append(self, video: Video) -> None:
+        for name in self.TEXT_COLUMNS + self.NUMERIC_COLUMNS:
+            getattr(self, name).append(getattr(video, name))
+
+    def row(self, i: int) -> Video:
+        return Video(*(getattr(self, name)[i] for name in Video.__slots__))
+
+    def __iter__(self) -> Iterator[Video]:
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """
+        Serialize every row with human-readable numbers.
+        """
+        return [video.to_dict() for video in self]
+
+    def to_raw_dicts(self) -> List[Dict[str, Any]]:
+        """
+        Serialize every row with raw integers.
+        """
+        return [video.to_raw_dict() for video in self]
@@ -0,0 +1,112 @@
+import json
+import gzip
+import hashlib
+from typing import Any, Dict, Optional
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed; the headers would eat the savings
+COMPRESSION_MIN_BYTES = 1024
+
+def dumps(content: Any) -> bytes:
+    """
+    Serialize to JSON bytes, with orjson when it is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def select_fields(content: Any, fields: Optional[str]) -> Any:
+    """
+    Keep only the requested fields of a response.
+
+    Fields are comma-separated dotted paths (e.g. "answer,youtube_data.channel_info.name").
+    A path through a list applies to every element of the list.
+    """
+    if not fields:
+        return content
+    tree: Dict[str, Any] = {}
+    for path in fields.split(","):
+        node = tree
+        for part in path.strip().split("."):
+            if part:
+                node = node.setdefault(part, {})
+    return _project(content, tree)
+
+def _project(content: Any, tree: Dict[str, Any]) -> Any:
+    if not tree:
+        return content
+    if isinstance(content, list):
+        return [_project(item, tree) for item in content]
+    if isinstance(content, dict):
+        return {key: _project(content[key], subtree) for key, subtree in tree.items() if key in content}
+    return content
+
+def _compress(body: bytes, accept_encoding: str) -> tuple:
+    if len(body) < COMPRESSION_MIN_BYTES:
+        return body, None
+    if brotli is not None and "br" in accept_encoding:
+        return brotli.compress(body, quality=4), "br"
+    if "gzip" in accept_encoding:
+        return gzip.compress(body, compresslevel=5), "gzip"
+    return body, None
+
+def _matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match", "")
+    tags = {tag.strip() for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+def version_etag(request: Request, version: str) -> str:
+    """
+    A weak ETag for a response identified by a version key computed before
+    the response itself (e.g. the snapshot an answer is generated from).
+    Selected fields are part of the validator.
+    """
+    raw = f"{version}\x1f{request.query_params.get('fields', '')}"
+    return f'W/"{hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()}"'
+
+def precondition_response(request: Request, etag: str) -> Optional[Response]:
+    """
+    Evaluate If-None-Match before the response is computed (RFC 9110 13.1.2).
+
+    Returns:
+        304 Not Modified for a matching GET/HEAD, 412 Precondition Failed for
+        a matching request with any other method, None to go ahead.
+    """
+    if not _matches(request, etag):
+        return None
+    if request.method in ("GET", "HEAD"):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache",
+                                                  "Vary": "Accept-Encoding"})
+    return Response(status_code=412, headers={"ETag": etag})
+
+def json_response(request: Request, content: Any, status_code: int = 200, etag: Optional[str] = None) -> Response:
+    """
+    Build a JSON response with field selection, ETag revalidation and compression.
+
+    Pass ``etag`` (see version_etag) when the validator is known before the
+    content was computed; otherwise the ETag is a hash of the selected body.
+    Only GET and HEAD requests are answered with 304 Not Modified.
+    """
+    content = select_fields(content, request.query_params.get("fields"))
+    body = dumps(content)
+    etag = etag or f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+    if status_code == 200 and request.method in ("GET", "HEAD") and _matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    body, encoding = _compress(body, request.headers.get("accept-encoding", ""))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
@@ -0,0 +1,256 @@
+import os
+import re
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+from records import Channel, Video, format_timestamp
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_PATH = os.getenv(
+    "SEARCH_INDEX_PATH", os.path.join(tempfile.gettempdir(), "youtube_research_search.sqlite3")
+)
+# bm25() column weights: a title hit counts this many times a description hit.
+# channel_id is indexed only so channel filters intersect inside FTS5; it has weight 0.
+TITLE_WEIGHT = 10.0
+
+MATCH_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    rowid INTEGER PRIMARY KEY,
+    video_id TEXT NOT NULL UNIQUE,
+    channel_id TEXT NOT NULL,
+    published_at REAL NOT NULL,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS videos_channel ON videos (channel_id, published_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS video_fts USING fts5(
+    title, description, channel_id, content='videos', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS videos_ai AFTER INSERT ON videos BEGIN
+    INSERT INTO video_fts (rowid, title, description, channel_id)
+    VALUES (new.rowid, new.title, new.description, new.channel_id);
+END;
+CREATE TRIGGER IF NOT EXISTS videos_ad AFTER DELETE ON videos BEGIN
+    INSERT INTO video_fts (video_fts, rowid, title, description, channel_id)
+    VALUES ('delete', old.rowid, old.title, old.description, old.channel_id);
+END;
+CREATE TRIGGER IF NOT EXISTS videos_au AFTER UPDATE OF title, description ON videos BEGIN
+    INSERT INTO video_fts (video_fts, rowid, title, description, channel_id)
+    VALUES ('delete', old.rowid, old.title, old.description, old.channel_id);
+    INSERT INTO video_fts (rowid, title, description, channel_id)
+    VALUES (new.rowid, new.title, new.description, new.channel_id);
+END;
+
+CREATE TABLE IF NOT EXISTS channels (
+    rowid INTEGER PRIMARY KEY,
+    channel_id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS channel_fts USING fts5(
+    name, description, content='channels', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS channels_ai AFTER INSERT ON channels BEGIN
+    INSERT INTO channel_fts (rowid, name, description) VALUES (new.rowid, new.name, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS channels_au AFTER UPDATE OF name, description ON channels BEGIN
+    INSERT INTO channel_fts (channel_fts, rowid, name, description) VALUES ('delete', old.rowid, old.name, old.description);
+    INSERT INTO channel_fts (rowid, name, description) VALUES (new.rowid, new.name, new.description);
+END;
+"""
+
+def to_match_query(text: str, any_term: bool = False) -> str:
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every word is quoted, so user input cannot inject FTS5 operators; words
+    are ANDed (or ORed with any_term=True).
+    """
+    terms = [f'"{term}"' for term in MATCH_TOKEN.findall(text)]
+    return (" OR " if any_term else " ").join(terms)
+
+class SearchIndex:
+    """
+    Full-text index over the channel and video metadata we have fetched.
+
+    Rows live in plain tables; external-content FTS5 tables kept in sync by
+    triggers index titles and descriptions. Upserts only rewrite the FTS
+    entries of rows whose text changed, so re-storing a snapshot with new
+    statistics costs no FTS work.
+    """
+
+    def __init__(self, path: str = SEARCH_INDEX_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def add_videos(self, channel_id: str, videos: Iterable[Video]) -> int:
+        """
+        Insert or update videos of one channel in a single transaction.
+        """
+        rows = [(v.video_id, channel_id, v.published_at, v.title, v.description) for v in videos]
+        return self.add_rows(rows)
+
+    def add_rows(self, rows: List[tuple]) -> int:
+        """
+        Bulk upsert of (video_id, channel_id, published_at, title, description) tuples.
+        """
+        if not rows:
+            return 0
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO videos (video_id, channel_id, published_at, title, description) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(video_id) DO UPDATE SET title = excluded.title, description = excluded.description,"
+                " published_at = excluded.published_at"
+                " WHERE title != excluded.title OR description != excluded.description"
+                " OR published_at != excluded.published_at",
+                rows
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+    def add_channel(self, channel: Channel) -> None:
+        self._connect().execute(
+            "INSERT INTO channels (channel_id, name, description) VALUES (?, ?, ?)"
+            " ON CONFLICT(channel_id) DO UPDATE SET name = excluded.name, description = excluded.description"
+            " WHERE name != excluded.name OR description != excluded.description",
+            (channel.channel_id, channel.name, channel.description)
+        )
+
+    def search(self, query: str, channel_id: Optional[str] = None, since: Optional[float] = None,
+               until: Optional[float] = None, limit: int = 10, any_term: bool = False) -> List[Dict[str, Any]]:
+        """
+        Videos matching a query, best BM25 match first.
+
+        Args:
+            query: Free text; every word must match unless any_term is set
+            channel_id: Only videos of this channel
+            since: Only videos published at or after this epoch time
+            until: Only videos published before this epoch time
+            limit: Maximum number of results
+
+        Returns:
+            Matches with video ID, title, channel ID, publish time, score and a highlighted snippet
+        """
+        match = to_match_query(query, any_term)
+        if not match:
+            return []
+        sql = (
+            "SELECT v.video_id, v.channel_id, v.published_at, v.title,"
+            " snippet(video_fts, 1, '[', ']', '...', 12) AS snippet,"
+            f" bm25(video_fts, {TITLE_WEIGHT}, 1.0, 0.0) AS score"
+            " FROM video_fts JOIN videos v ON v.rowid = video_fts.rowid"
+            " WHERE video_fts MATCH ?"
+        )
+        params: List[Any] = [match]
+        if channel_id:
+            # Intersecting with the channel's doclist inside FTS5 avoids ranking every match corpus-wide
+            params[0] = f'({match}) AND channel_id : "{channel_id.replace(chr(34), "")}"'
+            sql += " AND v.channel_id = ?"
+            params.append(channel_id)
+        if since is not None:
+            sql += " AND v.published_at >= ?"
+            params.append(since)
+        if until is not None:
+            sql += " AND v.published_at < ?"
+            params.append(until)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+        return [{
+            "video_id": row["video_id"],
+            "channel_id": row["channel_id"],
+            "title": row["title"],
+            "published_at": format_timestamp(row["published_at"]),
+            "snippet": row["snippet"],
+            # bm25() is lower-is-better; report higher-is-better
+            "score": round(-row["score"], 4),
+            "url": f"https://youtube.com/watch?v={row['video_id']}",
+        } for row in self._connect().execute(sql, params)]
+
+    def count_matches(self, query: str, channel_id: Optional[str] = None, any_term: bool = False) -> int:
+        """
+        Number of videos matching a query, however many search() would return.
+        """
+        match = to_match_query(query, any_term)
+        if not match:
+            return 0
+        if not channel_id:
+            return self._connect().execute(
+                "SELECT COUNT(*) FROM video_fts WHERE video_fts MATCH ?", (match,)
+            ).fetchone()[0]
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM video_fts JOIN videos v ON v.rowid = video_fts.rowid"
+            " WHERE video_fts MATCH ? AND v.channel_id = ?",
+            (f'({match}) AND channel_id : "{channel_id.replace(chr(34), "")}"', channel_id)
+        ).fetchone()[0]
+
+    def search_channels(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Channels whose name or description matches a query.
+        """
+        match = to_match_query(query)
+        if not match:
+            return []
+        rows = self._connect().execute(
+            "SELECT c.channel_id, c.name, bm25(channel_fts, 10.0, 1.0) AS score"
+            " FROM channel_fts JOIN channels c ON c.rowid = channel_fts.rowid"
+            " WHERE channel_fts MATCH ? ORDER BY score LIMIT ?",
+            (match, limit)
+        )
+        return [{"channel_id": row["channel_id"], "name": row["name"], "score": round(-row["score"], 4)}
+                for row in rows]
+
+    def count(self, channel_id: Optional[str] = None) -> int:
+        if channel_id:
+            return self._connect().execute("SELECT COUNT(*) FROM videos WHERE channel_id = ?", (channel_id,)).fetchone()[0]
+        return self._connect().execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+
+    def optimize(self) -> None:
+        """
+        Merge FTS5 segments; worth running after large bulk loads.
+        """
+        self._connect().execute("INSERT INTO video_fts (video_fts) VALUES ('optimize')")
+
+_index: Optional[SearchIndex] = None
+_index_lock = threading.Lock()
+
+def get_search_index() -> SearchIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SearchIndex()
+    return _index
+
+def index_snapshot(channel_id: str, channel: Optional[Channel], videos: List[Video]) -> None:
+    """
+    Snapshot listener: index whatever channel and video metadata was just fetched.
+    """
+    start = time.perf_counter()
+    index = get_search_index()
+    if channel is not None:
+        index.add_channel(channel)
+    if videos:
+        index.add_videos(channel_id, videos)
+    logger.debug("Indexed %d videos for %s in %.1f ms", len(videos), channel_id, (time.perf_counter() - start) * 1000)
@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from metrics import gauge, counter
+
+logger = logging.getLogger(__name__)
+
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", str(30 * 60)))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024)))
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "10000"))
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "20"))
+# Turns included in the prompt for a follow-up question
+PROMPT_TURNS = 6
+
+# Words extract_channel_name() picks up from follow-ups that do not name a channel
+FOLLOW_UP_WORDS = frozenset({
+    "his", "her", "their", "its", "it", "them", "they", "this", "that", "the", "these", "those",
+    "latest", "recent", "last", "newest", "same", "videos", "video", "views", "stats", "statistics",
+    "info", "channel", "subscribers", "upload", "uploads", "him", "he", "she", "a", "an", "my",
+})
+
+active_sessions = gauge("ws_sessions_active", "WebSocket sessions held in memory")
+session_reuse = counter("ws_session_channel_lookups_total", "Channel lookups in sessions by result")
+
+def _size(value: Any) -> int:
+    return len(json.dumps(value, default=str))
+
+class Session:
+    """
+    Server-side state of one chat session.
+
+    Holds the channels resolved so far with their fetched data, the recent
+    turns, and context documents supplied once. Its approximate serialized
+    size is tracked as items are added; past SESSION_MAX_BYTES the oldest
+    channels, then the oldest turns, are dropped.
+    """
+
+    def __init__(self, session_id: Optional[str] = None, max_bytes: int = SESSION_MAX_BYTES):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.max_bytes = max_bytes
+        self.created_at = time.time()
+        self.last_active = time.monotonic()
+        self.channels: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self.current_channel: Optional[str] = None
+        self.turns: Deque[Tuple[Dict[str, str], int]] = deque()
+        self.documents: List[str] = []
+        self.bytes = 0
+
+    def touch(self) -> None:
+        self.last_active = time.monotonic()
+
+    def get_channel(self, name: str) -> Optional[Dict[str, Any]]:
+        entry = self.channels.get(name.lower())
+        if entry is None:
+            return None
+        self.channels.move_to_end(name.lower())
+        return entry[0]
+
+    def add_channel(self, name: str, data: Dict[str, Any]) -> None:
+        key = name.lower()
+        if key in self.channels:
+            self.bytes -= self.channels.pop(key)[1]
+        size = _size(data)
+        self.channels[key] = (data, size)
+        self.bytes += size
+        self.current_channel = key
+        self._enforce_cap()
+
+    def add_turn(self, role: str, content: str) -> None:
+        turn = {"role": role, "content": content}
+        size = _size(turn)
+        self.turns.append((turn, size))
+        self.bytes += size
+        while len(self.turns) > SESSION_MAX_TURNS:
+            self.bytes -= self.turns.popleft()[1]
+        self._enforce_cap()
+
+    def set_documents(self, documents: List[str]) -> None:
+        self.bytes -= sum(len(d) for d in self.documents)
+        self.documents = [str(d) for d in documents]
+        self.bytes += sum(len(d) for d in self.documents)
+        self._enforce_cap()
+
+    def recent_turns(self, count: int = PROMPT_TURNS) -> List[Dict[str, str]]:
+        return [turn for turn, _ in list(self.turns)[-count:]]
+
+    def _enforce_cap(self) -> None:
+        # Keep the current channel and the latest turn; everything older can go
+        while self.bytes > self.max_bytes and len(self.channels) > 1:
+            key, (_, size) = next(iter(self.channels.items()))
+            if key == self.current_channel:
+                self.channels.move_to_end(key)
+                continue
+            del self.channels[key]
+            self.bytes -= size
+        while self.bytes > self.max_bytes and len(self.turns) > 1:
+            self.bytes -= self.turns.popleft()[1]
+        while self.bytes > self.max_bytes and self.documents:
+            self.bytes -= len(self.documents.pop())
+
+class SessionManager:
+    """
+    In-process registry of sessions with idle eviction and a global count limit.
+
+    Sessions live in the worker that accepted the socket; a client reconnecting
+    with its session_id resumes the state if it reaches the same worker and
+    the session has not been evicted, and starts fresh otherwise.
+    """
+
+    def __init__(self, idle_seconds: float = SESSION_IDLE_SECONDS, max_count: int = SESSION_MAX_COUNT):
+        self.idle_seconds = idle_seconds
+        self.max_count = max_count
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def open(self, session_id: Optional[str] = None) -> Session:
+        with self._lock:
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session = Session(session_id)
+                self._sessions[session.session_id] = session
+                while len(self._sessions) > self.max_count:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(session.session_id)
+            session.touch()
+            active_sessions.set(len(self._sessions))
+            return session
+
+    def close(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            active_sessions.set(len(self._sessions))
+
+    def evict_idle(self) -> int:
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            idle = [sid for sid, session in self._sessions.items() if session.last_active < cutoff]
+            for sid in idle:
+                del self._sessions[sid]
+            active_sessions.set(len(self._sessions))
+        if idle:
+            logger.info("Evicted %d idle sessions", len(idle))
+        return len(idle)
+
+_manager = SessionManager()
+
+def get_session_manager() -> SessionManager:
+    return _manager
+
+def resolve_channel(session: Session, question: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    Channel data for a question, reusing what the session already fetched.
+
+    A question that names no new channel ("what about their latest upload?")
+    refers to the session's current channel.
+
+    Returns:
+        (youtube data or None, whether it was reused from the session)
+    """
+    from youtube_utils import extract_channel_name
+    from agent import analyze_youtube_query
+
+    named = extract_channel_name(question)
+    name = named if named and named not in FOLLOW_UP_WORDS else session.current_channel
+    if not name:
+        return None, False
+    data = session.get_channel(name)
+    if data is not None:
+        session.current_channel = name.lower()
+        session_reuse.inc(labels={"result": "reused"})
+        return data, True
+    session_reuse.inc(labels={"result": "fetched"})
+    data = analyze_youtube_query(question if named == name else f"channel {name}")
+    if "error" in data:
+        return data, False
+    session.add_channel(name, data)
+    return data, False
+
+def build_prompt(session: Session, question: str, youtube_data: Optional[Dict[str, Any]]) -> str:
+    """
+    Prompt for a session turn: earlier turns, session documents, channel data, then the question.
+    """
+    parts = []
+    history = session.recent_turns()
+    if history:
+        parts.append("Conversation so far:\n" + "\n".join(f"{t['role']}: {t['content']}" for t in history))
+    if session.documents:
+        parts.append("Reference notes:\n" + "\n".join(f"- {doc}" for doc in session.documents))
+    if youtube_data and "error" not in youtube_data:
+        parts.append(f"Channel Info: {youtube_data['channel_info']}\nLatest Videos: {youtube_data['latest_videos']}")
+    parts.append(f"Question: {question}")
+    if youtube_data and "error" not in youtube_data:
+        parts.append("Please provide a detailed analysis based on this information.")
+    return "\n\n".join(parts)
@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# CACHE_URL selects the backend: empty or sqlite:///path for the host-local
+# SQLite file shared by every worker, redis://host:port/db for a Redis server.
+CACHE_URL = os.getenv("CACHE_URL", "")
+CACHE_PATH = os.getenv("CACHE_PATH", os.path.join(tempfile.gettempdir(), "youtube_research_cache.sqlite3"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "50000"))
+
+# Default time-to-live per namespace, in seconds
+NAMESPACE_TTLS = {
+    "channel": 7 * 24 * 3600,    # channel name -> channel ID resolution
+    "stats": 15 * 60,            # channel / video statistics snapshots
+    "embedding": 30 * 24 * 3600, # text -> embedding vector
+    "answer": 60 * 60,           # prompt -> LLM answer
+    "export": 60 * 60,           # channel upload pages streamed by /api/channel/{id}/export
+}
+DEFAULT_TTL = 15 * 60
+
+# How long a worker may hold the compute lease for a key before others take over
+LEASE_SECONDS = 30.0
+POLL_INTERVAL = 0.05
+
+def make_key(*parts: Any) -> str:
+    """
+    Build a compact cache key from arbitrary parts (prompts, texts, IDs).
+
+    Args:
+        parts: Values that identify the cached item
+
+    Returns:
+        A fixed-length hex digest
+    """
+    raw = "\x1f".join(str(part) for part in parts)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _ttl_for(namespace: str, ttl: Optional[float]) -> float:
+    if ttl is not None:
+        return ttl
+    return NAMESPACE_TTLS.get(namespace, DEFAULT_TTL)
+
+class SQLiteCache:
+    """
+    Cache stored in a single SQLite file in WAL mode.
+
+    Every worker process on the host opens the same file, so entries written by
+    one worker are visible to all others. Leases give an atomic get-or-compute
+    across processes and eviction runs against the shared table, so the entry
+    limit applies to the whole host rather than to each worker.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self) -> None:
+        conn = self._connect()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache(accessed_at);
+            CREATE TABLE IF NOT EXISTS leases (
+                key TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+        """)
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        full_key = f"{namespace}:{key}"
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, accessed_at FROM cache WHERE key = ? AND expires_at > ?",
+            (full_key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        # Only touch the LRU timestamp occasionally to keep reads mostly read-only
+        if now - row[1] > 30:
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, full_key))
+        return json.loads(row[0])
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (f"{namespace}:{key}", json.dumps(value), now + _ttl_for(namespace, ttl), now)
+        )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.evict()
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._connect().execute("DELETE FROM cache WHERE key = ?", (f"{namespace}:{key}",))
+
+    def evict(self) -> int:
+        """Drop expired entries, then the least recently used ones above the limit."""
+        conn = self._connect()
+        now = time.time()
+        removed = conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,)).rowcount
+        conn.execute("DELETE FROM leases WHERE expires_at <= ?", (now,))
+        count = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        if count > self.max_entries:
+            # Trim to 90% of the limit so eviction does not run on every write
+            excess = count - int(self.max_entries * 0.9)
+            removed += conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                (excess,)
+            ).rowcount
+        return removed
+
+    def _acquire_lease(self, full_key: str, owner: str, lease_seconds: float) -> bool:
+        now = time.time()
+        cursor = self._connect().execute(
+            """
+            INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+            WHERE leases.expires_at <= ?
+            """,
+            (full_key, owner, now + lease_seconds, now)
+        )
+        return cursor.rowcount == 1
+
+    def _release_lease(self, full_key: str, owner: str) -> None:
+        self._connect().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (full_key, owner))
+
+    def get_or_compute(self, namespace: str, key: str, compute: Callable[[], Any],
+                       ttl: Optional[float] = None, lease_seconds: float = LEASE_SECONDS) -> Any:
+        return _get_or_compute(self, namespace, key, compute, ttl, lease_seconds)
+
+class RedisCache:
+    """
+    Cache backed by a Redis-protocol server (Redis, Valkey, KeyDB, ...).
+
+    Eviction is left to the server's maxmemory policy (allkeys-lru is the
+    recommended setting); every entry is written with a TTL.
+    """
+
+    _RELEASE_SCRIPT = """
+        if redis.call('get', KEYS[1]) == ARGV[1] then
+            return redis.call('del', KEYS[1])
+        end
+        return 0
+    """
+
+    def __init__(self, url: str, prefix: str = "yra:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_URL points at Redis but the 'redis' package is not installed") from e
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._release = self.client.register_script(self._RELEASE_SCRIPT)
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        raw = self.client.get(f"{self.prefix}{namespace}:{key}")
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.client.set(
+            f"{self.prefix}{namespace}:{key}",
+            json.dumps(value),
+            px=int(_ttl_for(namespace, ttl) * 1000)
+        )
+
+    def delete(self, namespace: str, key: str) -> None:
+        self.client.delete(f"{self.prefix}{namespace}:{key}")
+
+    def evict(self) -> int:
+        return 0
+
+    def _acquire_lease(self, full_key: str, owner: str, lease_seconds: float) -> bool:
+        return bool(self.client.set(f"{self.prefix}lease:{full_key}", owner, nx=True, px=int(lease_seconds * 1000)))
+
+    def _release_lease(self, full_key: str, owner: str) -> None:
+        self._release(keys=[f"{self.prefix}lease:{full_key}"], args=[owner])
+
+    def get_or_compute(self, namespace: str, key: str, compute: Callable[[], Any],
+                       ttl: Optional[float] = None, lease_seconds: float = LEASE_SECONDS) -> Any:
+        return _get_or_compute(self, namespace, key, compute, ttl, lease_seconds)
+
+def _get_or_compute(cache, namespace: str, key: str, compute: Callable[[], Any],
+                    ttl: Optional[float], lease_seconds: float) -> Any:
+    """
+    Return the cached value or compute it exactly once across all workers.
+
+    The first worker to miss takes a lease on the key and runs ``compute``;
+    concurrent workers poll the cache until the value appears or the lease
+    expires (e.g. the owner crashed), in which case one of them takes over.
+    ``None`` results are returned but never cached, so failures are retried.
+    """
+    value = cache.get(namespace, key)
+    if value is not None:
+        return value
+
+    full_key = f"{namespace}:{key}"
+    owner = uuid.uuid4().hex
+    deadline = time.monotonic() + lease_seconds * 2
+    while True:
+        if cache._acquire_lease(full_key, owner, lease_seconds):
+            try:
+                # Another worker may have finished between our miss and the lease
+                value = cache.get(namespace, key)
+                if value is None:
+                    value = compute()
+                    if value is not None:
+                        cache.set(namespace, key, value, ttl)
+                return value
+            finally:
+                cache._release_lease(full_key, owner)
+
+        time.sleep(POLL_INTERVAL)
+        value = cache.get(namespace, key)
+        if value is not None:
+            return value
+        if time.monotonic() > deadline:
+            # Give up waiting on a stuck owner and compute locally
+            logger.warning("Cache lease wait timed out for %s, computing locally", full_key)
+            return compute()
+
+_cache = None
+_cache_pid = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """
+    Return the process-wide cache instance.
+
+    The instance is re-created after a fork so pre-forked gunicorn workers do
+    not share SQLite connections or Redis sockets with the master process.
+    """
+    global _cache, _cache_pid
+    pid = os.getpid()
+    if _cache is None or _cache_pid != pid:
+        with _cache_lock:
+            if _cache is None or _cache_pid != pid:
+                if CACHE_URL.startswith(("redis://", "rediss://", "unix://")):
+                    _cache = RedisCache(CACHE_URL)
+                else:
+                    path = CACHE_URL[len("sqlite:///"):] if CACHE_URL.startswith("sqlite:///") else CACHE_PATH
+                    _cache = SQLiteCache(path)
+                _cache_pid = pid
+    return _cache
@@ -0,0 +1,320 @@
+import io
+import os
+import re
+import time
+import shutil
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+import httpx
+from metrics import counter
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# {video_id} is substituted; point it at a local stub server for testing
+THUMBNAIL_SOURCE = os.getenv("THUMBNAIL_SOURCE", "https://i.ytimg.com/vi/{video_id}/hqdefault.jpg")
+THUMBNAIL_DIR = os.getenv("THUMBNAIL_DIR", os.path.join(tempfile.gettempdir(), "youtube_research_thumbnails"))
+THUMBNAIL_CACHE_BYTES = int(os.getenv("THUMBNAIL_CACHE_BYTES", str(256 * 1024 * 1024)))
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "4"))
+THUMBNAIL_TIMEOUT = float(os.getenv("THUMBNAIL_TIMEOUT", "10"))
+# A video the source has no thumbnail for is not asked about again for this long
+THUMBNAIL_MISSING_TTL = float(os.getenv("THUMBNAIL_MISSING_TTL", "3600"))
+# A stored variant's last use is updated on read at most this often, so hot reads stay off the write lock
+THUMBNAIL_TOUCH_INTERVAL = float(os.getenv("THUMBNAIL_TOUCH_INTERVAL", "60"))
+JPEG_QUALITY = 82
+
+# Variant widths in pixels; 16:9 like the player
+SIZES = {"small": 160, "medium": 320, "large": 480}
+VIDEO_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{6,64}$")
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+upstream_fetches = counter("thumbnail_upstream_fetches_total", "Thumbnails downloaded from the source")
+cache_results = counter("thumbnail_cache_total", "Thumbnail lookups by result")
+
+class ThumbnailNotFound(LookupError):
+    """Raised when the source has no thumbnail for a video."""
+
+class ThumbnailUnavailable(RuntimeError):
+    """Raised when the source fails or cannot be reached."""
+
+class BlobStore:
+    """
+    Content-addressed files with LRU eviction by total bytes.
+
+    Objects are named by the SHA-256 of their bytes, so identical variants
+    are stored once and the hash doubles as a strong ETag. An SQLite index
+    beside them maps (video ID, size) to an object and keeps each object's
+    size and last use, the running byte total, and the videos the source has
+    no thumbnail for. Every worker on the host opens the same index, so they
+    share one LRU order and one total; a put evicts only once that total
+    crosses max_bytes, and the refs to an evicted object go with it.
+    """
+
+    def __init__(self, root: str = THUMBNAIL_DIR, max_bytes: int = THUMBNAIL_CACHE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.path = os.path.join(root, "index.db")
+        self._local = threading.local()
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self) -> None:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            created = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'objects'").fetchone() is None
+            conn.execute("CREATE TABLE IF NOT EXISTS objects (digest TEXT PRIMARY KEY, size INTEGER NOT NULL,"
+                         " used_at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS objects_used ON objects (used_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS refs (video_id TEXT NOT NULL, variant TEXT NOT NULL,"
+                         " digest TEXT NOT NULL, PRIMARY KEY (video_id, variant))")
+            conn.execute("CREATE INDEX IF NOT EXISTS refs_digest ON refs (digest)")
+            conn.execute("CREATE TABLE IF NOT EXISTS missing (video_id TEXT PRIMARY KEY, marked_at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS missing_marked ON missing (marked_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO usage (id, bytes) VALUES (0, 0)")
+            if created:
+                self._adopt(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _adopt(self, conn: sqlite3.Connection) -> None:
+        # A directory written before the index: count its objects, drop the ref and marker files
+        total = 0
+        with os.scandir(os.path.join(self.root, "objects")) as prefixes:
+            for prefix in prefixes:
+                with os.scandir(prefix.path) as entries:
+                    for entry in entries:
+                        if entry.name.endswith(".tmp"):
+                            continue
+                        stat = entry.stat()
+                        conn.execute("INSERT OR IGNORE INTO objects (digest, size, used_at) VALUES (?, ?, ?)",
+                                     (entry.name, stat.st_size, stat.st_mtime))
+                        total += stat.st_size
+        conn.execute("UPDATE usage SET bytes = ?", (total,))
+        shutil.rmtree(os.path.join(self.root, "refs"), ignore_errors=True)
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def _write_tmp(self, path: str, data: bytes) -> str:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        return tmp
+
+    def usage(self) -> int:
+        """Bytes stored, across every worker."""
+        return self._connect().execute("SELECT bytes FROM usage").fetchone()["bytes"]
+
+    def get(self, video_id: str, size: str) -> Optional[Tuple[bytes, str]]:
+        """
+        Return (bytes, digest) for a stored variant, or None.
+        """
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT digest, used_at FROM refs JOIN objects USING (digest) WHERE video_id = ? AND variant = ?",
+            (video_id, size)
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            with open(self._object_path(row["digest"]), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        now = time.time()
+        if now - row["used_at"] > THUMBNAIL_TOUCH_INTERVAL:
+            conn.execute("UPDATE objects SET used_at = ? WHERE digest = ?", (now, row["digest"]))
+        return data, row["digest"]
+
+    def put(self, video_id: str, size: str, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        conn = self._connect()
+        # The bytes are written before taking the index's write lock, unless the object is stored already
+        known = conn.execute("SELECT 1 FROM objects WHERE digest = ?", (digest,)).fetchone() is not None
+        tmp = None if known else self._write_tmp(path, data)
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            added = conn.execute("INSERT OR IGNORE INTO objects (digest, size, used_at) VALUES (?, ?, ?)",
+                                 (digest, len(data), now)).rowcount
+            if added:
+                conn.execute("UPDATE usage SET bytes = bytes + ?", (len(data),))
+            else:
+                conn.execute("UPDATE objects SET used_at = ? WHERE digest = ?", (now, digest))
+            if added or not os.path.exists(path):
+                os.replace(tmp or self._write_tmp(path, data), path)
+                tmp = None
+            conn.execute("INSERT OR REPLACE INTO refs (video_id, variant, digest) VALUES (?, ?, ?)",
+                         (video_id, size, digest))
+            if conn.execute("SELECT bytes FROM usage").fetchone()["bytes"] > self.max_bytes:
+                self._evict(conn, keep=digest)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            if tmp is not None:
+                os.remove(tmp)
+        return digest
+
+    def _evict(self, conn: sqlite3.Connection, keep: str) -> None:
+        # Runs inside put()'s write transaction, so no other worker stores or evicts meanwhile
+        total = conn.execute("SELECT bytes FROM usage").fetchone()["bytes"]
+        evicted = []
+        oldest = conn.execute("SELECT digest, size FROM objects WHERE digest != ? ORDER BY used_at", (keep,))
+        for row in oldest:
+            if total <= self.max_bytes:
+                break
+            evicted.append((row["digest"],))
+            total -= row["size"]
+        oldest.close()
+        conn.executemany("DELETE FROM objects WHERE digest = ?", evicted)
+        conn.executemany("DELETE FROM refs WHERE digest = ?", evicted)
+        conn.execute("UPDATE usage SET bytes = ?", (total,))
+        for (digest,) in evicted:
+            try:
+                os.remove(self._object_path(digest))
+            except OSError:
+                pass
+
+    def mark_missing(self, video_id: str, ttl: float = THUMBNAIL_MISSING_TTL) -> None:
+        """Remember that the source has no thumbnail for a video, and forget expired markers."""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO missing (video_id, marked_at) VALUES (?, ?)", (video_id, now))
+        conn.execute("DELETE FROM missing WHERE marked_at < ?", (now - ttl,))
+
+    def is_missing(self, video_id: str, ttl: float = THUMBNAIL_MISSING_TTL) -> bool:
+        row = self._connect().execute("SELECT marked_at FROM missing WHERE video_id = ?", (video_id,)).fetchone()
+        return row is not None and time.time() - row["marked_at"] < ttl
+
+def make_variants(original: bytes) -> Dict[str, bytes]:
+    """
+    Resize a source thumbnail to every size in SIZES (runs in the worker pool).
+    """
+    if Image is None:
+        return {size: original for size in SIZES}
+    variants = {}
+    with Image.open(io.BytesIO(original)) as image:
+        image = image.convert("RGB")
+        for size, width in SIZES.items():
+            height = round(width * 9 / 16)
+            # Crop the letterbox bars hqdefault has around 16:9 videos, then downscale
+            source_height = round(image.width * 9 / 16)
+            top = max(0, (image.height - source_height) // 2)
+            variant = image.crop((0, top, image.width, top + min(source_height, image.height)))
+            variant = variant.resize((width, height), Image.LANCZOS)
+            buffer = io.BytesIO()
+            variant.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+            variants[size] = buffer.getvalue()
+    return variants
+
+class ThumbnailService:
+    """
+    Fetch-once thumbnail proxy.
+
+    Concurrent requests for a video that is not cached share one in-flight
+    future: the source is downloaded once, every variant is generated in the
+    thread pool, stored, and all waiters are answered from the result.
+    """
+
+    def __init__(self, store: Optional[BlobStore] = None, workers: int = THUMBNAIL_WORKERS,
+                 source: str = THUMBNAIL_SOURCE):
+        self.store = store or BlobStore()
+        self.source = source
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=THUMBNAIL_TIMEOUT, follow_redirects=True,
+                                             limits=httpx.Limits(max_connections=32))
+        return self._client
+
+    async def get(self, video_id: str, size: str) -> Tuple[bytes, str]:
+        """
+        Return (JPEG bytes, digest) for a video's thumbnail variant.
+
+        Raises:
+            ThumbnailNotFound: The source has no image for this video
+            ThumbnailUnavailable: The source failed or could not be reached
+        """
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(self._executor, self.store.get, video_id, size)
+        if cached is not None:
+            cache_results.inc(labels={"result": "hit"})
+            return cached
+        if await loop.run_in_executor(self._executor, self.store.is_missing, video_id):
+            cache_results.inc(labels={"result": "missing"})
+            raise ThumbnailNotFound(video_id)
+
+        task = self._inflight.get(video_id)
+        if task is None:
+            cache_results.inc(labels={"result": "miss"})
+            task = self._inflight[video_id] = asyncio.ensure_future(self._fill(video_id))
+            task.add_done_callback(lambda _: self._inflight.pop(video_id, None))
+        else:
+            cache_results.inc(labels={"result": "coalesced"})
+        # shield() so one cancelled waiter cannot cancel the shared result for the others
+        variants = await asyncio.shield(task)
+        return variants[size]
+
+    async def _fill(self, video_id: str) -> Dict[str, Tuple[bytes, str]]:
+        loop = asyncio.get_running_loop()
+        try:
+            response = await self._http().get(self.source.format(video_id=video_id))
+        except httpx.HTTPError as e:
+            raise ThumbnailUnavailable(f"Fetching the thumbnail of {video_id} failed: {e}") from e
+        if response.status_code == 404:
+            await loop.run_in_executor(self._executor, self.store.mark_missing, video_id)
+            raise ThumbnailNotFound(video_id)
+        if response.status_code >= 400:
+            raise ThumbnailUnavailable(f"Thumbnail source returned {response.status_code} for {video_id}")
+        upstream_fetches.inc()
+        variants = await loop.run_in_executor(self._executor, make_variants, response.content)
+        stored = {}
+        for size, data in variants.items():
+            digest = await loop.run_in_executor(self._executor, self.store.put, video_id, size, data)
+            stored[size] = (data, digest)
+        return stored
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+        self._executor.shutdown(wait=False)
+
+_service: Optional[ThumbnailService] = None
+
+def get_thumbnail_service() -> ThumbnailService:
+    global _service
+    if _service is None:
+        _service = ThumbnailService()
+    return _service
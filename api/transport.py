@@ -0,0 +1,211 @@
+import os
+import json
+import gzip
+import time
+import hashlib
+import logging
+import functools
+import threading
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+# live: talk to upstream services as usual
+# record: talk to upstream and append every exchange to the cassettes
+# replay: serve exchanges from the cassettes, never touching the network
+UPSTREAM_MODE = os.getenv("UPSTREAM_MODE", "live").lower()
+CASSETTE_DIR = os.getenv("CASSETTE_DIR", "cassettes")
+# 1.0 replays with the recorded latencies, 0 as fast as possible, 2.0 twice as slow
+REPLAY_LATENCY_SCALE = float(os.getenv("REPLAY_LATENCY_SCALE", "1.0"))
+
+RECORDING = UPSTREAM_MODE == "record"
+REPLAYING = UPSTREAM_MODE == "replay"
+
+# Query parameters and headers that must never end up in a cassette
+SECRET_PARAMS = {"key", "api_key", "access_token"}
+SECRET_HEADERS = {"authorization", "x-goog-api-key", "api-key", "x-api-key"}
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode for a request that was never recorded."""
+
+def _scrub_uri(uri: str) -> str:
+    parts = urlsplit(uri)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in SECRET_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(sorted(query))))
+
+def _request_key(service: str, request: Dict[str, Any]) -> str:
+    return hashlib.sha256(f"{service}\x1f{json.dumps(request, sort_keys=True, default=str)}".encode()).hexdigest()
+
+class Cassette:
+    """
+    A gzip-compressed JSONL file of recorded exchanges for one upstream service.
+
+    Each line holds the request key, the scrubbed request, the response and the
+    original latency. Identical requests recorded several times are replayed
+    in their recorded order, then the last one repeats.
+    """
+
+    def __init__(self, service: str, directory: str = CASSETTE_DIR):
+        self.service = service
+        self.path = os.path.join(directory, f"{service}.jsonl.gz")
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._cursor: Dict[str, int] = {}
+
+    def record(self, request: Dict[str, Any], response: Any, elapsed: float) -> None:
+        line = json.dumps({
+            "key": _request_key(self.service, request),
+            "request": request,
+            "response": response,
+            "elapsed": round(elapsed, 6),
+        }, default=str)
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Each append is its own gzip member; readers see the concatenation
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def _load(self) -> Dict[str, List[Dict[str, Any]]]:
+        if self._entries is None:
+            entries: Dict[str, List[Dict[str, Any]]] = {}
+            if os.path.exists(self.path):
+                with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        entry = json.loads(line)
+                        entries.setdefault(entry["key"], []).append(entry)
+            self._entries = entries
+        return self._entries
+
+    def replay(self, request: Dict[str, Any]) -> Any:
+        key = _request_key(self.service, request)
+        with self._lock:
+            matches = self._load().get(key)
+            if not matches:
+                raise CassetteMiss(f"No recorded {self.service} exchange for {request}")
+            position = self._cursor.get(key, 0)
+            self._cursor[key] = position + 1
+            entry = matches[min(position, len(matches) - 1)]
+        if REPLAY_LATENCY_SCALE > 0:
+            time.sleep(entry["elapsed"] * REPLAY_LATENCY_SCALE)
+        return entry["response"]
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+def get_cassette(service: str) -> Cassette:
+    with _cassettes_lock:
+        cassette = _cassettes.get(service)
+        if cassette is None:
+            cassette = _cassettes[service] = Cassette(service)
+    return cassette
+
+class _HttpResponse(dict):
+    """Minimal stand-in for httplib2.Response, which googleapiclient reads as a dict with .status."""
+
+    def __init__(self, status: int, headers: Dict[str, str]):
+        super().__init__(headers)
+        self.status = status
+        self.reason = ""
+        self["status"] = str(status)
+
+class RecordingHttp:
+    """
+    httplib2.Http-compatible client for googleapiclient.discovery.build(http=...).
+
+    In record mode requests go through a real httplib2.Http and are written to
+    the service cassette; in replay mode they are answered from the cassette.
+    """
+
+    def __init__(self, service: str, timeout: float = 30.0):
+        self.cassette = get_cassette(service)
+        self._http = None
+        if not REPLAYING:
+            import httplib2
+            self._http = httplib2.Http(timeout=timeout)
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        request = {
+            "method": method,
+            "uri": _scrub_uri(uri),
+            "body": body.decode("utf-8", "replace") if isinstance(body, bytes) else body,
+        }
+        if REPLAYING:
+            recorded = self.cassette.replay(request)
+            return _HttpResponse(recorded["status"], recorded["headers"]), recorded["content"].encode("utf-8")
+
+        start = time.perf_counter()
+        response, content = self._http.request(
+            uri, method=method, body=body, headers=headers,
+            redirections=redirections, connection_type=connection_type
+        )
+        elapsed = time.perf_counter() - start
+        headers_out = {k: v for k, v in response.items() if k.lower() not in SECRET_HEADERS and k != "status"}
+        self.cassette.record(request, {
+            "status": response.status,
+            "headers": headers_out,
+            "content": content.decode("utf-8", "replace"),
+        }, elapsed)
+        return response, content
+
+    # googleapiclient calls these on the http object for some request types
+    def close(self):
+        if self._http is not None:
+            self._http.close()
+
+def http_client(service: str):
+    """
+    Return an http object for googleapiclient.discovery.build(), or None in live mode.
+    """
+    if RECORDING or REPLAYING:
+        return RecordingHttp(service)
+    return None
+
+def recorded(service: str, encode: Callable[[Any], Any] = lambda value: value,
+             decode: Callable[[Any], Any] = lambda value: value,
+             request: Optional[Callable[..., Dict[str, Any]]] = None):
+    """
+    Decorator that records or replays calls to an SDK-backed function.
+
+    Used where the upstream client is not a plain HTTP client (Gemini, Pinecone).
+    The call arguments form the request, or ``request(*args, **kwargs)`` when
+    some arguments are client objects rather than data; ``encode`` turns the
+    return value into JSON-safe data for the cassette and ``decode`` rebuilds
+    it on replay. In live mode the function is returned unchanged.
+    """
+    def decorator(fn):
+        if not (RECORDING or REPLAYING):
+            return fn
+        cassette = get_cassette(service)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if request is not None:
+                call = {"call": fn.__name__, **request(*args, **kwargs)}
+            else:
+                call = {"call": fn.__name__, "args": list(args), "kwargs": kwargs}
+            if REPLAYING:
+                return decode(cassette.replay(call))
+            start = time.perf_counter()
+            result = fn(*args, **kwargs)
+            cassette.record(call, encode(result), time.perf_counter() - start)
+            return result
+        return wrapper
+    return decorator
+
+def encode_matches(matches) -> List[Dict[str, Any]]:
+    """Cassette encoding for Pinecone query matches."""
+    return [{"id": m.id, "score": m.score, "metadata": dict(m.metadata or {})} for m in matches]
+
+def decode_matches(data) -> List[SimpleNamespace]:
+    """Rebuild Pinecone-like matches (attribute access) from a cassette."""
+    return [SimpleNamespace(**match) for match in data]
+
+def encode_vectors(vectors) -> Dict[str, Any]:
+    """Cassette encoding for Pinecone fetch results."""
+    return {k: {"id": v.id, "values": list(v.values), "metadata": dict(v.metadata or {})} for k, v in vectors.items()}
+
+def decode_vectors(data) -> Dict[str, SimpleNamespace]:
+    """Rebuild Pinecone-like fetched vectors from a cassette."""
+    return {k: SimpleNamespace(**v) for k, v in data.items()}
@@ -0,0 +1,555 @@
+import os
+import hmac
+import time
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+import httpx
+from starlette.concurrency import run_in_threadpool
+from shared_cache import get_cache
+from records import Video
+from metrics import counter
+
+logger = logging.getLogger(__name__)
+
+WEBSUB_HUB = os.getenv("WEBSUB_HUB", "https://pubsubhubbub.appspot.com/subscribe")
+# Public URL of the callback endpoint, e.g. https://example.com/api/websub/callback
+WEBSUB_CALLBACK = os.getenv("WEBSUB_CALLBACK", "")
+# Per-topic HMAC secrets are derived from this. Without it the subscriber refuses
+# to subscribe and drops notifications, unless unsigned ones are explicitly allowed
+# (anyone who can reach the callback could then inject videos)
+WEBSUB_SECRET = os.getenv("WEBSUB_SECRET", "")
+WEBSUB_ALLOW_UNSIGNED = os.getenv("WEBSUB_ALLOW_UNSIGNED", "").lower() in ("1", "true", "yes")
+WEBSUB_PATH = os.getenv("WEBSUB_PATH", os.path.join(tempfile.gettempdir(), "youtube_research_websub.sqlite3"))
+WEBSUB_LEASE_SECONDS = int(os.getenv("WEBSUB_LEASE_SECONDS", str(5 * 24 * 3600)))
+# Subscriptions are renewed this long before they expire
+WEBSUB_RENEW_MARGIN = float(os.getenv("WEBSUB_RENEW_MARGIN", str(24 * 3600)))
+WEBSUB_RENEW_INTERVAL = float(os.getenv("WEBSUB_RENEW_INTERVAL", "600"))
+# New video IDs wait this long for others to share one videos.list call
+WEBSUB_BATCH_DELAY = float(os.getenv("WEBSUB_BATCH_DELAY", "2.0"))
+# A pushed video still not fetched this long after it was queued (failed fetch,
+# quota, worker exit) is queued again, at most WEBSUB_FETCH_ATTEMPTS times
+WEBSUB_RETRY_AFTER = float(os.getenv("WEBSUB_RETRY_AFTER", "300"))
+WEBSUB_FETCH_ATTEMPTS = int(os.getenv("WEBSUB_FETCH_ATTEMPTS", "5"))
+WEBSUB_MAX_BODY = int(os.getenv("WEBSUB_MAX_BODY", str(1024 * 1024)))
+FEED_URL = "https://www.youtube.com/xml/feeds/videos.xml?channel_id={channel_id}"
+VIDEOS_LIST_MAX_IDS = 50
+# Cached latest-upload lists that pushed videos are merged into, by max_results
+LATEST_LIST_SIZES = (5, 10, 50)
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+YT = "{http://www.youtube.com/xml/schemas/2015}"
+TOMBSTONE = "{http://purl.org/atompub/tombstones/1.0}deleted-entry"
+SIGNATURE_ALGORITHMS = {"sha1": hashlib.sha1, "sha256": hashlib.sha256, "sha384": hashlib.sha384,
+                        "sha512": hashlib.sha512}
+
+notifications = counter("websub_notifications_total", "WebSub notifications by result")
+new_videos = counter("websub_new_videos_total", "Video IDs first seen in a WebSub notification")
+videos_list_calls = counter("websub_videos_list_calls_total", "Batched videos.list calls for pushed videos")
+
+def topic_for(channel_id: str) -> str:
+    return FEED_URL.format(channel_id=channel_id)
+
+def secret_for(topic: str, secret: str = WEBSUB_SECRET) -> str:
+    """
+    The hub.secret for one topic, so a leaked secret exposes a single feed.
+    """
+    return hmac.new(secret.encode(), topic.encode(), hashlib.sha256).hexdigest()
+
+class FeedParser:
+    """
+    Incremental parser for YouTube's Atom push payloads.
+
+    Chunks are fed as they arrive; each finished <entry> is reduced to its
+    IDs and timestamps and its element cleared, so memory stays flat
+    whatever the payload size.
+    """
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=("end",))
+        self.entries: List[Dict[str, str]] = []
+        self.deleted: List[str] = []
+
+    def feed(self, chunk: bytes) -> None:
+        self._parser.feed(chunk)
+        self._drain()
+
+    def close(self) -> List[Dict[str, str]]:
+        self._parser.close()
+        self._drain()
+        return self.entries
+
+    def _drain(self) -> None:
+        for _, element in self._parser.read_events():
+            if element.tag == f"{ATOM}entry":
+                video_id = element.findtext(f"{YT}videoId")
+                if video_id:
+                    self.entries.append({
+                        "video_id": video_id,
+                        "channel_id": element.findtext(f"{YT}channelId", ""),
+                        "published": element.findtext(f"{ATOM}published", ""),
+                        "updated": element.findtext(f"{ATOM}updated", ""),
+                    })
+                element.clear()
+            elif element.tag == TOMBSTONE:
+                self.deleted.append(element.get("ref", "").rsplit(":", 1)[-1])
+                element.clear()
+
+class SubscriptionStore:
+    """
+    SQLite table of hub subscriptions and of the video IDs already seen.
+
+    The seen table makes "is this video new?" one INSERT OR IGNORE shared by
+    every worker, so a video pushed again (title edits, hub retries) is not
+    fetched twice. A row only gets fetched_at once its video was fetched and
+    ingested; rows left without it are claimed again by claim_unfetched().
+    Renewals are claimed the same way, so one worker renews each subscription.
+    """
+
+    def __init__(self, path: str = WEBSUB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self) -> None:
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS subscriptions ("
+            " channel_id TEXT PRIMARY KEY, topic TEXT NOT NULL UNIQUE, desired TEXT NOT NULL,"
+            " status TEXT NOT NULL, lease_seconds INTEGER, requested_at REAL NOT NULL,"
+            " verified_at REAL, expires_at REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS subscriptions_expiry ON subscriptions (expires_at)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen_videos (video_id TEXT PRIMARY KEY, channel_id TEXT, seen_at REAL NOT NULL,"
+            " fetched_at REAL, attempts INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(seen_videos)")}
+        if "fetched_at" not in columns:
+            # Rows from before fetches were tracked were handed to the batcher already
+            conn.execute("ALTER TABLE seen_videos ADD COLUMN fetched_at REAL")
+            conn.execute("ALTER TABLE seen_videos ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+            conn.execute("UPDATE seen_videos SET fetched_at = seen_at")
+        conn.execute("CREATE INDEX IF NOT EXISTS seen_unfetched ON seen_videos (seen_at) WHERE fetched_at IS NULL")
+
+    def request(self, channel_id: str, desired: str) -> None:
+        self._connect().execute(
+            "INSERT INTO subscriptions (channel_id, topic, desired, status, requested_at)"
+            " VALUES (?, ?, ?, 'pending', ?) ON CONFLICT (channel_id) DO UPDATE SET"
+            " desired = excluded.desired, requested_at = excluded.requested_at,"
+            " status = CASE WHEN status = 'active' AND excluded.desired = 'subscribe' THEN 'active' ELSE 'pending' END",
+            (channel_id, topic_for(channel_id), desired, time.time())
+        )
+
+    def by_topic(self, topic: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT * FROM subscriptions WHERE topic = ?", (topic,)).fetchone()
+        return dict(row) if row else None
+
+    def get(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT * FROM subscriptions WHERE channel_id = ?", (channel_id,)).fetchone()
+        return dict(row) if row else None
+
+    def activate(self, topic: str, lease_seconds: int) -> None:
+        now = time.time()
+        self._connect().execute(
+            "UPDATE subscriptions SET status = 'active', lease_seconds = ?, verified_at = ?, expires_at = ?"
+            " WHERE topic = ?", (lease_seconds, now, now + lease_seconds, topic)
+        )
+
+    def set_status(self, topic: str, status: str) -> None:
+        self._connect().execute("UPDATE subscriptions SET status = ? WHERE topic = ?", (status, topic))
+
+    def remove(self, topic: str) -> None:
+        self._connect().execute("DELETE FROM subscriptions WHERE topic = ?", (topic,))
+
+    def due(self, margin: float = WEBSUB_RENEW_MARGIN, interval: float = WEBSUB_RENEW_INTERVAL) -> List[str]:
+        """
+        Claim the channels whose subscription expires within the margin, or whose
+        request was never verified, and that nobody requested in the last interval.
+
+        The claim moves requested_at to now, so the other workers' renewal loops
+        skip these channels until the interval has passed again.
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT channel_id FROM subscriptions WHERE desired = 'subscribe' AND requested_at < ? AND"
+                " ((status = 'active' AND expires_at < ?) OR status = 'pending')",
+                (now - interval, now + margin)
+            ).fetchall()
+            conn.executemany("UPDATE subscriptions SET requested_at = ? WHERE channel_id = ?",
+                             [(now, row["channel_id"]) for row in rows])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [row["channel_id"] for row in rows]
+
+    def all(self) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self._connect().execute("SELECT * FROM subscriptions ORDER BY channel_id")]
+
+    def mark_seen(self, entries: List[Dict[str, str]]) -> List[str]:
+        """
+        Record pushed video IDs and return those not seen before.
+        """
+        conn = self._connect()
+        now = time.time()
+        fresh = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for entry in entries:
+                if conn.execute("INSERT OR IGNORE INTO seen_videos (video_id, channel_id, seen_at) VALUES (?, ?, ?)",
+                                (entry["video_id"], entry["channel_id"], now)).rowcount:
+                    fresh.append(entry["video_id"])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return fresh
+
+    def mark_fetched(self, video_ids: List[str]) -> None:
+        """
+        Record that these videos were fetched and ingested.
+        """
+        now = time.time()
+        self._connect().executemany("UPDATE seen_videos SET fetched_at = ? WHERE video_id = ?",
+                                    [(now, video_id) for video_id in video_ids])
+
+    def claim_unfetched(self, older_than: float = WEBSUB_RETRY_AFTER,
+                        max_attempts: int = WEBSUB_FETCH_ATTEMPTS, limit: int = 500) -> List[str]:
+        """
+        Claim seen videos that were queued more than older_than ago and never fetched.
+
+        The claim restarts their clock, so only one worker retries each of them.
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT video_id FROM seen_videos WHERE fetched_at IS NULL AND seen_at < ? AND attempts < ? LIMIT ?",
+                (now - older_than, max_attempts, limit)
+            ).fetchall()
+            conn.executemany("UPDATE seen_videos SET seen_at = ?, attempts = attempts + 1 WHERE video_id = ?",
+                             [(now, row["video_id"]) for row in rows])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [row["video_id"] for row in rows]
+
+class VideoBatcher:
+    """
+    Collects new video IDs and fetches them with as few videos.list calls as possible.
+
+    A batch goes out when it reaches the 50 IDs videos.list accepts, or
+    WEBSUB_BATCH_DELAY after its first ID arrived. done() is called with a
+    batch once it was fetched and ingested; a failed batch is left for
+    recover(), which is polled every retry_after seconds for IDs to queue
+    again (including those a worker that exited never got to).
+    """
+
+    def __init__(self, fetch: Callable[[List[str]], List[Dict[str, Any]]],
+                 ingest: Callable[[List[Dict[str, Any]]], None], delay: float = WEBSUB_BATCH_DELAY,
+                 done: Optional[Callable[[List[str]], None]] = None,
+                 recover: Optional[Callable[[], List[str]]] = None, retry_after: float = WEBSUB_RETRY_AFTER):
+        self.fetch = fetch
+        self.ingest = ingest
+        self.delay = delay
+        self.done = done
+        self.recover = recover
+        self.retry_after = retry_after
+        # The first pass picks up what a previous run of the worker left unfetched
+        self._recover_at = time.monotonic()
+        self._pending: "OrderedDict[str, None]" = OrderedDict()
+        self._first_at: Optional[float] = None
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="websub-batcher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def add(self, video_ids: List[str]) -> None:
+        if not video_ids:
+            return
+        with self._condition:
+            for video_id in video_ids:
+                self._pending[video_id] = None
+            if self._first_at is None:
+                self._first_at = time.monotonic()
+            self._condition.notify()
+
+    def _take(self) -> Optional[List[str]]:
+        """
+        The next batch; [] when recover() is due, None once stopped.
+        """
+        with self._condition:
+            while True:
+                if self._pending:
+                    wait = self._first_at + self.delay - time.monotonic()
+                    if len(self._pending) >= VIDEOS_LIST_MAX_IDS or wait <= 0 or self._stopping:
+                        break
+                elif self._stopping:
+                    return None
+                elif self.recover is None:
+                    wait = None
+                else:
+                    wait = self._recover_at - time.monotonic()
+                    if wait <= 0:
+                        return []
+                self._condition.wait(wait)
+            batch = list(self._pending)[:VIDEOS_LIST_MAX_IDS]
+            for video_id in batch:
+                del self._pending[video_id]
+            self._first_at = time.monotonic() if self._pending else None
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            if self.recover is not None and time.monotonic() >= self._recover_at:
+                self._recover_at = time.monotonic() + self.retry_after
+                try:
+                    retry = self.recover()
+                except Exception as e:
+                    logger.error("Looking for unfetched pushed videos failed: %s", e)
+                else:
+                    if retry:
+                        logger.info("Retrying %d pushed videos that were not fetched", len(retry))
+                        self.add(retry)
+            batch = self._take()
+            if batch is None:
+                return
+            if not batch:
+                continue
+            try:
+                videos_list_calls.inc()
+                items = self.fetch(batch)
+                if items:
+                    self.ingest(items)
+                if self.done is not None:
+                    self.done(batch)
+            except Exception as e:
+                logger.error("Fetching %d pushed videos failed, retrying within %.0fs: %s",
+                             len(batch), self.retry_after, e)
+
+def fetch_videos(video_ids: List[str]) -> List[Dict[str, Any]]:
+    """
+    One videos.list call for up to 50 IDs.
+    """
+    from youtube_utils import get_youtube_client
+    response = get_youtube_client().videos().list(
+        part="snippet,statistics,contentDetails",
+        id=",".join(video_ids),
+        maxResults=VIDEOS_LIST_MAX_IDS
+    ).execute()
+    return response.get("items", [])
+
+def merge_into_cache(channel_id: str, items: List[Dict[str, Any]]) -> None:
+    """
+    Put pushed uploads at the head of the channel's cached latest-video lists.
+
+    Lists that are not cached stay uncached; the next request fetches them.
+    """
+    cache = get_cache()
+    items = sorted(items, key=lambda item: item["snippet"].get("publishedAt", ""), reverse=True)
+    ids = {item["id"] for item in items}
+    for size in LATEST_LIST_SIZES:
+        key = f"latest:{channel_id}:{size}"
+        cached = cache.get("stats", key)
+        if cached:
+            cache.set("stats", key, (items + [item for item in cached if item["id"] not in ids])[:size])
+
+def ingest_videos(items: List[Dict[str, Any]]) -> None:
+    """
+    Feed pushed videos to the cache and, through the snapshot listeners, the
+    search index and leaderboards.
+    """
+    from youtube_utils import _publish_snapshot
+    by_channel: Dict[str, List[Dict[str, Any]]] = {}
+    for item in items:
+        by_channel.setdefault(item["snippet"]["channelId"], []).append(item)
+    for channel_id, channel_items in by_channel.items():
+        merge_into_cache(channel_id, channel_items)
+        _publish_snapshot(channel_id, videos=[Video.from_api(item) for item in channel_items])
+    logger.info("Ingested %d pushed videos from %d channels", len(items), len(by_channel))
+
+class Subscriber:
+    """
+    WebSub subscriber for YouTube channel feeds.
+
+    subscribe() asks the hub for a subscription; the hub confirms it by
+    calling verify() through the callback endpoint. Notifications are
+    checked against the topic's HMAC secret while they are parsed, and the
+    IDs of videos not seen before go to the batcher.
+    """
+
+    def __init__(self, store: Optional[SubscriptionStore] = None, hub: str = WEBSUB_HUB,
+                 callback: str = WEBSUB_CALLBACK, secret: str = WEBSUB_SECRET,
+                 fetch: Callable[[List[str]], List[Dict[str, Any]]] = fetch_videos,
+                 ingest: Callable[[List[Dict[str, Any]]], None] = ingest_videos,
+                 lease_seconds: int = WEBSUB_LEASE_SECONDS, batch_delay: float = WEBSUB_BATCH_DELAY,
+                 allow_unsigned: bool = WEBSUB_ALLOW_UNSIGNED):
+        self.store = store or SubscriptionStore()
+        self.hub = hub
+        self.callback = callback
+        self.secret = secret
+        self.allow_unsigned = allow_unsigned
+        self.lease_seconds = lease_seconds
+        self.batcher = VideoBatcher(fetch, ingest, batch_delay, done=self.store.mark_fetched,
+                                    recover=self.store.claim_unfetched)
+
+    def _request_hub(self, channel_id: str, mode: str) -> int:
+        if not self.callback:
+            raise RuntimeError("WEBSUB_CALLBACK is not configured")
+        if mode == "subscribe" and not self.secret and not self.allow_unsigned:
+            raise RuntimeError("WEBSUB_SECRET is not configured (set WEBSUB_ALLOW_UNSIGNED=1 to subscribe without one)")
+        topic = topic_for(channel_id)
+        # Stored first: the hub may verify before its response to us arrives
+        self.store.request(channel_id, mode)
+        form = {
+            "hub.mode": mode,
+            "hub.topic": topic,
+            "hub.callback": f"{self.callback}?channel_id={channel_id}",
+            "hub.verify": "async",
+            "hub.lease_seconds": str(self.lease_seconds),
+        }
+        if self.secret:
+            form["hub.secret"] = secret_for(topic, self.secret)
+        response = httpx.post(self.hub, data=form, timeout=10)
+        if response.status_code not in (202, 204):
+            logger.error("Hub rejected %s for %s: %s %s", mode, channel_id, response.status_code, response.text[:200])
+        response.raise_for_status()
+        return response.status_code
+
+    def subscribe(self, channel_id: str) -> int:
+        return self._request_hub(channel_id, "subscribe")
+
+    def unsubscribe(self, channel_id: str) -> int:
+        return self._request_hub(channel_id, "unsubscribe")
+
+    def renew_due(self, margin: float = WEBSUB_RENEW_MARGIN, interval: float = WEBSUB_RENEW_INTERVAL) -> int:
+        """
+        Renew subscriptions about to expire; returns how many were requested.
+
+        Every worker runs this; store.due() hands each subscription to one of them.
+        """
+        renewed = 0
+        for channel_id in self.store.due(margin, interval):
+            try:
+                self.subscribe(channel_id)
+                renewed += 1
+            except Exception as e:
+                logger.error("Renewing WebSub subscription for %s failed: %s", channel_id, e)
+        return renewed
+
+    def verify(self, params: Dict[str, str]) -> Tuple[int, str]:
+        """
+        Answer the hub's intent verification or denial.
+
+        Returns:
+            (HTTP status, body): the challenge echoed back to confirm, 404 to refuse
+        """
+        mode = params.get("hub.mode", "")
+        topic = params.get("hub.topic", "")
+        subscription = self.store.by_topic(topic)
+        if mode == "denied":
+            if subscription:
+                self.store.set_status(topic, "denied")
+            logger.warning("Hub denied subscription to %s: %s", topic, params.get("hub.reason", ""))
+            return 200, ""
+        if subscription is None or subscription["desired"] != mode or "hub.challenge" not in params:
+            return 404, ""
+        if mode == "subscribe":
+            self.store.activate(topic, int(params.get("hub.lease_seconds") or self.lease_seconds))
+        else:
+            self.store.remove(topic)
+        logger.info("Verified WebSub %s for %s", mode, topic)
+        return 200, params["hub.challenge"]
+
+    async def receive(self, channel_id: str, signature: Optional[str], chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """
+        Handle one push notification as its body streams in.
+
+        The hub is always answered with a 2xx; a notification that fails the
+        signature check, is malformed, too large or for an unknown topic is
+        dropped and counted. Without a secret every notification is dropped
+        unless unsigned ones are allowed. Store lookups run in the threadpool.
+        """
+        if not self.secret and not self.allow_unsigned:
+            notifications.inc(labels={"result": "unsigned"})
+            return {"accepted": False, "reason": "no secret configured"}
+        subscription = await run_in_threadpool(self.store.get, channel_id)
+        if subscription is None or subscription["status"] != "active":
+            notifications.inc(labels={"result": "unknown_topic"})
+            return {"accepted": False, "reason": "unknown topic"}
+        mac = None
+        if self.secret:
+            algorithm, _, expected = (signature or "").partition("=")
+            if algorithm not in SIGNATURE_ALGORITHMS:
+                notifications.inc(labels={"result": "unsigned"})
+                return {"accepted": False, "reason": "missing signature"}
+            mac = hmac.new(secret_for(subscription["topic"], self.secret).encode(), digestmod=SIGNATURE_ALGORITHMS[algorithm])
+
+        parser = FeedParser()
+        size = 0
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > WEBSUB_MAX_BODY:
+                    notifications.inc(labels={"result": "too_large"})
+                    return {"accepted": False, "reason": "body too large"}
+                if mac is not None:
+                    mac.update(chunk)
+                parser.feed(chunk)
+            entries = parser.close()
+        except ET.ParseError:
+            notifications.inc(labels={"result": "malformed"})
+            return {"accepted": False, "reason": "malformed feed"}
+        if mac is not None and not hmac.compare_digest(mac.hexdigest(), expected):
+            notifications.inc(labels={"result": "bad_signature"})
+            return {"accepted": False, "reason": "bad signature"}
+
+        # Only entries of the subscribed channel; a valid signature covers one topic
+        entries = [entry for entry in entries if entry["channel_id"] == channel_id]
+        fresh = await run_in_threadpool(self.store.mark_seen, entries)
+        self.batcher.add(fresh)
+        new_videos.inc(len(fresh))
+        notifications.inc(labels={"result": "accepted"})
+        return {"accepted": True, "entries": len(entries), "new": len(fresh), "deleted": len(parser.deleted)}
+
+_subscriber: Optional[Subscriber] = None
+
+def get_subscriber() -> Subscriber:
+    global _subscriber
+    if _subscriber is None:
+        _subscriber = Subscriber()
+    return _subscriber
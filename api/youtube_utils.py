@@ -1,17 +1,37 @@
 import os
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from dotenv import load_dotenv
+from shared_cache import get_cache
+from records import Channel, Video, VideoTable, format_number
+from transport import http_client
+from logging_setup import configure_logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
+# Called with (channel_id, channel, videos) whenever fresh data is fetched from the API
+_snapshot_listeners: List[Callable[[str, Optional[Channel], List[Video]], None]] = []
+
+def add_snapshot_listener(listener: Callable[[str, Optional[Channel], List[Video]], None]) -> None:
+    """
+    Register a callback for every freshly fetched channel or video snapshot.
+    """
+    if listener not in _snapshot_listeners:
+        _snapshot_listeners.append(listener)
+
+def _publish_snapshot(channel_id: str, channel: Optional[Channel] = None, videos: Optional[List[Video]] = None) -> None:
+    for listener in _snapshot_listeners:
+        try:
+            listener(channel_id, channel, videos or [])
+        except Exception as e:
+            logger.error("Snapshot listener %s failed: %s", getattr(listener, "__name__", listener), e)
+
 def get_youtube_client():
     """
     Create and return an authenticated YouTube client.
@@ -21,23 +41,11 @@ def get_youtube_client():
         if not api_key:
             raise ValueError("YOUTUBE_API_KEY environment variable is not set")
         
-        return build("youtube", "v3", developerKey=api_key)
+        return build("youtube", "v3", developerKey=api_key, http=http_client("youtube"))
     except Exception as e:
-        logger.error(f"Failed to create YouTube client: {str(e)}")
+        logger.error("Failed to create YouTube client: %s", e)
         raise
 
-def format_number(num: int) -> str:
-    """
-    Format large numbers into readable strings (e.g., 1000000 -> 1M).
-    """
-    if num >= 1000000000:
-        return f"{num/1000000000:.1f}B"
-    elif num >= 1000000:
-        return f"{num/1000000:.1f}M"
-    elif num >= 1000:
-        return f"{num/1000:.1f}K"
-    return str(num)
-
 def extract_channel_name(query: str) -> Optional[str]:
     """
     Extract channel name from a query string.
@@ -61,106 +69,135 @@ def extract_channel_name(query: str) -> Optional[str]:
             
     return None
 
+def _search_channel_id(channel_name: str) -> Optional[str]:
+    """
+    Resolve a channel name to its channel ID with a search.list call.
+    """
+    search_response = get_youtube_client().search().list(
+        q=channel_name,
+        type="channel",
+        part="id",
+        maxResults=1
+    ).execute()
+    
+    if not search_response.get("items"):
+        return None
+    return search_response["items"][0]["id"]["channelId"]
+
+def _fetch_channel(channel_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Fetch the raw channels.list item (snippet and statistics) for a channel.
+    """
+    channel_response = get_youtube_client().channels().list(
+        part="statistics,snippet",
+        id=channel_id
+    ).execute()
+    
+    if not channel_response.get("items"):
+        return None
+    item = channel_response["items"][0]
+    _publish_snapshot(channel_id, channel=Channel.from_api(item))
+    return item
+
+def get_channel_record(channel_name: str) -> Optional[Channel]:
+    """
+    Get a channel with raw statistics, resolving the name through the cache.
+    """
+    cache = get_cache()
+    
+    # Resolve the channel name to an ID (search.list costs 100 quota units)
+    channel_id = cache.get_or_compute(
+        "channel", channel_name.lower(), lambda: _search_channel_id(channel_name)
+    )
+    if not channel_id:
+        logger.warning("No channel found for name: %s", channel_name)
+        return None
+    
+    # Get channel statistics snapshot
+    channel = cache.get_or_compute(
+        "stats", f"channel:{channel_id}", lambda: _fetch_channel(channel_id)
+    )
+    if not channel:
+        logger.warning("No statistics found for channel ID: %s", channel_id)
+        return None
+    
+    return Channel.from_api(channel)
+
 def get_channel_info(channel_name: str) -> Optional[Dict[str, Any]]:
     """
     Get channel information including subscriber count and video statistics.
     """
     try:
-        youtube = get_youtube_client()
-        
-        # Search for the channel
-        search_response = youtube.search().list(
-            q=channel_name,
-            type="channel",
-            part="id,snippet",
-            maxResults=1
-        ).execute()
-        
-        if not search_response.get("items"):
-            logger.warning(f"No channel found for name: {channel_name}")
-            return None
-            
-        channel_id = search_response["items"][0]["id"]["channelId"]
-        
-        # Get channel statistics
-        channel_response = youtube.channels().list(
-            part="statistics,snippet",
-            id=channel_id
-        ).execute()
-        
-        if not channel_response.get("items"):
-            logger.warning(f"No statistics found for channel ID: {channel_id}")
-            return None
-            
-        channel = channel_response["items"][0]
-        stats = channel["statistics"]
-        
-        return {
-            "name": channel["snippet"]["title"],
-            "description": channel["snippet"]["description"],
-            "subscriber_count": format_number(int(stats["subscriberCount"])),
-            "video_count": format_number(int(stats["videoCount"])),
-            "view_count": format_number(int(stats["viewCount"])),
-            "channel_id": channel_id
-        }
+        channel = get_channel_record(channel_name)
+        return channel.to_dict() if channel else None
         
     except HttpError as e:
-        logger.error(f"YouTube API error: {str(e)}")
+        logger.error("YouTube API error: %s", e)
         return None
     except Exception as e:
-        logger.error(f"Error getting channel info: {str(e)}")
+        logger.error("Error getting channel info: %s", e)
+        return None
+
+def _fetch_latest_videos(channel_id: str, max_results: int) -> Optional[List[Dict[str, Any]]]:
+    """
+    Fetch the raw videos.list items for a channel's latest uploads, newest first.
+    """
+    youtube = get_youtube_client()
+    
+    # Get latest videos
+    videos_response = youtube.search().list(
+        channelId=channel_id,
+        order="date",
+        part="id",
+        maxResults=max_results,
+        type="video"
+    ).execute()
+    
+    if not videos_response.get("items"):
         return None
+        
+    # Get detailed video statistics
+    video_ids = [item["id"]["videoId"] for item in videos_response["items"]]
+    videos_stats = youtube.videos().list(
+        part="snippet,statistics,contentDetails",
+        id=",".join(video_ids)
+    ).execute()
+    
+    # videos.list does not promise to keep the requested order
+    by_id = {item["id"]: item for item in videos_stats["items"]}
+    items = [by_id[video_id] for video_id in video_ids if video_id in by_id]
+    _publish_snapshot(channel_id, videos=[Video.from_api(item) for item in items])
+    return items
+
+def get_video_table(channel_id: str, max_results: int = 5) -> Optional[VideoTable]:
+    """
+    Get a channel's latest videos as a columnar table of raw statistics.
+    """
+    items = get_cache().get_or_compute(
+        "stats",
+        f"latest:{channel_id}:{max_results}",
+        lambda: _fetch_latest_videos(channel_id, max_results)
+    )
+    if not items:
+        return None
+    return VideoTable([Video.from_api(item) for item in items])
 
 def get_latest_videos(channel_name: str, max_results: int = 5) -> List[Dict[str, Any]]:
     """
     Get the latest videos from a channel with detailed statistics.
     """
     try:
-        youtube = get_youtube_client()
-        
         # First get channel ID
-        channel_info = get_channel_info(channel_name)
-        if not channel_info:
+        channel = get_channel_record(channel_name)
+        if not channel:
             return []
             
-        # Get latest videos
-        videos_response = youtube.search().list(
-            channelId=channel_info["channel_id"],
-            order="date",
-            part="id,snippet",
-            maxResults=max_results,
-            type="video"
-        ).execute()
-        
-        if not videos_response.get("items"):
-            return []
-            
-        # Get detailed video statistics
-        video_ids = [item["id"]["videoId"] for item in videos_response["items"]]
-        videos_stats = youtube.videos().list(
-            part="statistics,contentDetails",
-            id=",".join(video_ids)
-        ).execute()
-        
-        # Combine video information
-        videos = []
-        for video, stats in zip(videos_response["items"], videos_stats["items"]):
-            videos.append({
-                "title": video["snippet"]["title"],
-                "description": video["snippet"]["description"],
-                "published_at": video["snippet"]["publishedAt"],
-                "views": format_number(int(stats["statistics"]["viewCount"])),
-                "likes": format_number(int(stats["statistics"].get("likeCount", 0))),
-                "comments": format_number(int(stats["statistics"].get("commentCount", 0))),
-                "duration": stats["contentDetails"]["duration"],
-                "url": f"https://youtube.com/watch?v={video['id']['videoId']}"
-            })
-            
-        return videos
+        table = get_video_table(channel.channel_id, max_results)
+        return table.to_dicts() if table else []
         
     except HttpError as e:
-        logger.error(f"YouTube API error: {str(e)}")
+        logger.error("YouTube API error: %s", e)
         return []
     except Exception as e:
-        logger.error(f"Error getting latest videos: {str(e)}")
-        return [] 
\ No newline at end of file
+        logger.error("Error getting latest videos: %s", e)
+        return []
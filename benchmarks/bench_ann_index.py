@@ -0,0 +1,111 @@
+"""
+Recall@k and queries per second of the IVF index against the exact scan, for
+a range of nprobe values, plus the recall of rows inserted after training
+(before and after they are merged). Uses clustered synthetic vectors; no
+network access needed.
+
+    python benchmarks/bench_ann_index.py --vectors 200000 --dim 128 --queries 200
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent"))
+from ann_index import IVFIndex
+from embedding_store import EmbeddingStore
+
+def synthetic_vectors(count: int, dim: int, seed: int, noise: float, clusters: int = 1000) -> np.ndarray:
+    # Cluster centres are shared across seeds so queries fall in the same mixture
+    centroids = np.random.default_rng(0).normal(size=(clusters, dim)).astype(np.float32)
+    rng = np.random.default_rng(seed)
+    vectors = np.empty((count, dim), dtype=np.float32)
+    for start in range(0, count, 50000):
+        n = min(50000, count - start)
+        chunk = centroids[rng.integers(0, clusters, size=n)]
+        chunk += rng.normal(scale=noise, size=(n, dim)).astype(np.float32)
+        vectors[start:start + n] = chunk / np.linalg.norm(chunk, axis=1, keepdims=True)
+    return vectors
+
+def load(index, vectors: np.ndarray, offset: int = 0, batch: int = 10000) -> float:
+    start = time.perf_counter()
+    for begin in range(0, len(vectors), batch):
+        chunk = vectors[begin:begin + batch]
+        index.add((f"v{offset + begin + i}", row, {}) for i, row in enumerate(chunk))
+    return time.perf_counter() - start
+
+def measure(search, queries, truth, k):
+    recalls = []
+    start = time.perf_counter()
+    for q, expected in zip(queries, truth):
+        found = {int(m.id[1:]) for m in search(q)}
+        recalls.append(len(found & expected) / k)
+    elapsed = time.perf_counter() - start
+    return float(np.mean(recalls)), len(queries) / elapsed
+
+def exact_truth(vectors: np.ndarray, queries: np.ndarray, k: int):
+    truth = []
+    for q in queries:
+        scores = vectors @ q
+        truth.append(set(np.argpartition(-scores, k - 1)[:k].tolist()))
+    return truth
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the IVF approximate nearest-neighbour index")
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--inserts", type=int, default=25000, help="Rows added after training")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--noise", type=float, default=1.5, help="Spread around the cluster centres")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.vectors, args.dim, args.seed, args.noise)
+    queries = synthetic_vectors(args.queries, args.dim, args.seed + 1, args.noise)
+    truth = exact_truth(vectors, queries, args.k)
+
+    root = tempfile.mkdtemp(prefix="ann-index-")
+    try:
+        exact = EmbeddingStore(os.path.join(root, "exact"), dimension=args.dim, initial_capacity=args.vectors)
+        load(exact, vectors)
+        index = IVFIndex(os.path.join(root, "ivf"), dimension=args.dim, initial_capacity=args.vectors)
+        build_s = load(index, vectors)
+        # Reopen from disk so the run below reads the memory-mapped files
+        index = IVFIndex(os.path.join(root, "ivf"))
+
+        print(f"{args.vectors} vectors x {args.dim} dims, {args.queries} queries, recall@{args.k} vs float32 exact")
+        print(f"IVF build: {build_s:.1f}s incl. training ({args.vectors / build_s:,.0f} vectors/sec), "
+              f"nlist {index.nlist}")
+        print("-" * 60)
+        print(f"{'search':<22}{'recall':>10}{'QPS':>12}{'speedup':>12}")
+        recall, base_qps = measure(lambda q: exact.query(q, top_k=args.k), queries, truth, args.k)
+        print(f"{'exact (int8+rerank)':<22}{recall:>10.4f}{base_qps:>12.0f}{1:>11.1f}x")
+        for nprobe in args.nprobe:
+            recall, qps = measure(lambda q: index.query(q, top_k=args.k, nprobe=nprobe), queries, truth, args.k)
+            print(f"{f'ivf nprobe={nprobe}':<22}{recall:>10.4f}{qps:>12.0f}{qps / base_qps:>11.1f}x")
+
+        # Incremental inserts, with queries near the new rows
+        extra = synthetic_vectors(args.inserts, args.dim, args.seed + 2, args.noise)
+        everything = np.concatenate([vectors, extra])
+        print("-" * 60)
+        for count in (args.inserts // 5, args.inserts):
+            added = count - (len(index) - args.vectors)
+            insert_s = load(index, extra[len(index) - args.vectors:count], offset=len(index))
+            targets = extra[np.linspace(0, count - 1, args.queries).astype(int)]
+            targets = targets + np.random.default_rng(5).normal(scale=0.05, size=targets.shape)
+            targets = (targets / np.linalg.norm(targets, axis=1, keepdims=True)).astype(np.float32)
+            recall, qps = measure(lambda q: index.query(q, top_k=args.k), targets,
+                                  exact_truth(everything[:args.vectors + count], targets, args.k), args.k)
+            print(f"+{count} inserted ({added / insert_s:,.0f}/s), {len(index) - index.merged} unmerged: "
+                  f"recall {recall:.4f}, {qps:.0f} QPS at nprobe={index.nprobe}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Channel digests against generating the analysis on every request, on a
+simulated request stream: Zipf channel popularity, uploads and view growth
+each simulated hour, an off-peak batch once a day, and stale digests
+regenerated in the background. The LLM is a sleep of --llm-ms.
+
+    python benchmarks/bench_digests.py --channels 200 --requests 3000 --hours 48 --llm-ms 40
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from digests import DigestService, DigestStore
+from records import Channel, Video
+
+class World:
+    """Channels whose statistics and uploads move as simulated hours pass."""
+
+    def __init__(self, channels: int, seed: int):
+        self.rng = random.Random(seed)
+        self.channels = {}
+        self.videos = {}
+        for i in range(channels):
+            name = f"channel{i}"
+            self.channels[name] = Channel(f"UC{i:08d}", name, "", self.rng.randint(10**3, 10**7), 200, 10**8)
+            self.videos[name] = [self._video(name, j, 1.6e9 + j * 86400) for j in range(10)]
+        self.now = 1.7e9
+
+    def _video(self, name: str, n: int, published_at: float) -> Video:
+        return Video(f"{name}-v{n}", f"Video {n}", "", published_at, 10**5, 10**4, 10**3, 600)
+
+    def advance_hour(self, upload_rate: float) -> None:
+        self.now += 3600
+        for name, channel in self.channels.items():
+            channel.view_count = int(channel.view_count * 1.0005)
+            channel.subscriber_count = int(channel.subscriber_count * 1.0002)
+            if self.rng.random() < upload_rate:
+                self.videos[name].append(self._video(name, len(self.videos[name]), self.now))
+                channel.video_count += 1
+
+    def fetch(self, name: str):
+        return self.channels[name], self.videos[name][-10:]
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return [samples[int(p / 100 * (len(samples) - 1))] * 1000 for p in (50, 95, 99)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark precomputed channel digests")
+    parser.add_argument("--channels", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--hours", type=int, default=48)
+    parser.add_argument("--llm-ms", type=float, default=40)
+    parser.add_argument("--upload-rate", type=float, default=0.02, help="Uploads per channel per hour")
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    world = World(args.channels, args.seed)
+    llm_calls = []
+
+    def generate(prompt):
+        llm_calls.append(world.now)
+        time.sleep(args.llm_ms / 1000)
+        return "digest"
+
+    stale = set()
+    service = DigestService(DigestStore(os.path.join(tempfile.mkdtemp(), "digests.sqlite3")),
+                            fetch=world.fetch, generate=generate, schedule=stale.add)
+    rng = random.Random(args.seed + 1)
+    names = list(world.channels)
+    weights = [1 / (rank + 1) ** 1.1 for rank in range(len(names))]
+    per_hour = args.requests // args.hours
+
+    latencies, batch_seconds = [], 0.0
+    for hour in range(args.hours):
+        if hour % 24 == 3:
+            start = time.perf_counter()
+            service.refresh()
+            batch_seconds += time.perf_counter() - start
+        for name in rng.choices(names, weights, k=per_hour):
+            start = time.perf_counter()
+            service.answer(name)
+            latencies.append(time.perf_counter() - start)
+        # The job workers catch up on stale digests between requests
+        for name in list(stale):
+            service.regenerate(name)
+        stale.clear()
+        world.advance_hour(args.upload_rate)
+
+    # Without digests: one LLM call per request
+    baseline = []
+    for name in rng.choices(names, weights, k=50):
+        start = time.perf_counter()
+        generate(str(world.fetch(name)))
+        baseline.append(time.perf_counter() - start)
+
+    stats = service.stats()
+    requests = len(latencies)
+    calls = sum(stats["llm_calls"].values())
+    print(f"{requests} requests over {args.hours}h for {args.channels} channels, "
+          f"LLM {args.llm_ms:.0f} ms, {args.upload_rate} uploads/channel/hour")
+    print("-" * 72)
+    print(f"{'strategy':<22}{'LLM calls':>11}{'avoided':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    print(f"{'generate per request':<22}{requests:>11}{0:>10.0%}" + "".join(f"{v:>10.2f}" for v in percentiles(baseline)))
+    print(f"{'digests':<22}{calls:>11}{1 - calls / requests:>10.0%}" + "".join(f"{v:>10.2f}" for v in percentiles(latencies)))
+    print(f"requests: {stats['requests']}, mean ms: {stats['mean_latency_ms']}")
+    print(f"LLM calls: {stats['llm_calls']}, batch unchanged: {stats['batch_unchanged']}, "
+          f"batch time {batch_seconds:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Recall and latency of the local embedding store: float32 vs float16 vs int8
+(scalar quantization with per-vector scales, with and without the float32
+re-rank), with the bytes each variant scans per vector and keeps on disk.
+Uses clustered synthetic 768-dim vectors; no network access needed.
+
+    python benchmarks/bench_embedding_store.py --vectors 200000 --queries 200
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent"))
+from embedding_store import EmbeddingStore, quantize, SCAN_CHUNK_ROWS
+
+def synthetic_vectors(count: int, dim: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centroids = rng.normal(size=(256, dim)).astype(np.float32)
+    vectors = centroids[rng.integers(0, len(centroids), size=count)]
+    vectors += rng.normal(scale=0.8, size=(count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+def chunked_scores(matrix: np.ndarray, query: np.ndarray, scales: np.ndarray = None) -> np.ndarray:
+    scores = np.empty(len(matrix), dtype=np.float32)
+    for start in range(0, len(matrix), SCAN_CHUNK_ROWS):
+        end = min(start + SCAN_CHUNK_ROWS, len(matrix))
+        scores[start:end] = matrix[start:end] @ query
+        if scales is not None:
+            scores[start:end] *= scales[start:end]
+    return scores
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quantized embedding search")
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.vectors, args.dim, args.seed)
+    queries = synthetic_vectors(args.queries, args.dim, args.seed + 1)
+    half = vectors.astype(np.float16)
+    codes, scales = quantize(vectors)
+
+    path = tempfile.mkdtemp(prefix="embedding-store-")
+    try:
+        start = time.perf_counter()
+        store = EmbeddingStore(path, dimension=args.dim, initial_capacity=args.vectors)
+        for offset in range(0, args.vectors, 10000):
+            chunk = vectors[offset:offset + 10000]
+            store.add((f"v{offset + i}", row, {}) for i, row in enumerate(chunk))
+        load_s = time.perf_counter() - start
+
+        truth = [top_k(vectors @ q, args.k) for q in queries]
+        variants = {
+            "float32": lambda q: top_k(chunked_scores(vectors, q), args.k),
+            "float16": lambda q: top_k(chunked_scores(half, q.astype(np.float16)).astype(np.float32), args.k),
+            "int8": lambda q: top_k(chunked_scores(codes, q, scales), args.k),
+            "int8+rerank": lambda q: np.array([int(m.id[1:]) for m in store.query(q, top_k=args.k)]),
+        }
+        scanned_bytes = {
+            "float32": 4 * args.dim,
+            "float16": 2 * args.dim,
+            "int8": args.dim + 4,
+            "int8+rerank": args.dim + 4,
+        }
+        # The store keeps the float32 copy for re-ranking plus the record arrays and lines
+        store_bytes = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+        disk_bytes = dict(scanned_bytes, **{"int8+rerank": store_bytes / args.vectors})
+
+        print(f"{args.vectors} vectors x {args.dim} dims, {args.queries} queries, recall@{args.k} vs float32 exact")
+        print(f"Store build: {load_s:.1f}s ({args.vectors / load_s:,.0f} vectors/sec)")
+        print(f"Python list of floats: ~{args.dim * 32 / 1024:.0f} KB per vector")
+        print("-" * 80)
+        print(f"{'variant':<14}{'recall':>10}{'p50 ms':>10}{'p95 ms':>10}{'scanned MB':>12}"
+              f"{'scan B/vec':>12}{'disk B/vec':>12}")
+        for name, search in variants.items():
+            recalls, timings = [], []
+            for q, expected in zip(queries, truth):
+                start = time.perf_counter()
+                found = search(q)
+                timings.append((time.perf_counter() - start) * 1000)
+                recalls.append(len(set(found.tolist()) & set(expected.tolist())) / args.k)
+            size_mb = scanned_bytes[name] * args.vectors / 2**20
+            print(
+                f"{name:<14}{np.mean(recalls):>10.4f}{np.percentile(timings, 50):>10.2f}"
+                f"{np.percentile(timings, 95):>10.2f}{size_mb:>12.1f}{scanned_bytes[name]:>12}"
+                f"{disk_bytes[name]:>12.0f}"
+            )
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
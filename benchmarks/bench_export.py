@@ -0,0 +1,98 @@
+"""
+Streaming channel export against building the whole file in memory: time to
+first byte, total time, peak Python memory and the bytes sent, for channels
+of increasing size, cold (every page fetched upstream) and warm (pages
+served from the shared cache). Upstream calls are a sleep of --fetch-ms.
+
+    python benchmarks/bench_export.py --videos 1000 10000 50000 --fetch-ms 20
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+os.environ.setdefault("CACHE_PATH", os.path.join(tempfile.mkdtemp(), "cache.sqlite3"))
+os.environ.setdefault("CACHE_MAX_ENTRIES", "1000000")
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from records import Video
+from responses import dumps
+from exports import export_channel, export_row, COLUMNS, EXPORT_PAGE_SIZE
+
+class Channel:
+    """A synthetic channel whose uploads are paged like playlistItems.list."""
+
+    def __init__(self, channel_id: str, videos: int, fetch_ms: float, seed: int):
+        self.channel_id = channel_id
+        self.videos = videos
+        self.fetch_ms = fetch_ms
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    def fetch(self, channel_id: str, page_token):
+        # playlistItems.list, then videos.list
+        self.calls += 2
+        time.sleep(2 * self.fetch_ms / 1000)
+        start = int(page_token or 0)
+        end = min(start + EXPORT_PAGE_SIZE, self.videos)
+        rows = [export_row(Video(f"{channel_id[2:10]}{n:06d}", f"Upload number {n}, with, commas", "",
+                                 1.7e9 - n * 3600, self.rng.randint(0, 10**8), self.rng.randint(0, 10**6),
+                                 self.rng.randint(0, 10**5), self.rng.randint(30, 7200)))
+                for n in range(start, end)]
+        return {"rows": rows, "next": str(end) if end < self.videos else None}
+
+def run_stream(chunks):
+    tracemalloc.start()
+    start = time.perf_counter()
+    first, sent = None, 0
+    for chunk in chunks:
+        if first is None:
+            first = time.perf_counter() - start
+        sent += len(chunk)
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first, total, peak, sent
+
+def buffered(channel: Channel):
+    """The whole export built as one JSON document, like /api/youtube's response."""
+    rows, token = [], None
+    while True:
+        page = channel.fetch(channel.channel_id, token)
+        rows.extend(dict(zip(COLUMNS, row)) for row in page["rows"])
+        token = page["next"]
+        if not token:
+            break
+    yield dumps(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming channel exports")
+    parser.add_argument("--videos", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--fetch-ms", type=float, default=20, help="Simulated latency of each API call")
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"API call latency {args.fetch_ms:.0f} ms, {EXPORT_PAGE_SIZE} videos per page (2 calls)")
+    print("-" * 86)
+    print(f"{'videos':>8}  {'variant':<22}{'first byte ms':>14}{'total s':>10}{'peak MB':>10}"
+          f"{'sent MB':>10}{'API calls':>11}")
+    for i, videos in enumerate(args.videos):
+        channel_id = f"UC{i:022d}"
+        variants = [
+            ("buffered json", lambda c: buffered(c)),
+            ("ndjson cold", lambda c: export_channel(channel_id, "ndjson", fetch=c.fetch)),
+            ("ndjson warm", lambda c: export_channel(channel_id, "ndjson", fetch=c.fetch)),
+            ("csv warm", lambda c: export_channel(channel_id, "csv", fetch=c.fetch)),
+            ("csv+gzip warm", lambda c: export_channel(channel_id, "csv", compress=True, fetch=c.fetch)),
+        ]
+        for name, make in variants:
+            channel = Channel(channel_id, videos, args.fetch_ms, args.seed)
+            first, total, peak, sent = run_stream(make(channel))
+            print(f"{videos:>8}  {name:<22}{first * 1000:>14.1f}{total:>10.2f}{peak / 2**20:>10.2f}"
+                  f"{sent / 2**20:>10.2f}{channel.calls:>11}")
+
+if __name__ == "__main__":
+    main()
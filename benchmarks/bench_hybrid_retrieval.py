@@ -0,0 +1,136 @@
+"""
+Pure-vector vs hybrid (vector + BM25, reciprocal-rank fusion) memory retrieval
+on a synthetic corpus. No network access is needed.
+
+Each memory mentions one entity (a channel name, video title or @handle) and
+one topic; relevant results for a query are the memories about the queried
+entity. The dense side is a stand-in embedding of the whole text: hashed
+word and character-trigram features, so it does see the entity names (no
+embedding API is called). Real embeddings tend to blur rare proper nouns
+more than this, so the hybrid gain here is a lower bound rather than a
+measurement of Gemini embeddings.
+
+    python benchmarks/bench_hybrid_retrieval.py --docs 20000 --queries 500
+"""
+
+import os
+import re
+import sys
+import time
+import zlib
+import random
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent"))
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+
+TOPICS = [
+    "gaming", "cooking", "fitness", "finance", "travel", "music", "science", "tech reviews",
+    "education", "comedy", "vlogs", "diy", "cars", "fashion", "beauty", "sports",
+    "movies", "history", "art", "pets",
+]
+TEMPLATES = [
+    "{entity} posted a new {topic} video this week",
+    "latest {topic} upload from {entity} is trending",
+    "user asked about {entity} and their {topic} content",
+    "{topic} analysis for {entity} showed strong engagement",
+]
+QUERY_TEMPLATES = [
+    "what did {entity} upload about {topic}",
+    "{entity} {topic} stats",
+    "show me {entity}",
+]
+
+def make_entity(rng: random.Random, i: int) -> str:
+    syllables = ["zor", "bix", "ka", "lum", "tri", "vex", "nad", "quo", "fen", "ral"]
+    name = "".join(rng.choice(syllables) for _ in range(3)) + str(i)
+    return rng.choice([name, f"@{name}", f"{name.capitalize()} Studios"])
+
+def embed(text: str, dim: int) -> np.ndarray:
+    """
+    Stand-in dense embedding of the whole text: signed feature hashing of
+    words and their character trigrams, L2-normalized.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in re.findall(r"\w+", text.lower()):
+        features = [(word, 1.0)] + [(word[i:i + 3], 0.5) for i in range(max(len(word) - 2, 0))]
+        for feature, weight in features:
+            h = zlib.crc32(feature.encode())
+            vector[h % dim] += weight if h & 1 << 31 else -weight
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+def build_corpus(n_docs: int, dim: int, seed: int):
+    rng = random.Random(seed)
+    entities = [make_entity(rng, i) for i in range(n_docs // 3)]
+
+    texts, doc_entities, vectors = [], [], np.empty((n_docs, dim), dtype=np.float32)
+    for i in range(n_docs):
+        entity = rng.choice(entities)
+        texts.append(rng.choice(TEMPLATES).format(entity=entity, topic=rng.choice(TOPICS)))
+        doc_entities.append(entity)
+        vectors[i] = embed(texts[i], dim)
+    return texts, doc_entities, vectors, entities, rng
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hybrid memory retrieval")
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    texts, doc_entities, vectors, entities, rng = build_corpus(args.docs, args.dim, args.seed)
+    ids = [f"m{i}" for i in range(args.docs)]
+    by_entity = {}
+    for doc_id, entity in zip(ids, doc_entities):
+        by_entity.setdefault(entity, set()).add(doc_id)
+
+    start = time.perf_counter()
+    index = LexicalIndex(path=os.path.join(tempfile.mkdtemp(), "lexical.sqlite3"))
+    for doc_id, text in zip(ids, texts):
+        index.add(doc_id, text)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    used_entities = [e for e in entities if e in by_entity]
+    results = {"vector": [[], []], "hybrid": [[], []]}
+    candidates = args.k * 4
+    for _ in range(args.queries):
+        entity = rng.choice(used_entities)
+        query = rng.choice(QUERY_TEMPLATES).format(entity=entity, topic=rng.choice(TOPICS))
+        query_vector = embed(query, args.dim)
+        relevant = by_entity[entity]
+
+        start = time.perf_counter()
+        scores = vectors @ query_vector
+        top = np.argpartition(-scores, args.k)[:args.k]
+        vector_ids = [ids[i] for i in top[np.argsort(-scores[top])]]
+        vector_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        scores = vectors @ query_vector
+        top = np.argpartition(-scores, candidates)[:candidates]
+        dense = [ids[i] for i in top[np.argsort(-scores[top])]]
+        lexical = [doc_id for doc_id, _ in index.search(query, top_k=candidates)]
+        hybrid_ids = reciprocal_rank_fusion([dense, lexical], top_k=args.k)
+        hybrid_ms = (time.perf_counter() - start) * 1000
+
+        for name, found, elapsed in (("vector", vector_ids, vector_ms), ("hybrid", hybrid_ids, hybrid_ms)):
+            hits = sum(1 for doc_id in found if doc_id in relevant)
+            results[name][0].append(hits / min(args.k, len(relevant)))
+            results[name][1].append(elapsed)
+
+    print(f"Corpus: {args.docs} memories, {args.queries} queries, k={args.k}")
+    print(f"FTS5 BM25 index build: {build_ms:.0f} ms ({build_ms * 1000 / args.docs:.1f} us/memory)")
+    print("-" * 60)
+    print(f"{'retriever':<10}{'precision@k':>14}{'p50 ms':>12}{'p95 ms':>12}")
+    for name, (precision, latency) in results.items():
+        print(
+            f"{name:<10}{np.mean(precision):>14.3f}"
+            f"{np.percentile(latency, 50):>12.2f}{np.percentile(latency, 95):>12.2f}"
+        )
+
+if __name__ == "__main__":
+    main()
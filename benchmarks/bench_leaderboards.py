@@ -0,0 +1,65 @@
+"""
+Leaderboard maintenance and query cost across many tracked channels:
+incremental TopK updates vs re-sorting every channel per query.
+
+    python benchmarks/bench_leaderboards.py --channels 100000 --updates 200000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from records import Channel
+from leaderboards import Leaderboards
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark leaderboards")
+    parser.add_argument("--channels", type=int, default=100000)
+    parser.add_argument("--updates", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=10000)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    boards = Leaderboards()
+    channels = [Channel(f"UC{i:08d}", f"Channel {i}", "", int(rng.paretovariate(1.2) * 1000),
+                        rng.randint(1, 2000), int(rng.paretovariate(1.1) * 100000)) for i in range(args.channels)]
+    now = time.time() - 8 * 24 * 3600
+    start = time.perf_counter()
+    for channel in channels:
+        boards.update_channel(channel, now)
+    load = time.perf_counter() - start
+
+    # Refreshes: views only grow, by a heavy-tailed amount, over the following week
+    start = time.perf_counter()
+    for i in range(args.updates):
+        channel = channels[rng.randrange(args.channels)]
+        channel.view_count += int(rng.paretovariate(1.5) * 100)
+        channel.subscriber_count += rng.randint(-5, 50)
+        boards.update_channel(channel, now + i * (8 * 24 * 3600 / args.updates))
+    update = time.perf_counter() - start
+
+    followed = {f"UC{rng.randrange(args.channels):08d}" for _ in range(50)}
+    query_cases = [
+        ("top 10 views", lambda: boards.top("views", 10)),
+        ("top 10 gained/week", lambda: boards.top("views_gained_week", 10)),
+        ("top 10 of 50 followed", lambda: boards.top("subscribers", 10, followed)),
+    ]
+    print(f"{args.channels} channels: initial load {load / args.channels * 1e6:.1f} us/channel, "
+          f"refresh {update / args.updates * 1e6:.1f} us/update (4 boards)")
+    print("-" * 50)
+    print(f"{'query':<26}{'us/query':>12}{'re-sort us':>12}")
+    for name, fn in query_cases:
+        start = time.perf_counter()
+        for _ in range(args.queries):
+            fn()
+        elapsed = (time.perf_counter() - start) / args.queries * 1e6
+        start = time.perf_counter()
+        sorted(channels, key=lambda c: c.view_count, reverse=True)[:10]
+        resort = (time.perf_counter() - start) * 1e6
+        print(f"{name:<26}{elapsed:>12.1f}{resort:>12.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Logging cost per request on the request's own thread: the old basicConfig
+setup (synchronous writes, eager f-strings with the full question) against
+logging_setup (queue handler, lazy %-formatting, JSON written by a
+background thread, per-route sampling). Both write to a real file;
+--sink-latency-us adds a delay per write, as when stderr is a pipe whose
+reader (a log shipper, the container runtime) falls behind.
+
+    python benchmarks/bench_logging.py --requests 20000 --error-every 50 --sink-latency-us 50
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+import logging_setup
+from logging_setup import configure_logging, shutdown_logging, RequestLoggingMiddleware
+
+QUESTION = "Can you analyze the channel mkbhd and tell me how the latest videos compare " * 4
+logger = logging.getLogger("agent")
+
+class SlowStream:
+    """A file whose writes take at least latency seconds."""
+
+    def __init__(self, stream, latency: float):
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, text: str) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        self.stream.write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+def fail():
+    raise ValueError("upstream returned 503")
+
+def eager(question: str, error: bool) -> None:
+    """The per-request lines of the YouTube path as they were written before."""
+    logger.info("Received YouTube question request")
+    logger.info(f"Running agent with question: {question}, context: youtube")
+    logger.info(f"Analyzing YouTube query: {question}")
+    logger.info(f"Extracted channel name: {'mkbhd'}")
+    logger.info(f"Fetching latest videos for channel: {'mkbhd'}")
+    logger.info("Generating response with Gemini")
+    logger.info("Successfully generated response")
+    if error:
+        try:
+            fail()
+        except ValueError as e:
+            logger.error(f"Error in run_agent: {str(e)}", exc_info=True)
+
+def lazy(question: str, error: bool) -> None:
+    """The same lines in lazy %-style."""
+    logger.info("Received YouTube question request")
+    logger.info("Running agent (context: %s, %d chars): %.80s", "youtube", len(question), question)
+    logger.info("Analyzing YouTube query: %.80s", question)
+    logger.info("Extracted channel name: %s", "mkbhd")
+    logger.info("Fetching latest videos for channel: %s", "mkbhd")
+    logger.info("Generating response with Gemini")
+    logger.info("Successfully generated response")
+    if error:
+        try:
+            fail()
+        except ValueError as e:
+            logger.error("Error in run_agent: %s", e, exc_info=True)
+
+async def run_requests(count: int, error_every: int, body, middleware: bool) -> float:
+    async def app(scope, receive, send):
+        body(QUESTION, error_every and scope["index"] % error_every == 0)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def send(message):
+        pass
+
+    handler = RequestLoggingMiddleware(app) if middleware else app
+    start = time.perf_counter()
+    for i in range(count):
+        await handler({"type": "http", "path": "/api/youtube", "method": "POST", "headers": [], "index": i},
+                      None, send)
+    return (time.perf_counter() - start) / count * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-request logging cost")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--error-every", type=int, default=50)
+    parser.add_argument("--sink-latency-us", type=float, default=0)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "app.log")
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    cases = []
+
+    with open(path, "w") as file:
+        stream = SlowStream(file, args.sink_latency_us / 1e6)
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter(logging_setup.TEXT_FORMAT))
+        root.addHandler(handler)
+        cases.append(("basicConfig, eager", asyncio.run(run_requests(args.requests, args.error_every, eager, False)), 0.0))
+        root.removeHandler(handler)
+
+        for label, rate in (("queue + JSON, all", 1.0), ("queue + JSON, 10% sampled", 0.1)):
+            logging_setup.SAMPLE_RATES["/api/youtube"] = rate
+            configure_logging(stream)
+            per_request = asyncio.run(run_requests(args.requests, args.error_every, lazy, True))
+            start = time.perf_counter()
+            shutdown_logging()
+            cases.append((label, per_request, (time.perf_counter() - start) * 1000))
+
+    print(f"{args.requests} requests, 7 INFO lines each, a traceback every {args.error_every}, "
+          f"{args.sink_latency_us:.0f} us per write")
+    print("-" * 64)
+    print(f"{'setup':<28}{'us/request':>12}{'vs before':>12}{'drain ms':>12}")
+    baseline = cases[0][1]
+    for label, per_request, drain in cases:
+        print(f"{label:<28}{per_request:>12.1f}{per_request / baseline:>12.0%}{drain:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Memory and serialization cost of cached video data: the dicts get_latest_videos
+used to build (pre-formatted "1.2M" strings) vs Video slot records vs the
+columnar VideoTable. Titles, descriptions and thumbnail URLs are shared by all
+three, so the figures are the per-structure overhead on top of those strings.
+
+    python benchmarks/bench_records.py --videos 10000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from records import Video, VideoTable, format_number
+
+def synthetic_items(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        items.append({
+            "id": f"vid{i:08d}",
+            "snippet": {
+                "title": f"Video number {i}",
+                "description": "A description of the video. " * 8,
+                "publishedAt": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T12:00:00Z",
+                "thumbnails": {"high": {"url": f"https://i.ytimg.com/vi/vid{i:08d}/hqdefault.jpg"}},
+            },
+            "statistics": {
+                "viewCount": str(rng.randint(0, 10**9)),
+                "likeCount": str(rng.randint(0, 10**7)),
+                "commentCount": str(rng.randint(0, 10**5)),
+            },
+            "contentDetails": {"duration": f"PT{rng.randint(0, 59)}M{rng.randint(0, 59)}S"},
+        })
+    return items
+
+def legacy_dict(item: dict) -> dict:
+    """The dict shape api/youtube_utils.get_latest_videos built before records.py."""
+    stats = item["statistics"]
+    return {
+        "title": item["snippet"]["title"],
+        "description": item["snippet"]["description"],
+        "published_at": item["snippet"]["publishedAt"],
+        "views": format_number(int(stats["viewCount"])),
+        "likes": format_number(int(stats.get("likeCount", 0))),
+        "comments": format_number(int(stats.get("commentCount", 0))),
+        "duration": item["contentDetails"]["duration"],
+        "url": f"https://youtube.com/watch?v={item['id']}",
+    }
+
+def measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    value = build()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, size, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark video record containers")
+    parser.add_argument("--videos", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    items = synthetic_items(args.videos, args.seed)
+    variants = {
+        "legacy dicts": (lambda: [legacy_dict(item) for item in items], lambda v: v),
+        "Video slots": (lambda: [Video.from_api(item) for item in items], lambda v: [x.to_dict() for x in v]),
+        "VideoTable": (lambda: VideoTable([Video.from_api(item) for item in items]), lambda v: v.to_dicts()),
+    }
+
+    print(f"{args.videos} cached videos")
+    print("-" * 72)
+    print(f"{'container':<16}{'memory KB':>12}{'B/video':>10}{'build ms':>12}{'serialize ms':>16}")
+    for name, (build, serialize) in variants.items():
+        value, size, build_s = measure(build)
+        start = time.perf_counter()
+        json.dumps(serialize(value))
+        serialize_s = time.perf_counter() - start
+        print(
+            f"{name:<16}{size / 1024:>12.0f}{size / args.videos:>10.0f}"
+            f"{build_s * 1000:>12.1f}{serialize_s * 1000:>16.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
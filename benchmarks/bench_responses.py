@@ -0,0 +1,95 @@
+"""
+Bytes on the wire and serialization CPU for /api/youtube responses: stdlib json
+vs the response layer (orjson when installed), full payload vs ?fields=
+selection, gzip/brotli, and ETag revalidation (304, no body).
+
+    python benchmarks/bench_responses.py --requests 2000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from starlette.requests import Request
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+import responses
+from responses import json_response, version_etag, precondition_response
+
+def synthetic_result() -> dict:
+    """A run_agent(context="youtube") result with realistic description lengths."""
+    description = "Subscribe for new videos every week! Links and sponsors below. " * 12
+    videos = [{
+        "title": f"I Built {i} Houses In 24 Hours",
+        "description": description,
+        "published_at": "2024-03-01T12:00:00Z",
+        "views": "123.4M",
+        "likes": "4.5M",
+        "comments": "98.7K",
+        "duration": "PT21M3S",
+        "url": f"https://youtube.com/watch?v=abcdefghij{i}",
+    } for i in range(5)]
+    channel = {
+        "name": "MrBeast", "description": description * 2, "subscriber_count": "250.0M",
+        "video_count": "800", "view_count": "50.0B", "channel_id": "UCX6OQ3DkcsbYNE6H8uQQuVA",
+    }
+    return {
+        "answer": "MrBeast's latest uploads continue his large-scale challenge format. " * 20,
+        "youtube_data": {"channel_info": channel, "latest_videos": videos, "query": "mrbeast stats"},
+    }
+
+def make_request(query: str = "", headers: dict = None) -> Request:
+    raw_headers = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "path": "/api/youtube",
+                    "query_string": query.encode(), "headers": raw_headers})
+
+def time_per_request(fn, count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return (time.perf_counter() - start) / count * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API response serialization")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    result = synthetic_result()
+    fields = "answer,youtube_data.channel_info.name,youtube_data.channel_info.subscriber_count," \
+             "youtube_data.latest_videos.title,youtube_data.latest_videos.views"
+    # The validator comes from the snapshot version, known before run_agent() runs
+    version = "snapshot-version"
+    etag = version_etag(make_request(), version)
+    poll = make_request(headers={"If-None-Match": etag})
+
+    cases = [
+        ("stdlib JSONResponse", None, lambda: json.dumps(result, ensure_ascii=False).encode()),
+        ("full, identity", make_request(), None),
+        ("full, gzip", make_request(headers={"Accept-Encoding": "gzip"}), None),
+        ("full, br", make_request(headers={"Accept-Encoding": "br"}), None),
+        ("fields, identity", make_request(f"fields={fields}"), None),
+        ("fields, gzip", make_request(f"fields={fields}", {"Accept-Encoding": "gzip"}), None),
+        ("repeat poll (304)", None, lambda: precondition_response(poll, version_etag(poll, version))),
+    ]
+
+    encoder = "orjson" if responses.orjson is not None else "json (orjson not installed)"
+    print(f"Encoder: {encoder}; brotli {'available' if responses.brotli else 'not installed'}")
+    print("-" * 64)
+    print(f"{'case':<22}{'status':>8}{'bytes':>10}{'encoding':>10}{'us/request':>14}")
+    for name, request, fn in cases:
+        if fn is not None:
+            response = fn()
+            body, status = (response, 200) if isinstance(response, bytes) else (response.body, response.status_code)
+            encoding = "-"
+        else:
+            fn = lambda request=request: json_response(request, result, etag=etag)
+            response = fn()
+            body, status = response.body, response.status_code
+            encoding = response.headers.get("content-encoding", "-")
+            if name.endswith("br") and encoding != "br":
+                continue
+        print(f"{name:<22}{status:>8}{len(body):>10}{encoding:>10}{time_per_request(fn, args.requests):>14.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Query latency of the SQLite FTS5 search index on a synthetic corpus: single
+and multi-term queries, with and without channel and date filters.
+
+    python benchmarks/bench_search_index.py --videos 1000000 --channels 2000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from search_index import SearchIndex
+
+# Topic words that queries pick from; the rest of the vocabulary is Zipf-distributed filler
+WORDS = ("minecraft challenge survive build island review iphone camera battery tutorial python "
+         "recipe pasta travel budget rocket science experiment history ancient guitar workout "
+         "speedrun prank animals").split()
+VOCABULARY = 50000
+
+def synthetic_rows(count: int, channels: int, seed: int):
+    """Titles and descriptions with a Zipf word distribution, as in real text."""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"w{i}" for i in range(VOCABULARY)], dtype=object)
+    # Topic words sit at mid-frequency ranks, like real subject terms
+    vocabulary[200:200 + len(WORDS)] = WORDS
+    for start in range(0, count, 10000):
+        size = min(10000, count - start)
+        lengths = rng.integers(25, 70, size)
+        words = vocabulary[np.minimum(rng.zipf(1.2, lengths.sum()), VOCABULARY) - 1]
+        channel_ids = rng.integers(0, channels, size)
+        published = 1.4e9 + rng.random(size) * 3e8
+        offset = 0
+        for i in range(size):
+            doc = words[offset:offset + lengths[i]]
+            offset += lengths[i]
+            yield (f"v{start + i:010d}", f"UC{channel_ids[i]:08d}", float(published[i]),
+                   " ".join(doc[:8]), " ".join(doc[8:]))
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return [samples[int(p / 100 * (len(samples) - 1))] * 1000 for p in (50, 95, 99)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the FTS5 search index")
+    parser.add_argument("--videos", type=int, default=1000000)
+    parser.add_argument("--channels", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    index = SearchIndex(os.path.join(tempfile.mkdtemp(), "search.sqlite3"))
+    start = time.perf_counter()
+    batch = []
+    for row in synthetic_rows(args.videos, args.channels, args.seed):
+        batch.append(row)
+        if len(batch) == 50000:
+            index.add_rows(batch)
+            batch = []
+    index.add_rows(batch)
+    index.optimize()
+    load = time.perf_counter() - start
+    size = os.path.getsize(index.path) / 1e6
+    print(f"Indexed {args.videos} videos in {load:.1f}s ({args.videos / load:,.0f} videos/s), {size:.0f} MB")
+
+    rng = random.Random(args.seed + 1)
+    cases = [
+        ("one term", lambda: index.search(rng.choice(WORDS))),
+        ("two terms", lambda: index.search(f"{rng.choice(WORDS)} {rng.choice(WORDS)}")),
+        ("term + channel", lambda: index.search(rng.choice(WORDS), channel_id=f"UC{rng.randrange(args.channels):08d}")),
+        ("term + last 30 days", lambda: index.search(rng.choice(WORDS), since=1.4e9 + 3e8 - 30 * 86400)),
+        ("rare phrase miss", lambda: index.search("quantum chromodynamics")),
+    ]
+    print("-" * 60)
+    print(f"{'query':<22}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'hits':>8}")
+    for name, fn in cases:
+        timings, hits = [], 0
+        for _ in range(args.queries):
+            t = time.perf_counter()
+            hits = len(fn())
+            timings.append(time.perf_counter() - t)
+        p50, p95, p99 = percentiles(timings)
+        print(f"{name:<22}{p50:>10.2f}{p95:>10.2f}{p99:>10.2f}{hits:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Thumbnail proxy against a local image stub server: bytes per variant vs the
+hot-linked "high" image, cold vs warm latency, and request coalescing (many
+concurrent requests for one uncached video cause a single upstream fetch).
+
+    python benchmarks/bench_thumbnails.py --videos 50 --concurrency 100 --latency-ms 80
+"""
+
+import io
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from PIL import Image, ImageDraw
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+def stub_image() -> bytes:
+    """A 480x360 letterboxed JPEG, the shape of hqdefault.jpg."""
+    image = Image.new("RGB", (480, 360), "black")
+    draw = ImageDraw.Draw(image)
+    for i in range(0, 480, 12):
+        draw.rectangle((i, 45, i + 6, 315), fill=(i % 255, 120, 255 - i % 255))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=92)
+    return buffer.getvalue()
+
+def start_stub(latency: float, body: bytes):
+    fetches = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            fetches.append(self.path)
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, fetches
+
+async def run(args):
+    from thumbnails import ThumbnailService, BlobStore, SIZES
+
+    body = stub_image()
+    server, fetches = start_stub(args.latency_ms / 1000, body)
+    service = ThumbnailService(
+        BlobStore(tempfile.mkdtemp()), source=f"http://127.0.0.1:{server.server_port}/vi/{{video_id}}/hqdefault.jpg"
+    )
+    videos = [f"video{i:06d}" for i in range(args.videos)]
+
+    async def timed(video_id, size):
+        start = time.perf_counter()
+        data, _ = await service.get(video_id, size)
+        return time.perf_counter() - start, len(data)
+
+    # Cold: every request for a video arrives at once
+    start = time.perf_counter()
+    cold = await asyncio.gather(*(timed(v, "medium") for v in videos for _ in range(args.concurrency // args.videos or 1)))
+    cold_elapsed = time.perf_counter() - start
+    # Warm: one request at a time, so the figure is the per-request cost
+    warm = {size: sorted([(await timed(v, size))[0] for v in videos]) for size in SIZES}
+
+    sizes = {size: (await service.get(videos[0], size))[0] for size in SIZES}
+    print(f"{len(cold)} cold requests for {args.videos} videos -> {len(fetches)} upstream fetches "
+          f"in {cold_elapsed:.2f}s (stub latency {args.latency_ms:.0f} ms)")
+    print("-" * 48)
+    print(f"{'variant':<18}{'bytes':>10}{'vs high':>10}{'p50 ms':>10}")
+    print(f"{'high (hot-link)':<18}{len(body):>10}{'100%':>10}{'-':>10}")
+    for size, data in sizes.items():
+        p50 = warm[size][len(warm[size]) // 2] * 1000
+        print(f"{size:<18}{len(data):>10}{len(data) / len(body):>10.0%}{p50:>10.2f}")
+    cold_p50 = sorted(t for t, _ in cold)[len(cold) // 2] * 1000
+    print(f"{'cold medium':<18}{'':>10}{'':>10}{cold_p50:>10.2f}")
+    await service.close()
+    server.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the thumbnail proxy")
+    parser.add_argument("--videos", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=80)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
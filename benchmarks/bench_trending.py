@@ -0,0 +1,79 @@
+"""
+Trending-topic fetches for a content calendar against a local stub of the
+search API: the old serial requests.get per topic vs the pooled, bounded
+fan-out, and the fan-out again with a warm per-topic cache.
+
+    python benchmarks/bench_trending.py --topics 20 --latency-ms 150
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def start_stub(latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(latency)
+            payload = json.dumps({"organic": [
+                {"title": f"{body['q']} result {i}", "link": f"https://example.com/{i}",
+                 "snippet": "Trending now", "position": i + 1} for i in range(10)
+            ]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark trending-topic fetching")
+    parser.add_argument("--topics", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=150)
+    args = parser.parse_args()
+
+    server = start_stub(args.latency_ms / 1000)
+    os.environ["SERPER_URL"] = f"http://127.0.0.1:{server.server_port}/search"
+    os.environ["CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "cache.sqlite3")
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent"))
+    import requests
+    import trending
+
+    topics = [f"topic {i}" for i in range(args.topics)]
+
+    def serial():
+        # The old tool: a fresh connection per call and a stringified response
+        return [str(requests.post(os.environ["SERPER_URL"], json={"q": topic}).json()) for topic in topics]
+
+    cases = [
+        ("serial requests", serial),
+        ("fan-out, cold cache", lambda: trending.search_trending_many(topics)),
+        ("fan-out, warm cache", lambda: trending.search_trending_many(topics)),
+    ]
+    print(f"{args.topics} topics, stub latency {args.latency_ms:.0f} ms, concurrency {trending.TRENDING_CONCURRENCY}")
+    print("-" * 44)
+    print(f"{'case':<24}{'seconds':>10}{'results':>10}")
+    for name, fn in cases:
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        count = sum(len(v) for v in result.values()) if isinstance(result, dict) else len(result)
+        print(f"{name:<24}{elapsed:>10.2f}{count:>10}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
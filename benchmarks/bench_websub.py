@@ -0,0 +1,187 @@
+"""
+End-to-end WebSub ingestion against the local stand-in hub: subscribe a set
+of channels, push uploads (each also pushed again, as YouTube does on title
+edits), and measure push-to-ingest latency, videos.list calls and quota
+against polling every channel. Also checks renewal of expiring leases.
+
+    python benchmarks/bench_websub.py --channels 200 --uploads 1000 --batch-delay 0.2
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+
+directory = tempfile.mkdtemp()
+os.environ.setdefault("CACHE_PATH", os.path.join(directory, "cache.sqlite3"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from shared_cache import get_cache
+from websub import Subscriber, SubscriptionStore, merge_into_cache, topic_for
+from websub_hub import start_hub
+
+# search.list (100 units) + videos.list (1 unit) per channel per poll
+POLL_UNITS = 101
+
+def video_item(video_id: str, channel_id: str, published: str):
+    return {
+        "id": video_id,
+        "snippet": {"title": f"Upload {video_id}", "description": "", "channelId": channel_id,
+                    "publishedAt": published, "thumbnails": {}},
+        "statistics": {"viewCount": "0", "likeCount": "0", "commentCount": "0"},
+        "contentDetails": {"duration": "PT10M"},
+    }
+
+def callback_app(subscriber: Subscriber) -> FastAPI:
+    """The two callback routes of api/index.py, without the rest of the app."""
+    app = FastAPI()
+
+    @app.get("/api/websub/callback")
+    async def verify(request: Request):
+        status, body = await run_in_threadpool(subscriber.verify, dict(request.query_params))
+        return PlainTextResponse(body, status_code=status)
+
+    @app.post("/api/websub/callback")
+    async def notify(request: Request, channel_id: str = ""):
+        result = await subscriber.receive(channel_id, request.headers.get("x-hub-signature"), request.stream())
+        return JSONResponse(result, status_code=202)
+
+    return app
+
+def serve(app: FastAPI, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+def free_port() -> int:
+    import socket
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for(condition, timeout: float = 30) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return [samples[int(p / 100 * (len(samples) - 1))] * 1000 for p in (50, 95, 99)]
+
+async def push_all(hub_url: str, pushes, concurrency: int, sent_at):
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(timeout=30) as client:
+        async def push(channel_id, video_id):
+            async with semaphore:
+                sent_at.setdefault(video_id, time.perf_counter())
+                await client.post(f"{hub_url}/publish", json={
+                    "topic": topic_for(channel_id),
+                    "videos": [{"video_id": video_id, "channel_id": channel_id, "title": f"Upload {video_id}"}],
+                })
+        await asyncio.gather(*(push(c, v) for c, v in pushes))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark WebSub push ingestion")
+    parser.add_argument("--channels", type=int, default=200)
+    parser.add_argument("--uploads", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--batch-delay", type=float, default=0.2)
+    parser.add_argument("--fetch-ms", type=float, default=50, help="Simulated videos.list latency")
+    parser.add_argument("--poll-minutes", type=float, default=15, help="Polling interval to compare against")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    hub_server, hub = start_hub()
+    hub_url = f"http://127.0.0.1:{hub_server.server_port}"
+    port = free_port()
+    fetch_calls, ingested_at = [], {}
+
+    def fetch(video_ids):
+        fetch_calls.append(len(video_ids))
+        time.sleep(args.fetch_ms / 1000)
+        return [video_item(v, v.split("-")[0], "2026-01-01T00:00:00Z") for v in video_ids]
+
+    def ingest(items):
+        by_channel = {}
+        for item in items:
+            by_channel.setdefault(item["snippet"]["channelId"], []).append(item)
+        for channel_id, channel_items in by_channel.items():
+            merge_into_cache(channel_id, channel_items)
+        now = time.perf_counter()
+        for item in items:
+            ingested_at[item["id"]] = now
+
+    subscriber = Subscriber(SubscriptionStore(os.path.join(directory, "websub.sqlite3")),
+                            hub=f"{hub_url}/subscribe", callback=f"http://127.0.0.1:{port}/api/websub/callback",
+                            secret="bench-secret", fetch=fetch, ingest=ingest, lease_seconds=3600,
+                            batch_delay=args.batch_delay)
+    subscriber.batcher.start()
+    server = serve(callback_app(subscriber), port)
+
+    channels = [f"UC{i:022d}" for i in range(args.channels)]
+    cache = get_cache()
+    for channel_id in channels:
+        cache.set("stats", f"latest:{channel_id}:5",
+                  [video_item(f"{channel_id}-old{j}", channel_id, "2025-01-01T00:00:00Z") for j in range(5)])
+
+    start = time.perf_counter()
+    for channel_id in channels:
+        subscriber.subscribe(channel_id)
+    subscribed = wait_for(lambda: all(s["status"] == "active" for s in subscriber.store.all()))
+    subscribe_seconds = time.perf_counter() - start
+
+    rng = random.Random(args.seed)
+    uploads = [(channel_id, f"{channel_id}-new{i}") for i, channel_id in
+               enumerate(rng.choice(channels) for _ in range(args.uploads))]
+    # Every upload is pushed twice, the second time like a title edit
+    pushes = uploads + rng.sample(uploads, len(uploads))
+    sent_at = {}
+    start = time.perf_counter()
+    asyncio.run(push_all(hub_url, pushes, args.concurrency, sent_at))
+    done = wait_for(lambda: len(ingested_at) >= len(uploads))
+    elapsed = time.perf_counter() - start
+
+    sample_channel, sample_video = uploads[-1]
+    merged = cache.get("stats", f"latest:{sample_channel}:5")
+    latencies = [ingested_at[v] - sent_at[v] for _, v in uploads if v in ingested_at]
+
+    # Renewal: every lease is now "about to expire" with a margin beyond its length,
+    # and the subscriptions count as requested long enough ago to be renewed again
+    renewed = subscriber.renew_due(margin=7200, interval=0)
+    renew_ok = wait_for(lambda: hub.verifications >= 2 * args.channels)
+
+    calls = len(fetch_calls)
+    polls_per_day = 24 * 60 / args.poll_minutes
+    print(f"{args.channels} channels subscribed in {subscribe_seconds:.2f}s (all verified: {subscribed}); "
+          f"{len(pushes)} pushes for {args.uploads} uploads delivered in {elapsed:.2f}s (all ingested: {done})")
+    print("-" * 64)
+    print(f"{'push to ingest':<28}" + "".join(f"{name:>12}" for name in ("p50 ms", "p95 ms", "p99 ms")))
+    print(f"{'':<28}" + "".join(f"{v:>12.1f}" for v in percentiles(latencies)))
+    print(f"videos.list calls: {calls} for {sum(fetch_calls)} new IDs "
+          f"(mean batch {sum(fetch_calls) / max(calls, 1):.1f}); repeated pushes fetched again: "
+          f"{sum(fetch_calls) - len(uploads)}")
+    print(f"quota: push {calls} units for these {args.uploads} uploads; polling {args.channels} channels every "
+          f"{args.poll_minutes:.0f} min costs {args.channels * POLL_UNITS * polls_per_day:,.0f} units/day")
+    print(f"cache merge: newest cached upload for {sample_channel[:10]}... is "
+          f"{merged[0]['id'] if merged else None} (expected {sample_video})")
+    print(f"renewal: {renewed} renewals requested, re-verified: {renew_ok}")
+    subscriber.batcher.stop()
+    server.should_exit = True
+    hub_server.shutdown()
+
+if __name__ == "__main__":
+    main()
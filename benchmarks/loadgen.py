@@ -0,0 +1,245 @@
+"""
+Open-loop load generator for /api/youtube and /api/chat.
+
+Requests arrive as a Poisson process at a fixed offered rate, independent of
+how fast the server answers (a closed-loop client would slow down with the
+server and hide queueing). The rate is stepped up until the server saturates;
+every step reports throughput, latency percentiles, queueing delay and errors.
+
+Upstreams are stubbed with the record/replay transport (api/transport.py):
+record a cassette set once with the same corpus, then replay it under load.
+
+    # 1. record upstream traffic for the corpus at a gentle rate
+    python benchmarks/loadgen.py --spawn --upstream-mode record --rates 1 --duration 30
+    # 2. load-test against replayed upstreams for 1, 2 and 4 workers
+    python benchmarks/loadgen.py --spawn --workers 1 2 4 --rates 1 2 4 8 16 32 --csv curves.csv
+
+Spawned servers get a fresh shared cache (CACHE_PATH) and no per-client rate
+limit (CLIENT_RATE=0): every request comes from one address, and answers cached
+by an earlier run would be measured as cache hits. Answers are still cached
+within a run, so each step reports the share of requests repeating a question
+already sent to the server (the most that can be answer-cache hits) and the
+share rejected with 429. --vary makes every question unique, so answers are
+generated each time; the sequence is seeded, so record and replay with the
+same --vary, --rates, --duration and --seed.
+
+With --url instead of --spawn an already running server is targeted.
+"""
+
+import os
+import sys
+import csv
+import time
+import shutil
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, List, Optional, Set
+import httpx
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api")
+
+DEFAULT_CORPUS = [
+    ("youtube", "Show me the latest videos from channel MrBeast"),
+    ("youtube", "What are the stats of channel PewDiePie"),
+    ("youtube", "Latest videos from channel veritasium"),
+    ("youtube", "channel mkbhd statistics"),
+    ("chat", "Give me five video ideas for a cooking channel"),
+    ("chat", "How often should a small channel upload?"),
+    ("chat", "Write a hook for a video about budget travel"),
+]
+
+def load_corpus(path: Optional[str]) -> List[tuple]:
+    """Read 'youtube<TAB>question' / 'chat<TAB>question' lines, or use the built-in corpus."""
+    if not path:
+        return DEFAULT_CORPUS
+    corpus = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                route, question = line.rstrip("\n").split("\t", 1)
+                corpus.append((route, question))
+    return corpus
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+async def run_step(client: httpx.AsyncClient, base_url: str, corpus: List[tuple], rate: float,
+                   duration: float, timeout: float, rng: random.Random, sent: Set[tuple],
+                   vary: bool = False) -> Dict[str, float]:
+    """
+    Offer `rate` requests/sec for `duration` seconds and collect the outcomes.
+
+    `sent` holds the (route, question) pairs already sent to this server and is
+    updated, so repeats can be counted across steps.
+    """
+    results = []
+    lags = []
+    repeats = 0
+
+    async def fire(route: str, question: str, scheduled: float):
+        started = time.perf_counter()
+        lags.append(started - scheduled)
+        try:
+            response = await client.post(f"{base_url}/api/{route}", json={"question": question}, timeout=timeout)
+            ok = response.status_code < 400
+            status = response.status_code
+        except httpx.HTTPError as e:
+            ok, status = False, type(e).__name__
+        results.append((ok, status, time.perf_counter() - scheduled))
+
+    tasks = []
+    start = time.perf_counter()
+    next_arrival = start
+    while True:
+        next_arrival += rng.expovariate(rate)
+        if next_arrival - start > duration:
+            break
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        route, question = rng.choice(corpus)
+        if vary:
+            question = f"{question} (request {len(sent) + 1})"
+        if (route, question) in sent:
+            repeats += 1
+        sent.add((route, question))
+        # Open loop: never wait for earlier requests before sending the next one
+        tasks.append(asyncio.create_task(fire(route, question, next_arrival)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for ok, _, latency in results if ok]
+    errors = [status for ok, status, _ in results if not ok]
+    total = len(results) or 1
+    return {
+        "offered_rps": rate,
+        "sent": len(results),
+        "throughput_rps": len(latencies) / elapsed,
+        "error_rate": len(errors) / total,
+        "rejected_429_rate": errors.count(429) / total,
+        "repeat_rate": repeats / total,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "client_lag_p99_ms": percentile(lags, 99) * 1000,
+        "errors": ",".join(sorted({str(e) for e in errors})),
+    }
+
+def spawn_server(workers: int, port: int, upstream_mode: str, latency_scale: float,
+                 cache_dir: str) -> subprocess.Popen:
+    # A cache of its own per server, and no per-client limit for a single load generator
+    env = dict(os.environ, UPSTREAM_MODE=upstream_mode, REPLAY_LATENCY_SCALE=str(latency_scale),
+               CACHE_PATH=os.path.join(cache_dir, f"cache-{workers}.sqlite3"), CLIENT_RATE="0")
+    env.pop("CACHE_URL", None)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "index:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=API_DIR, env=env
+    )
+
+async def wait_healthy(base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/api/health", timeout=2.0)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"Server at {base_url} did not become healthy")
+
+async def sweep(base_url: str, args, corpus: List[tuple]) -> List[Dict[str, float]]:
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    steps = []
+    sent = set()
+    baseline_p50 = None
+    async with httpx.AsyncClient(limits=limits) as client:
+        for rate in args.rates:
+            step = await run_step(client, base_url, corpus, rate, args.duration, args.timeout, rng, sent,
+                                  vary=args.vary)
+            if baseline_p50 is None:
+                baseline_p50 = step["p50_ms"]
+            # Latency above the lightest-load median is time spent waiting, not working
+            step["queueing_ms"] = max(0.0, step["p50_ms"] - baseline_p50)
+            step["saturated"] = (
+                step["throughput_rps"] < 0.9 * rate
+                or step["error_rate"] > 0.01
+                or step["p95_ms"] > args.latency_slo_ms
+            )
+            steps.append(step)
+            print(
+                f"{rate:>8.1f}{step['throughput_rps']:>10.1f}{step['p50_ms']:>10.0f}{step['p95_ms']:>10.0f}"
+                f"{step['p99_ms']:>10.0f}{step['queueing_ms']:>10.0f}{step['error_rate']:>8.1%}"
+                f"{step['rejected_429_rate']:>8.1%}{step['repeat_rate']:>8.1%}"
+                f"{step['client_lag_p99_ms']:>10.1f}  {'SATURATED' if step['saturated'] else ''}"
+                f" {step['errors']}"
+            )
+            if step["saturated"] and not args.keep_going:
+                break
+    return steps
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8765", help="Server to target")
+    parser.add_argument("--spawn", action="store_true", help="Start api/index.py with uvicorn for each --workers value")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1])
+    parser.add_argument("--upstream-mode", choices=["replay", "record", "live"], default="replay")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Replay latency multiplier")
+    parser.add_argument("--rates", type=float, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per rate step")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--latency-slo-ms", type=float, default=5000.0, help="p95 above this counts as saturated")
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--corpus", help="TSV file of route<TAB>question")
+    parser.add_argument("--csv", help="Write every step of every worker configuration here")
+    parser.add_argument("--keep-going", action="store_true", help="Continue past the saturation point")
+    parser.add_argument("--vary", action="store_true", help="Make every question unique to defeat the answer cache")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    cache_dir = tempfile.mkdtemp(prefix="loadgen-cache-")
+    rows = []
+    for workers in (args.workers if args.spawn else [None]):
+        server = None
+        base_url = args.url
+        if args.spawn:
+            server = spawn_server(workers, int(base_url.rsplit(":", 1)[1]), args.upstream_mode, args.latency_scale,
+                                  cache_dir)
+        try:
+            asyncio.run(wait_healthy(base_url))
+            print(f"\nWorkers: {workers or 'external server'} (upstreams: {args.upstream_mode})")
+            print("-" * 112)
+            print(f"{'offered':>8}{'achieved':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+                  f"{'queue ms':>10}{'errors':>8}{'429':>8}{'repeat':>8}{'lag ms':>10}")
+            steps = asyncio.run(sweep(base_url, args, corpus))
+            saturated = next((s for s in steps if s["saturated"]), None)
+            if saturated:
+                print(f"Saturation at ~{saturated['offered_rps']} req/s offered "
+                      f"(max sustained {max(s['throughput_rps'] for s in steps):.1f} req/s)")
+            else:
+                print("No saturation within the tested rates")
+            rows.extend(dict(step, workers=workers) for step in steps)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+    if args.csv and rows:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"\nLatency vs throughput curves written to {args.csv}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+A local stand-in for a WebSub hub, for exercising api/websub.py without
+YouTube or pubsubhubbub.appspot.com.
+
+- POST /subscribe takes the usual hub.* form, answers 202 and then verifies
+  intent against the callback with a challenge, as the real hub does.
+- POST /publish with {"topic": ..., "videos": [{"video_id", "channel_id", "title"}]}
+  delivers a YouTube-style Atom feed to every subscriber of the topic,
+  signed with X-Hub-Signature; {"deleted": [...]} sends tombstones.
+- GET /subscriptions lists the verified subscriptions.
+
+    python benchmarks/websub_hub.py --port 8081
+    WEBSUB_HUB=http://127.0.0.1:8081/subscribe WEBSUB_CALLBACK=http://127.0.0.1:8000/api/websub/callback ...
+"""
+
+import hmac
+import json
+import time
+import uuid
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode
+from xml.sax.saxutils import escape
+import httpx
+
+FEED_HEAD = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+             '<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns="http://www.w3.org/2005/Atom"'
+             ' xmlns:at="http://purl.org/atompub/tombstones/1.0">\n'
+             '<link rel="hub" href="https://pubsubhubbub.appspot.com"/>\n'
+             '<link rel="self" href="{topic}"/>\n<title>YouTube video feed</title>\n<updated>{now}</updated>\n')
+ENTRY = ('<entry>\n<id>yt:video:{video_id}</id>\n<yt:videoId>{video_id}</yt:videoId>\n'
+         '<yt:channelId>{channel_id}</yt:channelId>\n<title>{title}</title>\n'
+         '<link rel="alternate" href="https://www.youtube.com/watch?v={video_id}"/>\n'
+         '<published>{now}</published>\n<updated>{now}</updated>\n</entry>\n')
+TOMBSTONE = '<at:deleted-entry ref="yt:video:{video_id}" when="{now}"/>\n'
+
+def atom_feed(topic: str, videos=(), deleted=()) -> bytes:
+    now = datetime.now(timezone.utc).isoformat()
+    body = FEED_HEAD.format(topic=escape(topic, {'"': "&quot;"}), now=now)
+    body += "".join(ENTRY.format(video_id=v["video_id"], channel_id=v["channel_id"],
+                                 title=escape(v.get("title", "")), now=now) for v in videos)
+    body += "".join(TOMBSTONE.format(video_id=video_id, now=now) for video_id in deleted)
+    return (body + "</feed>\n").encode()
+
+class Hub:
+    def __init__(self):
+        self.subscriptions = {}  # (topic, callback) -> {"secret", "expires_at"}
+        self.verifications = 0
+        self.deliveries = 0
+        self._lock = threading.Lock()
+        self._client = httpx.Client(timeout=10)
+
+    def verify(self, form) -> None:
+        mode, topic, callback = form["hub.mode"], form["hub.topic"], form["hub.callback"]
+        lease = int(form.get("hub.lease_seconds") or 432000)
+        challenge = uuid.uuid4().hex
+        separator = "&" if "?" in callback else "?"
+        query = urlencode({"hub.mode": mode, "hub.topic": topic, "hub.challenge": challenge,
+                           "hub.lease_seconds": lease})
+        response = self._client.get(f"{callback}{separator}{query}")
+        with self._lock:
+            self.verifications += 1
+            if response.status_code // 100 != 2 or response.text != challenge:
+                return
+            if mode == "subscribe":
+                self.subscriptions[(topic, callback)] = {"secret": form.get("hub.secret"),
+                                                         "expires_at": time.time() + lease}
+            else:
+                self.subscriptions.pop((topic, callback), None)
+
+    def publish(self, topic: str, videos=(), deleted=()):
+        body = atom_feed(topic, videos, deleted)
+        results = []
+        with self._lock:
+            targets = [(callback, sub["secret"]) for (t, callback), sub in self.subscriptions.items() if t == topic]
+        for callback, secret in targets:
+            headers = {"Content-Type": "application/atom+xml"}
+            if secret:
+                headers["X-Hub-Signature"] = "sha1=" + hmac.new(secret.encode(), body, hashlib.sha1).hexdigest()
+            results.append(self._client.post(callback, content=body, headers=headers).status_code)
+            with self._lock:
+                self.deliveries += 1
+        return results
+
+def make_handler(hub: Hub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, status: int, body: bytes = b"", content_type: str = "text/plain"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path == "/subscribe":
+                form = dict(parse_qsl(body.decode()))
+                if form.get("hub.mode") not in ("subscribe", "unsubscribe") or not form.get("hub.topic") \
+                        or not form.get("hub.callback"):
+                    return self._reply(400, b"hub.mode, hub.topic and hub.callback are required")
+                threading.Thread(target=hub.verify, args=(form,), daemon=True).start()
+                return self._reply(202)
+            if self.path == "/publish":
+                data = json.loads(body)
+                results = hub.publish(data["topic"], data.get("videos", []), data.get("deleted", []))
+                return self._reply(200, json.dumps({"delivered": results}).encode(), "application/json")
+            self._reply(404)
+
+        def do_GET(self):
+            if self.path == "/subscriptions":
+                with hub._lock:
+                    listing = [{"topic": t, "callback": c, "expires_at": s["expires_at"]}
+                               for (t, c), s in hub.subscriptions.items()]
+                return self._reply(200, json.dumps(listing).encode(), "application/json")
+            self._reply(404)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+def start_hub(port: int = 0):
+    """
+    Run the hub on a background thread; returns (server, hub).
+    """
+    hub = Hub()
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(hub))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, hub
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in WebSub hub")
+    parser.add_argument("--port", type=int, default=8081)
+    args = parser.parse_args()
+    hub = Hub()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(hub))
+    print(f"Stand-in hub on http://127.0.0.1:{args.port}/subscribe")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Snapshot, restore and zero-downtime reindex for the Pinecone memory index.
+
+    python pinecone_admin.py snapshot --index memories --out snapshots/memories
+    python pinecone_admin.py restore --snapshot snapshots/memories --index memories-v2
+    python pinecone_admin.py reindex --source memories --target memories-v2 --promote
+    python pinecone_admin.py promote --index memories-v2
+    python pinecone_admin.py reset
+
+A snapshot directory holds vectors.npy (float32 or float16, one row per
+vector), records.jsonl (id, namespace and metadata per row, same order) and
+manifest.json (dimension, metric, dtype, count). New indexes are always built
+next to the live one; the app switches over when the shared alias (a marker in
+the PINECONE_INDEX home index, see api/index_config.py) is flipped.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from pinecone import Pinecone, ServerlessSpec
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+from index_config import (
+    EMBEDDING_DIMENSION, METRIC, HOME_INDEX, ALIAS_NAMESPACE, ALIAS_CHECK_INTERVAL, resolve_index_name, write_alias
+)
+
+load_dotenv()
+
+cloud = os.getenv("PINECONE_CLOUD", "aws")
+region = os.getenv("PINECONE_REGION", "us-east-1")
+
+pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+
+FETCH_BATCH_SIZE = 100
+UPSERT_BATCH_SIZE = 100
+# After every worker has followed the alias, requests already running on the old index may finish
+DELETE_GRACE_SECONDS = 30.0
+
+def wait_until_ready(index_name: str, timeout: float = 300.0) -> None:
+    """Poll the control plane until the index reports ready."""
+    deadline = time.monotonic() + timeout
+    delay = 0.5
+    while time.monotonic() < deadline:
+        status = pc.describe_index(index_name).status
+        if status.get("ready"):
+            return
+        time.sleep(delay)
+        delay = min(delay * 2, 5.0)
+    raise TimeoutError(f"Index '{index_name}' not ready after {timeout}s")
+
+def wait_until_count(index_name: str, expected: int, timeout: float = 300.0) -> int:
+    """Poll index stats until the expected number of vectors is visible."""
+    index = pc.Index(index_name)
+    deadline = time.monotonic() + timeout
+    count = 0
+    while time.monotonic() < deadline:
+        count = index.describe_index_stats().total_vector_count
+        if count >= expected:
+            return count
+        time.sleep(1.0)
+    raise TimeoutError(f"Index '{index_name}' shows {count}/{expected} vectors after {timeout}s")
+
+def create_index(index_name: str, dimension: int = EMBEDDING_DIMENSION, metric: str = METRIC) -> None:
+    """Create an index (if missing) and wait for it to become ready."""
+    if index_name not in pc.list_indexes().names():
+        print(f"Creating index '{index_name}' ({dimension} dims, {metric})...")
+        pc.create_index(
+            name=index_name,
+            dimension=dimension,
+            metric=metric,
+            spec=ServerlessSpec(cloud=cloud, region=region)
+        )
+    wait_until_ready(index_name)
+    print(f"✅ Index '{index_name}' is ready")
+
+def snapshot(index_name: str, out_dir: str, dtype: str = "float32") -> dict:
+    """Write every vector in the index to a snapshot directory."""
+    index = pc.Index(index_name)
+    description = pc.describe_index(index_name)
+    stats = index.describe_index_stats()
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Collect IDs first so the vector file can be preallocated and written by row
+    ids_by_namespace = {}
+    for namespace in stats.namespaces:
+        if namespace == ALIAS_NAMESPACE:
+            continue
+        ids = []
+        for page in index.list(namespace=namespace):
+            ids.extend(page)
+        ids_by_namespace[namespace] = ids
+    total = sum(len(ids) for ids in ids_by_namespace.values())
+
+    start = time.perf_counter()
+    vectors = np.lib.format.open_memmap(
+        os.path.join(out_dir, "vectors.npy"), mode="w+", dtype=dtype,
+        shape=(total, description.dimension)
+    )
+    row = 0
+    with open(os.path.join(out_dir, "records.jsonl"), "w") as records:
+        for namespace, ids in ids_by_namespace.items():
+            for offset in range(0, len(ids), FETCH_BATCH_SIZE):
+                fetched = index.fetch(ids=ids[offset:offset + FETCH_BATCH_SIZE], namespace=namespace).vectors
+                for vector_id, record in fetched.items():
+                    vectors[row] = record.values
+                    records.write(json.dumps({
+                        "id": vector_id,
+                        "namespace": namespace,
+                        "metadata": dict(record.metadata or {})
+                    }) + "\n")
+                    row += 1
+    vectors.flush()
+    elapsed = time.perf_counter() - start
+
+    manifest = {
+        "index": index_name,
+        "dimension": description.dimension,
+        "metric": description.metric,
+        "dtype": dtype,
+        "count": row,
+        "created_at": time.time(),
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✅ Snapshot of {row} vectors written to {out_dir} ({_rate(row, elapsed)})")
+    return manifest
+
+def restore(snapshot_dir: str, index_name: str, workers: int = 8, batch_size: int = UPSERT_BATCH_SIZE) -> int:
+    """Load a snapshot into an index with parallel batched upserts."""
+    with open(os.path.join(snapshot_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    create_index(index_name, dimension=manifest["dimension"], metric=manifest["metric"])
+    index = pc.Index(index_name)
+
+    vectors = np.load(os.path.join(snapshot_dir, "vectors.npy"), mmap_mode="r")
+    with open(os.path.join(snapshot_dir, "records.jsonl")) as f:
+        records = [json.loads(line) for line in f]
+
+    def batches():
+        # Batches never span namespaces since upsert takes a single namespace
+        batch, namespace = [], None
+        for row, record in enumerate(records):
+            if batch and (record["namespace"] != namespace or len(batch) >= batch_size):
+                yield namespace, batch
+                batch = []
+            namespace = record["namespace"]
+            batch.append((record["id"], vectors[row].astype(np.float32).tolist(), record["metadata"]))
+        if batch:
+            yield namespace, batch
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Keep a bounded number of batches in flight so large snapshots stream from disk
+        in_flight = []
+        for namespace, batch in batches():
+            in_flight.append(pool.submit(index.upsert, vectors=batch, namespace=namespace))
+            if len(in_flight) >= workers * 2:
+                in_flight.pop(0).result()
+        for future in in_flight:
+            future.result()
+    elapsed = time.perf_counter() - start
+    print(f"✅ Restored {len(records)} vectors into '{index_name}' ({_rate(len(records), elapsed)})")
+    return len(records)
+
+def promote(index_name: str) -> None:
+    """Point the app at an index once it is ready."""
+    wait_until_ready(index_name)
+    if index_name != HOME_INDEX:
+        create_index(HOME_INDEX)
+    write_alias(pc, index_name)
+    print(f"✅ Alias now points at '{index_name}'; workers switch over within {ALIAS_CHECK_INTERVAL:.0f}s")
+
+def reindex(source: str, target: str, snapshot_dir: str, dtype: str, workers: int, do_promote: bool) -> None:
+    """Copy the live index into a new one built alongside it."""
+    start = time.perf_counter()
+    manifest = snapshot(source, snapshot_dir, dtype=dtype)
+    restored = restore(snapshot_dir, target, workers=workers)
+    wait_until_count(target, manifest["count"])
+    elapsed = time.perf_counter() - start
+    print(f"✅ Migrated {restored} vectors from '{source}' to '{target}' ({_rate(restored, elapsed)} end to end)")
+    if do_promote:
+        promote(target)
+
+def reset(delete_old: bool) -> None:
+    """Replace the live index with a fresh empty one without an outage."""
+    current = resolve_index_name(pc)
+    target = f"{current.split('--')[0]}--{int(time.time())}"
+    create_index(target)
+    promote(target)
+    if not delete_old:
+        return
+    if current == HOME_INDEX:
+        # The home index holds the alias itself
+        print(f"Keeping '{current}': it is the home index (PINECONE_INDEX) that stores the alias")
+        return
+    if current in pc.list_indexes().names():
+        wait = ALIAS_CHECK_INTERVAL + DELETE_GRACE_SECONDS
+        print(f"Waiting {wait:.0f}s for every worker to follow the alias before deleting '{current}'...")
+        time.sleep(wait)
+        print(f"Deleting previous index '{current}'...")
+        pc.delete_index(current)
+
+def _rate(count: int, elapsed: float) -> str:
+    return f"{count / elapsed:,.0f} vectors/sec" if elapsed > 0 else "n/a"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser("snapshot", help="Save an index to a snapshot directory")
+    cmd.add_argument("--index", default=None, help="Index to snapshot (default: active index)")
+    cmd.add_argument("--out", required=True, help="Snapshot directory")
+    cmd.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+
+    cmd = commands.add_parser("restore", help="Load a snapshot into a (new) index")
+    cmd.add_argument("--snapshot", required=True, help="Snapshot directory")
+    cmd.add_argument("--index", required=True, help="Index to restore into")
+    cmd.add_argument("--workers", type=int, default=8)
+    cmd.add_argument("--promote", action="store_true", help="Switch the app to the index afterwards")
+
+    cmd = commands.add_parser("reindex", help="Copy the live index into a new index")
+    cmd.add_argument("--source", default=None, help="Index to copy (default: active index)")
+    cmd.add_argument("--target", required=True, help="New index name")
+    cmd.add_argument("--snapshot", default="snapshots/reindex", help="Working snapshot directory")
+    cmd.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    cmd.add_argument("--workers", type=int, default=8)
+    cmd.add_argument("--promote", action="store_true", help="Switch the app to the new index afterwards")
+
+    cmd = commands.add_parser("promote", help="Switch the app to an index")
+    cmd.add_argument("--index", required=True)
+
+    cmd = commands.add_parser("reset", help="Switch the app to a fresh empty index")
+    cmd.add_argument("--delete-old", action="store_true", help="Delete the previous index afterwards")
+
+    args = parser.parse_args()
+    print("Current indexes:", pc.list_indexes().names())
+    if args.command == "snapshot":
+        snapshot(args.index or resolve_index_name(pc), args.out, dtype=args.dtype)
+    elif args.command == "restore":
+        restored = restore(args.snapshot, args.index, workers=args.workers)
+        if args.promote:
+            # Upserts are eventually visible; never switch the app to a partly visible index
+            wait_until_count(args.index, restored)
+            promote(args.index)
+    elif args.command == "reindex":
+        reindex(args.source or resolve_index_name(pc), args.target, args.snapshot,
+                args.dtype, args.workers, args.promote)
+    elif args.command == "promote":
+        promote(args.index)
+    elif args.command == "reset":
+        reset(args.delete_old)